@@ -1,18 +1,79 @@
+import codecs
+import copy
+import html
+import logging
+import os
 import re
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Union, IO, Optional, List, Dict, Any
+from typing import Union, IO, Iterator, Optional, List, Dict, Any, Tuple
 
 import pandas as pd
-from dotenv import load_dotenv, find_dotenv
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import PromptTemplate
-from langchain_groq import ChatGroq
+
+from categorias import CATEGORIA_PADRAO, CATEGORIAS, categoria_por_regras, validar_categoria
+from indice_historico import IndiceHistorico
+from indice_lsh import IndiceLSH
+from metricas import METRICAS
+from orcamento import OrcamentoLLM, estimar_tokens
 
 from typing import Callable, Optional
 
 FileLike = Union[str, IO[bytes], IO[str]]  # path ou file object (ex.: UploadedFile)
 
+logger = logging.getLogger(__name__)
+
+OFX_TAG_RE = re.compile(r"<(/?)([A-Za-z0-9_.]+)>([^<]*)")
+OFX_CHUNK = 64 * 1024
+
+# (sep, encoding) tentados na leitura do CSV, nessa ordem
+CSV_FORMATOS = [(",", "utf-8"), (";", "utf-8"), (",", "latin-1"), (";", "latin-1")]
+CSV_AMOSTRA_LINHAS = 50
+CSV_CHUNK_LINHAS = 50_000
+
+
+def eh_ofx(file: FileLike) -> bool:
+    """OFX/QFX pela extensão do nome ou, sem extensão conhecida, pelo cabeçalho."""
+    nome = file if isinstance(file, str) else getattr(file, "name", "") or ""
+    if os.path.splitext(str(nome))[1].lower() in (".ofx", ".qfx"):
+        return True
+
+    # sem extensão conhecida: olha o cabeçalho
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            inicio = f.read(1024)
+    elif hasattr(file, "read") and hasattr(file, "seek"):
+        file.seek(0)
+        inicio = file.read(1024)
+        file.seek(0)
+    else:
+        return False
+
+    if isinstance(inicio, bytes):
+        inicio = inicio.decode("latin-1")
+    inicio = inicio.upper()
+    return "OFXHEADER" in inicio or "<OFX>" in inicio
+
+
+def _limite_de_taxa(erro: Optional[BaseException]) -> bool:
+    """429 do Groq (groq.RateLimitError ou qualquer erro HTTP com esse status)."""
+    return erro is not None and (getattr(erro, "status_code", None) == 429 or type(erro).__name__ == "RateLimitError")
+
+
+def _timeout(erro: BaseException) -> bool:
+    """Timeout da chamada (groq.APITimeoutError, httpx.*Timeout, TimeoutError)."""
+    return isinstance(erro, TimeoutError) or "timeout" in type(erro).__name__.lower()
+
+
+def _retry_after(erro: BaseException) -> Optional[float]:
+    """Segundos pedidos pelo servidor no cabeçalho Retry-After, se houver."""
+    headers = getattr(getattr(erro, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
 
 @dataclass
 class AgenteCartaoConfig:
@@ -25,6 +86,67 @@ class AgenteCartaoConfig:
     max_concurrency: int = 1
     sleep_seconds: float = 3.0  # para respeitar RPM no on_demand
 
+    # few-shot: exemplos parecidos já categorizados, vindos do histórico
+    rag_k: int = 5
+    rag_min_score: float = 0.3
+
+    # reaproveita a categoria de descrição quase idêntica (Jaccard de trigramas); None desliga
+    lsh_threshold: Optional[float] = 0.6
+    lsh_permutacoes: int = 60
+    lsh_bandas: int = 20
+
+    # resposta fora das 17 categorias: reenvia só os itens inválidos, em lotes pequenos
+    reenvios_validacao: int = 1
+    reenvio_batch_size: int = 5
+
+    # orçamento de LLM (None = sem limite); o consumo do dia é persistido (ver orcamento.py).
+    # Com limite, as descrições de maior valor vão primeiro e o resto usa o fallback local.
+    max_requisicoes_execucao: Optional[int] = None
+    max_tokens_execucao: Optional[int] = None
+    max_requisicoes_dia: Optional[int] = None
+    max_tokens_dia: Optional[int] = None
+
+    # política de latência, opcional (None = chain.batch simples, com os retries do cliente):
+    # cada item tem um prazo; passado o p95 de latência do modelo sem resposta, manda
+    # uma cópia (hedge); estourou o prazo, tenta o próximo modelo e, por fim, o local.
+    # Limite de taxa (429) nunca vira hedge nem fallback: espera e tenta o mesmo modelo
+    # de novo (até max_retries vezes) e, se continuar, a execução falha
+    prazo_requisicao_s: Optional[float] = None
+    modelos_fallback: Tuple[str, ...] = ("llama-3.3-70b-versatile",)
+    hedge_percentil: float = 0.95
+    hedge_min_s: float = 1.0  # atraso mínimo
+    hedge_amostras_min: int = 20  # sem essas amostras de latência, não manda cópia
+    espera_limite_s: float = 2.0  # backoff no 429 (dobra a cada tentativa; Retry-After tem preferência)
+
+    @classmethod
+    def do_ambiente(cls) -> "AgenteCartaoConfig":
+        """
+        Config padrão com os limites de orçamento lidos do ambiente (ou do .env):
+        GROQ_MAX_REQUISICOES_EXECUCAO, GROQ_MAX_TOKENS_EXECUCAO,
+        GROQ_MAX_REQUISICOES_DIA e GROQ_MAX_TOKENS_DIA; e o prazo por requisição
+        da política de latência, GROQ_PRAZO_REQUISICAO_S. Ausente/vazio = desligado.
+        """
+        from dotenv import load_dotenv, find_dotenv
+
+        load_dotenv(find_dotenv())
+
+        def numero(nome: str, tipo=int):
+            valor = os.environ.get(nome, "").strip()
+            if not valor:
+                return None
+            try:
+                return tipo(valor)
+            except ValueError:
+                raise ValueError(f"{nome} deve ser um número (veio {valor!r})") from None
+
+        return cls(
+            max_requisicoes_execucao=numero("GROQ_MAX_REQUISICOES_EXECUCAO"),
+            max_tokens_execucao=numero("GROQ_MAX_TOKENS_EXECUCAO"),
+            max_requisicoes_dia=numero("GROQ_MAX_REQUISICOES_DIA"),
+            max_tokens_dia=numero("GROQ_MAX_TOKENS_DIA"),
+            prazo_requisicao_s=numero("GROQ_PRAZO_REQUISICAO_S", float),
+        )
+
 
 class AgenteCartao:
     """
@@ -38,33 +160,14 @@ class AgenteCartao:
     def __init__(self, config: Optional[AgenteCartaoConfig] = None):
         self.config = config or AgenteCartaoConfig()
 
-        # carrega env (GROQ_API_KEY)
-        load_dotenv(find_dotenv())
-
         self.parc_re = re.compile(r"(\d{2})/(\d{2})")
 
-        template = """
+        self.template = """
 Você é um analista de dados em um projeto de limpeza de lançamentos de CARTÃO DE CRÉDITO (pessoa física).
 Sua tarefa é escolher UMA categoria para o lançamento com base no estabelecimento/descrição.
 
 Escolha exatamente UMA das categorias abaixo:
-- Moradia
-- Contas da casa
-- Internet & Telefone
-- Streaming/Assinaturas
-- Carro
-- Transporte
-- Mercado
-- Delivery/Restaurantes
-- Saúde
-- Educação
-- Pets
-- Beleza
-- Compras & Casa
-- Lazer
-- Bancos & Tarifas
-- Outros
-- Reembolsos & Créditos
+{categorias}
 
 REGRAS IMPORTANTES:
 1) Drogasil, drograria, farmácia, Raia, Unimed, Uniodonto, OdontoPrev = "Saúde".
@@ -77,22 +180,146 @@ REGRAS IMPORTANTES:
 8) Mercado livre e suas variações é "Compras & Casa"
 9) agro, petz e afins é "Pets"
 
+{exemplos}
 Agora classifique este lançamento:
 {text}
 
 Responda APENAS com o nome exato da categoria (uma linha).
-""".strip()
+""".replace("{categorias}", "\n".join(f"- {c}" for c in CATEGORIAS)).strip()
+
+        # cliente do LLM só é montado na primeira categorização (ver `chain`);
+        # um por modelo (o principal e os de fallback). Compartilhados com as
+        # cópias de `nova_execucao` (o pool não cria threads até o primeiro uso)
+        self._chains: Dict[str, Any] = {}
+        self._chain_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(4, 4 * int(self.config.max_concurrency)), thread_name_prefix="llm"
+        )
+        self._tokens_template = estimar_tokens(self.template)
+
+        self._iniciar_estado()
+
+    def _iniciar_estado(self):
+        # estado de uma execução (histórico, orçamento, resultados): nunca compartilhado entre jobs
+        self.indice: Optional[IndiceHistorico] = None
+        self.indice_lsh: Optional[IndiceLSH] = None
+        self.matches_lsh: List[Dict[str, Any]] = []  # último categorizar_batch, para revisão
+
+        self.orcamento = OrcamentoLLM(
+            self.config.max_requisicoes_execucao,
+            self.config.max_tokens_execucao,
+            self.config.max_requisicoes_dia,
+            self.config.max_tokens_dia,
+        )
+        # último mapear_categorias: de onde veio cada categoria e fração do valor por origem
+        self.origens: Dict[str, str] = {}
+        self.cobertura: Dict[str, float] = {}
+        # textos que foram para o LLM mas ficaram com o classificador local
+        # (sem resposta no prazo ou resposta inválida): não viram cache
+        self.categorizadas_local = set()
+        # entrada do prompt por texto (a busca de exemplos no TF-IDF roda uma vez só)
+        self._entradas: Dict[str, Dict[str, str]] = {}
+
+    def nova_execucao(self) -> "AgenteCartao":
+        """
+        Cópia para um job: compartilha config e clientes do LLM, mas tem histórico,
+        orçamento da execução e resultados próprios (jobs em paralelo não se misturam).
+        """
+        execucao = copy.copy(self)
+        execucao._iniciar_estado()
+        return execucao
+
+    def _construir_chain(self, modelo: str):
+        # imports pesados (langchain/groq) ficam aqui: ler CSV, parcelas e o
+        # modo backup não precisam deles
+        from dotenv import load_dotenv, find_dotenv
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import PromptTemplate
+        from langchain_groq import ChatGroq
+
+        # carrega env (GROQ_API_KEY)
+        load_dotenv(find_dotenv())
 
-        self.prompt = PromptTemplate.from_template(template)
+        prompt = PromptTemplate.from_template(self.template)
 
-        self.chat = ChatGroq(
-            model=self.config.model,
+        # com a política de latência o 429 é tratado aqui (ver _tentar_com_espera): o
+        # cliente não pode ficar esperando o limite por conta própria, senão o prazo
+        # estoura e o item vai para o fallback enquanto a chave está limitada
+        com_politica = self.config.prazo_requisicao_s is not None
+        chat = ChatGroq(
+            model=modelo,
             temperature=self.config.temperature,
-            timeout=self.config.timeout,
-            max_retries=self.config.max_retries,
+            timeout=self.config.prazo_requisicao_s if com_politica else self.config.timeout,
+            max_retries=0 if com_politica else self.config.max_retries,
         )
+        if modelo == self.config.model:
+            self.prompt, self.chat = prompt, chat
 
-        self.chain = self.prompt | self.chat | StrOutputParser()
+        return prompt | chat | StrOutputParser()
+
+    def chain_do_modelo(self, modelo: str):
+        if modelo not in self._chains:
+            with self._chain_lock:
+                if modelo not in self._chains:
+                    self._chains[modelo] = self._construir_chain(modelo)
+        return self._chains[modelo]
+
+    @property
+    def chain(self):
+        return self.chain_do_modelo(self.config.model)
+
+    @chain.setter
+    def chain(self, valor):
+        self._chains[self.config.model] = valor
+
+    def carregar_historico(self, rotulados: Dict[str, str]):
+        """
+        Monta os índices sobre o histórico (Lancamento_Limpo -> Categoria):
+          - vizinhos TF-IDF, para injetar exemplos parecidos no prompt
+          - MinHash/LSH, para herdar a categoria de descrições quase idênticas
+        """
+        self.indice = IndiceHistorico(rotulados) if rotulados else None
+        self._entradas = {}
+        self.indice_lsh = None
+        if rotulados and self.config.lsh_threshold:
+            self.indice_lsh = IndiceLSH(rotulados, self.config.lsh_permutacoes, self.config.lsh_bandas)
+
+    def _reaproveitar_lsh(self, textos: List[str]) -> Dict[str, str]:
+        """Categorias herdadas de descrições conhecidas acima do threshold (sem LLM)."""
+        self.matches_lsh = []
+        if self.indice_lsh is None:
+            return {}
+
+        herdadas: Dict[str, str] = {}
+        for texto in textos:
+            match = self.indice_lsh.buscar(texto, self.config.lsh_threshold)
+            if match is None:
+                continue
+            vizinho, categoria, sim = match
+            herdadas[texto] = categoria
+            self.matches_lsh.append(
+                {"Lancamento_Limpo": texto, "Parecido_com": vizinho, "Categoria": categoria, "Similaridade": round(sim, 3)}
+            )
+            logger.info("LSH: %r herdou %r de %r (%.2f)", texto, categoria, vizinho, sim)
+
+        METRICAS.incr("lsh.reaproveitados", len(herdadas))
+        return herdadas
+
+    def _exemplos(self, texto: str) -> str:
+        if self.indice is None or self.config.rag_k <= 0:
+            return ""
+
+        vizinhos = self.indice.buscar(texto, k=self.config.rag_k, min_score=self.config.rag_min_score)
+        if not vizinhos:
+            return ""
+
+        linhas = "\n".join(f"- {t} -> {c}" for t, c, _ in vizinhos)
+        return f"Lançamentos parecidos já categorizados (use como referência):\n{linhas}\n"
+
+    def _entrada(self, texto: str) -> Dict[str, str]:
+        if texto not in self._entradas:
+            self._entradas[texto] = {"text": texto, "exemplos": self._exemplos(texto)}
+        return dict(self._entradas[texto])  # cópia: o reenvio acrescenta ao texto dos exemplos
 
     def extrair_parcela(self, lancamento: str):
         if pd.isna(lancamento):
@@ -108,18 +335,37 @@ Responda APENAS com o nome exato da categoria (uma linha).
 
         return pd.NA, pd.NA
 
-    def adicionar_parcelas(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+    def _parcelas(self, lancamentos: pd.Series):
+        """Versão vetorizada de `extrair_parcela` (última parcela válida do texto)."""
+        achados = lancamentos.astype(str).str.extractall(self.parc_re).astype(int)
+        achados.columns = ["ParcelaAtual", "ParcelaTotal"]
+        validos = achados[
+            (achados["ParcelaTotal"] >= 2)
+            & (achados["ParcelaAtual"] >= 1)
+            & (achados["ParcelaAtual"] <= achados["ParcelaTotal"])
+        ]
+        ultima = validos.groupby(level=0).last().reindex(lancamentos.index)
+        return ultima["ParcelaAtual"].astype("Int64"), ultima["ParcelaTotal"].astype("Int64")
+
+    def adicionar_parcelas(self, df: pd.DataFrame, copiar: bool = True) -> pd.DataFrame:
+        """
+        Adiciona ParcelaAtual/ParcelaTotal/Parcela/Lancamento_Limpo.
+        `copiar=False` escreve as colunas no próprio `df` (modo em blocos: o bloco é descartável).
+        """
+        if copiar:
+            df = df.copy()
 
-        df[["ParcelaAtual", "ParcelaTotal"]] = df["Lançamento"].apply(
-            lambda x: pd.Series(self.extrair_parcela(x))
-        )
+        lanc = df["Lançamento"].reset_index(drop=True)
+        atual, total = self._parcelas(lanc)
+        df["ParcelaAtual"] = atual.array
+        df["ParcelaTotal"] = total.array
 
-        df["Parcela"] = df.apply(
-            lambda r: f"{int(r['ParcelaAtual']):02d}/{int(r['ParcelaTotal']):02d}"
-            if pd.notna(r["ParcelaTotal"]) else "",
-            axis=1
-        )
+        tem = total.notna().to_numpy()
+        parcela = pd.Series("", index=df.index, dtype=object)
+        parcela[tem] = (
+            atual[tem].astype(str).str.zfill(2) + "/" + total[tem].astype(str).str.zfill(2)
+        ).to_numpy()
+        df["Parcela"] = parcela
 
         df["Lancamento_Limpo"] = (
             df["Lançamento"]
@@ -131,37 +377,324 @@ Responda APENAS com o nome exato da categoria (uma linha).
 
         return df
 
+    def _tokens_entrada(self, entrada: Dict[str, str]) -> int:
+        return self._tokens_template + estimar_tokens(entrada["text"]) + estimar_tokens(entrada["exemplos"])
+
+    def _chamar_llm(self, entradas: List[Dict[str, str]]) -> List[Tuple[str, Optional[str]]]:
+        """(resposta, modelo que respondeu) por entrada; modelo None = classificador local."""
+        if self.config.prazo_requisicao_s is None:
+            resps = self.chain.batch(entradas, config={"max_concurrency": self.config.max_concurrency})
+            METRICAS.incr("llm.requisicoes", len(entradas))
+            self.orcamento.registrar(
+                len(entradas), sum(self._tokens_entrada(e) for e in entradas) + sum(estimar_tokens(r) for r in resps)
+            )
+            resps = [(r, self.config.model) for r in resps]
+        else:
+            # um item lento não segura o lote inteiro
+            with ThreadPoolExecutor(max_workers=max(int(self.config.max_concurrency), 1)) as itens:
+                resps = list(itens.map(self._invocar_com_politica, entradas))
+        time.sleep(self.config.sleep_seconds)
+        return resps
+
+    # ---------- Política de latência ----------
+    def _cronometrar(self, modelo: str, entrada: Dict[str, str]) -> str:
+        # a cópia (hedge) e a chamada abandonada no prazo também gastam a cota
+        METRICAS.incr("llm.requisicoes")
+        t0 = time.perf_counter()
+        try:
+            resp = self.chain_do_modelo(modelo).invoke(entrada)
+        except Exception:
+            METRICAS.incr(f"llm.{modelo}.erros")
+            self.orcamento.registrar(1, self._tokens_entrada(entrada))
+            raise
+        # latência só de quem respondeu, inclusive depois do prazo: é a cauda que o p95 mede
+        METRICAS.registrar_tempo(f"llm.latencia.{modelo}", time.perf_counter() - t0)
+        self.orcamento.registrar(1, self._tokens_entrada(entrada) + estimar_tokens(resp))
+        return resp
+
+    def atraso_hedge(self, modelo: str) -> Optional[float]:
+        """
+        Quanto esperar antes de mandar a cópia: p95 (configurável) da latência do
+        modelo. None (sem hedge) enquanto não há `hedge_amostras_min` amostras.
+        """
+        p = METRICAS.percentil(
+            f"llm.latencia.{modelo}", self.config.hedge_percentil, minimo_amostras=self.config.hedge_amostras_min
+        )
+        return None if p is None else max(p, self.config.hedge_min_s)
 
+    def _tentar_modelo(self, modelo: str, entrada: Dict[str, str]) -> Optional[str]:
+        """
+        Resposta do modelo dentro do prazo (original ou hedge, o que chegar antes), ou
+        None se o prazo estourou. Só timeout conta como "sem resposta": 429 e os demais
+        erros (chave inválida, 400, 5xx) sobem para quem chamou.
+        """
+        # chamadas abandonadas (prazo estourado) seguem ocupando thread até o cliente desistir
+        pool = self._pool
+        prazo = float(self.config.prazo_requisicao_s)
+        inicio = time.perf_counter()
+
+        chamada = pool.submit(self._cronometrar, modelo, entrada)
+        pendentes = {chamada}
+
+        atraso = self.atraso_hedge(modelo)
+        hedge = None
+        if atraso is not None and atraso < prazo:
+            feitas, _ = wait(pendentes, timeout=atraso)
+            if feitas and chamada.exception() is not None and not _timeout(chamada.exception()):
+                raise chamada.exception()
+            if not feitas:
+                if self.orcamento.cabe(1, self._tokens_entrada(entrada)):
+                    hedge = pool.submit(self._cronometrar, modelo, entrada)
+                    pendentes.add(hedge)
+                    METRICAS.incr(f"llm.{modelo}.hedges")
+
+        while pendentes:
+            restante = prazo - (time.perf_counter() - inicio)
+            if restante <= 0:
+                break
+            feitas, pendentes = wait(pendentes, timeout=restante, return_when=FIRST_COMPLETED)
+            for f in feitas:
+                if f.exception() is None:
+                    if f is hedge:
+                        METRICAS.incr(f"llm.{modelo}.hedges_vencedores")
+                    return f.result()
+                if not _timeout(f.exception()):
+                    raise f.exception()
+
+        METRICAS.incr(f"llm.{modelo}.sem_resposta")
+        return None
+
+    def _tentar_com_espera(self, modelo: str, entrada: Dict[str, str]) -> Optional[str]:
+        """`_tentar_modelo`, esperando e repetindo no 429 (até max_retries); depois disso o erro sobe."""
+        for tentativa in range(int(self.config.max_retries) + 1):
+            try:
+                return self._tentar_modelo(modelo, entrada)
+            except Exception as e:
+                if not _limite_de_taxa(e) or tentativa >= self.config.max_retries:
+                    raise
+                espera = _retry_after(e)
+                if espera is None:
+                    espera = self.config.espera_limite_s * 2 ** tentativa
+                METRICAS.incr(f"llm.{modelo}.limite_taxa")
+                logger.warning("Limite de taxa em %s: nova tentativa em %.1fs", modelo, espera)
+                time.sleep(espera)
+        return None
+
+    def _invocar_com_politica(self, entrada: Dict[str, str]) -> Tuple[str, Optional[str]]:
+        """
+        Modelo principal -> modelos de fallback -> classificador local (regras/TF-IDF).
+        Devolve (resposta, modelo que respondeu); modelo None = classificador local.
+        """
+        modelos = [self.config.model] + [m for m in self.config.modelos_fallback if m != self.config.model]
+        for i, modelo in enumerate(modelos):
+            if i > 0:
+                if not self.orcamento.cabe(1, self._tokens_entrada(entrada)):
+                    break
+                METRICAS.incr(f"llm.{modelo}.fallback")
+            resp = self._tentar_com_espera(modelo, entrada)
+            if resp is not None:
+                return resp, modelo
+
+        logger.warning("LLM sem resposta no prazo para %r: usando classificador local", entrada["text"])
+        METRICAS.incr("llm.fallback_local")
+        with self._chain_lock:
+            self.categorizadas_local.add(entrada["text"])
+        return self._categoria_local(entrada["text"]), None
+
+    def _categoria_local(self, texto: str) -> str:
+        """Fallback sem LLM: vizinho TF-IDF mais parecido, senão as regras fixas, senão "Outros"."""
+        if self.indice is not None:
+            vizinhos = self.indice.buscar(texto, k=1, min_score=self.config.rag_min_score)
+            if vizinhos:
+                return vizinhos[0][1]
+        return categoria_por_regras(texto) or CATEGORIA_PADRAO
+
+    def _planejar_orcamento(self, textos: List[str]):
+        """Divide `textos` (já em ordem de prioridade) entre o que cabe no orçamento e a cauda."""
+        if not self.orcamento.limitado:
+            return textos, []
+
+        livre = self.orcamento.disponivel()
+        requisicoes = tokens = 0
+        for i, texto in enumerate(textos):
+            custo = self._tokens_entrada(self._entrada(texto)) + 1
+            if requisicoes + 1 > livre["requisicoes"] or tokens + custo > livre["tokens"]:
+                return textos[:i], textos[i:]
+            requisicoes += 1
+            tokens += custo
+        return textos, []
+
+    def _validar(
+        self, textos: List[str], resps: List[Tuple[str, Optional[str]]], resultado: Dict[str, str]
+    ) -> Dict[str, str]:
+        """
+        Grava em `resultado` as respostas válidas (já ajustadas) e devolve texto -> resposta inválida.
+        As métricas de respostas/inválidas ficam no modelo que de fato respondeu.
+        """
+        invalidas: Dict[str, str] = {}
+        for texto, (resp, modelo) in zip(textos, resps):
+            if modelo is None:
+                # veio do classificador local (prazo estourado), não de um modelo
+                resultado[texto] = resp
+                continue
+            METRICAS.incr(f"llm.{modelo}.respostas")
+            categoria, ajustada = validar_categoria(resp)
+            if categoria is None:
+                invalidas[texto] = resp
+                METRICAS.incr(f"llm.{modelo}.invalidas")
+            else:
+                resultado[texto] = categoria
+                if ajustada:
+                    METRICAS.incr(f"llm.{modelo}.ajustadas")
+        return invalidas
+
+    def _entrada_reenvio(self, texto: str, resposta: str) -> Dict[str, str]:
+        entrada = self._entrada(texto)
+        entrada["exemplos"] += (
+            f'\nATENÇÃO: a resposta anterior "{resposta.strip()[:80]}" não é uma categoria da lista. '
+            "Responda só com um dos nomes exatos da lista.\n"
+        )
+        return entrada
 
-    def categorizar_batch(self, df: pd.DataFrame, on_progress: Optional[Callable[[int, int], None]] = None) -> pd.DataFrame:
-        df = df.copy()
-
-        texts = df["Lancamento_Limpo"].astype(str).fillna("")
-        texts_unicos = texts.unique().tolist()
-
-        total = len(texts_unicos)
-        categorias_unicas: List[str] = []
+    def _classificar_llm(
+        self,
+        textos: List[str],
+        on_chunk: Optional[Callable[[Dict[str, str]], None]] = None,
+    ) -> Dict[str, str]:
+        """
+        Chama o LLM em lotes de `batch_size`, respeitando o sleep entre lotes.
+        Só aceita as 17 categorias: o que não dá para ajustar é reenviado em
+        lotes de `reenvio_batch_size` e, se continuar inválido (ou o orçamento
+        não comportar o reenvio), usa o fallback local.
+        """
+        resultado: Dict[str, str] = {}
         bs = int(self.config.batch_size)
+        rbs = max(int(self.config.reenvio_batch_size), 1)
+
+        for i in range(0, len(textos), bs):
+            chunk = textos[i:i + bs]
+            parcial: Dict[str, str] = {}
+            invalidas = self._validar(chunk, self._chamar_llm([self._entrada(t) for t in chunk]), parcial)
+
+            for _ in range(self.config.reenvios_validacao):
+                if not invalidas:
+                    break
+                pendentes = list(invalidas.items())
+                invalidas = {}
+                for j in range(0, len(pendentes), rbs):
+                    lote = pendentes[j:j + rbs]
+                    entradas = [self._entrada_reenvio(t, r) for t, r in lote]
+                    if not self.orcamento.cabe(len(entradas), sum(self._tokens_entrada(e) for e in entradas)):
+                        invalidas.update(dict(pendentes[j:]))
+                        break
+                    METRICAS.incr(f"llm.{self.config.model}.reenvios", len(lote))
+                    resps = self._chamar_llm(entradas)
+                    invalidas.update(self._validar([t for t, _ in lote], resps, parcial))
+
+            for texto, resp in invalidas.items():
+                parcial[texto] = self._categoria_local(texto)
+                self.categorizadas_local.add(texto)
+                logger.warning("Categoria inválida do LLM para %r: %r (usando %r)", texto, resp, parcial[texto])
+            METRICAS.incr(f"llm.{self.config.model}.descartadas", len(invalidas))
+
+            # mantém a ordem do lote
+            parcial = {t: parcial[t] for t in chunk}
+            resultado.update(parcial)
+            if on_chunk:
+                on_chunk(parcial)
+
+        return resultado
+
+    def categorizar_textos(
+        self,
+        textos: List[str],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict[str, str]:
+        """Categoriza descrições únicas via LLM (ver `_classificar_llm`)."""
+        total = len(textos)
+        done = 0
 
         # inicializa progresso
         if on_progress:
             on_progress(0, total)
 
-        done = 0
-        for i in range(0, total, bs):
-            chunk = texts_unicos[i:i + bs]
-            resps = self.chain.batch(chunk, config={"max_concurrency": self.config.max_concurrency})
-            resps = [r.strip() for r in resps]
-            categorias_unicas.extend(resps)
-
-            done += len(chunk)
+        def avanca(parcial: Dict[str, str]):
+            nonlocal done
+            done += len(parcial)
             if on_progress:
                 on_progress(done, total)
 
-            time.sleep(self.config.sleep_seconds)
+        return self._classificar_llm(list(textos), on_chunk=avanca)
 
-        mapa_texto_para_cat: Dict[str, str] = dict(zip(texts_unicos, categorias_unicas))
-        df["Categoria"] = texts.map(mapa_texto_para_cat)
+    def mapear_categorias(
+        self,
+        textos: List[str],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        conhecidas: Optional[Dict[str, str]] = None,
+        pesos: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, str]:
+        """
+        Descrição -> categoria para cada texto único. As que já estão em `conhecidas`
+        (ex.: cache compartilhado) ou são quase idênticas a uma do histórico
+        reaproveitam a categoria sem chamar o LLM.
+
+        `pesos` (descrição -> soma de |Valor|) define a prioridade no LLM: com
+        orçamento limitado, o que não cabe (a cauda de menor valor) usa o fallback local.
+        """
+        conhecidas = conhecidas or {}
+        unicos = list(dict.fromkeys(textos))
+        novos = [t for t in unicos if t not in conhecidas]
+
+        # quase idênticas a algo já rotulado não vão pro LLM
+        herdadas = self._reaproveitar_lsh(novos)
+        novos = [t for t in novos if t not in herdadas]
+
+        if pesos:
+            novos.sort(key=lambda t: pesos.get(t, 0.0), reverse=True)
+
+        self.orcamento.iniciar_execucao()
+        self.categorizadas_local = set()
+        enviar, cauda = self._planejar_orcamento(novos)
+        if cauda:
+            logger.warning("Orçamento do LLM: %d de %d descrições vão para o fallback local", len(cauda), len(novos))
+            METRICAS.incr("orcamento.fallback_local", len(cauda))
+
+        categorias = self.categorizar_textos(enviar, on_progress=on_progress)
+
+        mapa = {t: conhecidas[t] for t in unicos if t in conhecidas}
+        self.origens = dict.fromkeys(mapa, "cache")
+        for origem, parte in (("lsh", herdadas), ("llm", categorias)):
+            mapa.update(parte)
+            self.origens.update(dict.fromkeys(parte, origem))
+        for texto in cauda:
+            mapa[texto] = self._categoria_local(texto)
+            self.origens[texto] = "local"
+        for texto in self.categorizadas_local & set(categorias):
+            self.origens[texto] = "local"
+
+        pesos = pesos or dict.fromkeys(unicos, 1.0)
+        total = sum(pesos.get(t, 0.0) for t in unicos) or 1.0
+        self.cobertura = {}
+        for texto, origem in self.origens.items():
+            self.cobertura[origem] = self.cobertura.get(origem, 0.0) + pesos.get(texto, 0.0) / total
+
+        return mapa
+
+    def categorizar_batch(
+        self,
+        df: pd.DataFrame,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        conhecidas: Optional[Dict[str, str]] = None,
+        copiar: bool = True,
+    ) -> pd.DataFrame:
+        """Categoriza via LLM as descrições únicas de `df` (ver `mapear_categorias`)."""
+        if copiar:
+            df = df.copy()
+
+        texts = df["Lancamento_Limpo"].astype(str).fillna("")
+        pesos = pd.to_numeric(df["Valor"], errors="coerce").abs().groupby(texts).sum().to_dict()
+        mapa = self.mapear_categorias(texts.unique().tolist(), on_progress=on_progress, conhecidas=conhecidas, pesos=pesos)
+        df["Categoria"] = texts.map(mapa)
 
         return df
 
@@ -181,6 +714,42 @@ Responda APENAS com o nome exato da categoria (uma linha).
       return pd.to_numeric(s, errors="coerce")
 
 
+    def _rebobinar(self, file: FileLike):
+        # Se for UploadedFile/file object, garante ponteiro no início
+        if hasattr(file, "seek"):
+            try:
+                file.seek(0)
+            except Exception:
+                pass
+
+    def _normalizar_csv(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Colunas data/lançamento/valor -> Data, Lançamento, Valor já tipados."""
+        # normaliza nomes
+        df.columns = [str(c).strip().lower() for c in df.columns]
+
+        col_data = next((c for c in df.columns if "data" in c), None)
+        col_lanc = next((c for c in df.columns if "lan" in c or "descr" in c), None)
+        col_val = next((c for c in df.columns if "valor" in c or "amount" in c), None)
+
+        if not all([col_data, col_lanc, col_val]):
+            raise ValueError(f"Não achei as colunas. Encontrei: {df.columns.tolist()}")
+
+        # cópia: o bloco/arquivo original não vira base de SettingWithCopy nem fica preso na memória
+        df = df[[col_data, col_lanc, col_val]].copy()
+        df.columns = ["Data", "Lançamento", "Valor"]
+
+        df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
+        df["Valor"] = df["Valor"].apply(self._parse_valor)
+
+        df["Lançamento"] = (
+            df["Lançamento"]
+            .astype(str)
+            .str.replace(r"\s+", " ", regex=True)
+            .str.strip()
+        )
+
+        return df.dropna(subset=["Data", "Lançamento", "Valor"]).reset_index(drop=True)
+
     def ler_csv_cartao(self, file: FileLike) -> pd.DataFrame:
         """
         Lê CSV do cartão com colunas data/lançamento/valor.
@@ -189,16 +758,11 @@ Responda APENAS com o nome exato da categoria (uma linha).
           - UploadedFile do Streamlit (file-like)
           - file object
         """
-        # Se for UploadedFile/file object, garante ponteiro no início
-        if hasattr(file, "seek"):
-            try:
-                file.seek(0)
-            except Exception:
-                pass
+        self._rebobinar(file)
 
         # tenta separadores/encodings comuns
         last_err = None
-        for sep, enc in [(",", "utf-8"), (";", "utf-8"), (",", "latin-1"), (";", "latin-1")]:
+        for sep, enc in CSV_FORMATOS:
             try:
                 df = pd.read_csv(file, sep=sep, encoding=enc)
                 last_err = None
@@ -206,31 +770,125 @@ Responda APENAS com o nome exato da categoria (uma linha).
             except Exception as e:
                 last_err = e
                 # se for file-like, precisa voltar pro início antes de tentar de novo
-                if hasattr(file, "seek"):
-                    try:
-                        file.seek(0)
-                    except Exception:
-                        pass
+                self._rebobinar(file)
                 continue
 
         if last_err is not None:
             raise last_err
 
-        # normaliza nomes
-        df.columns = [c.strip().lower() for c in df.columns]
+        return self._normalizar_csv(df)
 
-        col_data = next((c for c in df.columns if "data" in c), None)
-        col_lanc = next((c for c in df.columns if "lan" in c or "descr" in c), None)
-        col_val = next((c for c in df.columns if "valor" in c or "amount" in c), None)
+    def ler_csv_cartao_chunks(self, file: FileLike, linhas: int = CSV_CHUNK_LINHAS) -> Iterator[pd.DataFrame]:
+        """
+        Mesmo resultado de `ler_csv_cartao`, mas em blocos de `linhas` linhas:
+        a memória fica limitada pelo tamanho do bloco, não do arquivo.
+        Separador/encoding são escolhidos pelas primeiras linhas.
+        """
+        escolhido = None
+        for sep, enc in CSV_FORMATOS:
+            self._rebobinar(file)
+            try:
+                amostra = pd.read_csv(file, sep=sep, encoding=enc, nrows=CSV_AMOSTRA_LINHAS)
+                self._normalizar_csv(amostra)
+            except Exception:
+                continue
+            escolhido = (sep, enc)
+            break
+
+        if escolhido is None:
+            raise ValueError("Não consegui identificar separador/encoding do CSV.")
+
+        sep, enc = escolhido
+        self._rebobinar(file)
+        # um byte inválido depois da amostra não derruba a leitura no meio do arquivo
+        with pd.read_csv(file, sep=sep, encoding=enc, encoding_errors="replace", chunksize=linhas) as leitor:
+            for bloco in leitor:
+                bloco = self._normalizar_csv(bloco)
+                if not bloco.empty:
+                    yield bloco
+
+    # ---------- OFX / QFX ----------
+    def _tags_ofx(self, file: FileLike):
+        """
+        Lê o OFX em blocos e gera (fechamento, TAG, texto) sem carregar o arquivo inteiro.
+        Funciona tanto para OFX 1.x (SGML, sem tags de fechamento) quanto 2.x (XML).
+        """
+        f = open(file, "rb") if isinstance(file, str) else file
+        try:
+            if hasattr(f, "seek"):
+                try:
+                    f.seek(0)
+                except Exception:
+                    pass
+
+            # bancos BR declaram CHARSET:1252 e às vezes mandam UTF-8:
+            # tenta UTF-8 e cai para cp1252 no primeiro byte inválido
+            decoder = codecs.getincrementaldecoder("utf-8")()
+
+            def decodifica(bloco, final=False):
+                nonlocal decoder
+                if isinstance(bloco, str):
+                    return bloco
+                try:
+                    return decoder.decode(bloco, final)
+                except UnicodeDecodeError:
+                    decoder = codecs.getincrementaldecoder("cp1252")(errors="replace")
+                    return decoder.decode(bloco, final)
+
+            buf = ""
+            bloco = f.read(OFX_CHUNK)
+            while bloco:
+                buf += decodifica(bloco)
+
+                # só processa até o último "<": a tag seguinte pode estar cortada
+                corte = buf.rfind("<")
+                if corte > 0:
+                    for m in OFX_TAG_RE.finditer(buf, 0, corte):
+                        yield m.group(1) == "/", m.group(2).upper(), m.group(3)
+                    buf = buf[corte:]
+
+                bloco = f.read(OFX_CHUNK)
+
+            buf += decodifica(b"", final=True)
+            for m in OFX_TAG_RE.finditer(buf):
+                yield m.group(1) == "/", m.group(2).upper(), m.group(3)
+        finally:
+            if isinstance(file, str):
+                f.close()
+
+    def ler_ofx_cartao(self, file: FileLike) -> pd.DataFrame:
+        """
+        Lê OFX/QFX do cartão e devolve o mesmo formato de `ler_csv_cartao`
+        (Data, Lançamento, Valor). Compras viram valor positivo e créditos negativo.
+        """
+        datas: List[str] = []
+        lancs: List[str] = []
+        valores: List[str] = []
 
-        if not all([col_data, col_lanc, col_val]):
-            raise ValueError(f"Não achei as colunas. Encontrei: {df.columns.tolist()}")
+        atual: Optional[Dict[str, str]] = None
 
-        df = df[[col_data, col_lanc, col_val]].copy()
-        df.columns = ["Data", "Lançamento", "Valor"]
+        def fecha():
+            datas.append(atual.get("DTPOSTED", "")[:8])
+            lancs.append(atual.get("MEMO") or atual.get("NAME") or "")
+            valores.append(atual.get("TRNAMT", ""))
 
-        df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
-        df["Valor"] = df["Valor"].apply(self._parse_valor)
+        for fechamento, tag, texto in self._tags_ofx(file):
+            if tag == "STMTTRN":
+                if atual is not None:
+                    fecha()
+                atual = None if fechamento else {}
+            elif atual is not None and not fechamento:
+                # SGML e XML escapam & e < no texto (ex.: "P&amp;G")
+                atual[tag] = html.unescape(texto.strip())
+
+        if atual is not None:
+            fecha()
+
+        df = pd.DataFrame({"Data": datas, "Lançamento": lancs, "Valor": valores})
+
+        df["Data"] = pd.to_datetime(df["Data"], format="%Y%m%d", errors="coerce")
+        # no OFX do cartão a compra vem negativa (débito na conta)
+        df["Valor"] = -pd.to_numeric(df["Valor"].str.replace(",", ".", regex=False), errors="coerce")
 
         df["Lançamento"] = (
             df["Lançamento"]
@@ -239,5 +897,12 @@ Responda APENAS com o nome exato da categoria (uma linha).
             .str.strip()
         )
 
+        df = df[df["Lançamento"] != ""]
         df = df.dropna(subset=["Data", "Lançamento", "Valor"]).reset_index(drop=True)
-        return df
\ No newline at end of file
+        return df
+
+    def ler_arquivo_cartao(self, file: FileLike) -> pd.DataFrame:
+        """Detecta o formato (OFX/QFX ou CSV) e chama o leitor certo."""
+        if eh_ofx(file):
+            return self.ler_ofx_cartao(file)
+        return self.ler_csv_cartao(file)
@@ -0,0 +1,126 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# aumento mínimo (relativo e absoluto) para marcar assinatura que subiu de preço
+LIMIAR_AUMENTO = 0.15
+LIMIAR_AUMENTO_MIN_R = 1.0
+# meses distintos para considerar um estabelecimento como recorrente (assinatura)
+MIN_MESES_RECORRENTE = 3
+JANELA_MESES = 3
+
+
+def _mes_ordinal(mes_ref: pd.Series) -> pd.Series:
+    d = pd.to_datetime(mes_ref.astype(str), format="%Y-%m", errors="coerce")
+    return d.dt.year * 12 + d.dt.month
+
+
+def _duplicadas(df: pd.DataFrame) -> pd.Series:
+    # mesmo estabelecimento, mesmo dia, mesmo valor e mesma parcela
+    chave = [df["_loja"], df["_dia"], df["Valor"].round(2), df["_parcela"]]
+    n = df.groupby(chave, dropna=False)["Valor"].transform("size")
+    return (n > 1) & (df["Valor"] > 0)
+
+
+def _aumentos(df: pd.DataFrame) -> pd.Series:
+    """Recorrentes (fora de parcelamento) cujo total do mês passou da mediana dos meses anteriores."""
+    avulsos = df[df["_parcela"].eq("") & (df["Valor"] > 0)]
+    if avulsos.empty:
+        return pd.Series(False, index=df.index)
+
+    mensal = avulsos.groupby(["_loja", "_mes"], as_index=False)["Valor"].sum().sort_values(["_loja", "_mes"])
+    mensal["_n_meses"] = mensal.groupby("_loja")["_mes"].transform("size")
+
+    anterior = mensal.groupby("_loja")["Valor"].shift()
+    mensal["_ref"] = (
+        anterior.groupby(mensal["_loja"])
+        .rolling(JANELA_MESES, min_periods=1)
+        .median()
+        .reset_index(level=0, drop=True)
+    )
+
+    mensal["_aumento"] = (
+        (mensal["_n_meses"] >= MIN_MESES_RECORRENTE)
+        & (mensal["Valor"] > mensal["_ref"] * (1 + LIMIAR_AUMENTO))
+        & ((mensal["Valor"] - mensal["_ref"]) >= LIMIAR_AUMENTO_MIN_R)
+    )
+
+    marcados = mensal.loc[mensal["_aumento"], ["_loja", "_mes"]].assign(_flag=True)
+    flag = df[["_loja", "_mes"]].merge(marcados, on=["_loja", "_mes"], how="left")["_flag"]
+    return pd.Series(flag.notna().to_numpy(), index=df.index) & df["_parcela"].eq("")
+
+
+def _parcelas_faltando(df: pd.DataFrame) -> pd.Series:
+    """Na mesma série (loja, nº de parcelas, valor), a parcela seguinte pulou número ou mês."""
+    parc = df[df["ParcelaTotal"].notna() & df["ParcelaAtual"].notna()]
+    if parc.empty:
+        return pd.Series(False, index=df.index)
+
+    serie = [parc["_loja"], parc["ParcelaTotal"], parc["Valor"].round(2)]
+    parc = parc.assign(_serie=parc.groupby(serie, dropna=False).ngroup())
+    parc = parc.sort_values(["_serie", "_mes", "ParcelaAtual"])
+
+    d_parcela = parc.groupby("_serie")["ParcelaAtual"].diff()
+    d_mes = parc.groupby("_serie")["_mes"].diff()
+
+    # d_parcela == 0 é a mesma parcela em duas compras iguais: não é buraco
+    gap = (d_parcela > 1) | ((d_parcela > 0) & (d_mes > d_parcela))
+    return gap.reindex(df.index, fill_value=False).astype(bool)
+
+
+def detectar_anomalias(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Marca linhas suspeitas em todo o histórico (todos os meses de uma vez),
+    só com groupby/rolling, sem loop por linha. Adiciona a coluna "Alerta"
+    ("" quando não há nada):
+      - cobrança duplicada no mesmo dia
+      - assinatura/recorrente com aumento de preço
+      - parcela faltando na série de parcelas
+    """
+    df = df.copy()
+    if df.empty or "MesRef" not in df.columns:
+        df["Alerta"] = ""
+        return df
+
+    loja = df["Lancamento_Limpo"] if "Lancamento_Limpo" in df.columns else df["Lançamento"]
+    df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce")
+    for c in ["ParcelaAtual", "ParcelaTotal"]:
+        if c not in df.columns:
+            df[c] = np.nan
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    df["_loja"] = loja.astype(str).str.upper().str.strip()
+    df["_dia"] = pd.to_datetime(df["Data"], errors="coerce").dt.normalize()
+    df["_mes"] = _mes_ordinal(df["MesRef"])
+    df["_parcela"] = df["Parcela"].fillna("").astype(str) if "Parcela" in df.columns else ""
+
+    alertas = [
+        (_duplicadas(df), "Cobrança duplicada no dia"),
+        (_aumentos(df), "Aumento de preço em recorrente"),
+        (_parcelas_faltando(df), "Parcela faltando na série"),
+    ]
+
+    texto = pd.Series("", index=df.index)
+    for mask, msg in alertas:
+        texto = texto.where(~mask, texto.where(texto.eq(""), texto + "; ") + msg)
+
+    df["Alerta"] = texto
+    return df.drop(columns=["_loja", "_dia", "_mes", "_parcela"])
+
+
+def detectar_anomalias_com_historico(df: pd.DataFrame, historico: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Alertas só das linhas de `df` (ex.: o mês de um job), comparando com o `historico`
+    (o backup): os meses de `df` substituem os mesmos meses do histórico, como ao salvar.
+    """
+    if historico is None or historico.empty or "MesRef" not in df.columns or "MesRef" not in historico.columns:
+        return detectar_anomalias(df)
+
+    meses = df["MesRef"].astype(str).unique()
+    outros = historico[~historico["MesRef"].astype(str).isin(meses)]
+    base = pd.concat([outros.reset_index(drop=True), df.reset_index(drop=True)], keys=["historico", "atual"])
+
+    df = df.copy()
+    df["Alerta"] = detectar_anomalias(base).loc["atual", "Alerta"].to_numpy()
+    return df
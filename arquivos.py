@@ -0,0 +1,60 @@
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Callable
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def bloqueio(path: str):
+    """
+    Lock exclusivo (entre processos e threads) associado a `path`,
+    usando um arquivo `<path>.lock` ao lado.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def escrever_atomico(path: str, escrever: Callable[[str], None]):
+    """
+    Grava num arquivo temporário do mesmo diretório e renomeia por cima de `path`.
+    Quem lê nunca vê arquivo pela metade. Não pega o lock (use `bloqueio`).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        escrever(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def salvar_atomico(path: str, escrever: Callable[[str], None]):
+    """Lock + escrita atômica."""
+    with bloqueio(path):
+        escrever_atomico(path, escrever)
+
+
+def salvar_csv_atomico(df: pd.DataFrame, path: str):
+    salvar_atomico(path, lambda tmp: df.to_csv(tmp, index=False))
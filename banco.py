@@ -0,0 +1,271 @@
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from arquivos import salvar_csv_atomico
+
+DB_PATH = "bkp/financas.db"
+CSV_RECEITAS = "bkp/receitas.csv"
+CSV_DESPESA_FIXA = "bkp/despesa_fixa.csv"
+
+COLS_RECEITAS = [
+    "ID", "Tipo", "Pessoa", "Valor", "Vezes", "Data", "Recebido",
+    "Observacao", "ParcelaAtual", "ParcelaTotal", "MesRef",
+]
+COLS_DESPESA_FIXA = ["ID", "Tipo", "Valor"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receitas (
+    ID           TEXT PRIMARY KEY,
+    Tipo         TEXT NOT NULL DEFAULT 'Reembolso',
+    Pessoa       TEXT NOT NULL DEFAULT '',
+    Valor        REAL NOT NULL DEFAULT 0,
+    Vezes        INTEGER NOT NULL DEFAULT 1,
+    Data         TEXT,
+    Recebido     INTEGER NOT NULL DEFAULT 0,
+    Observacao   TEXT NOT NULL DEFAULT '',
+    ParcelaAtual INTEGER,
+    ParcelaTotal INTEGER,
+    MesRef       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_receitas_mesref ON receitas (MesRef);
+
+CREATE TABLE IF NOT EXISTS despesas_fixas (
+    ID    TEXT PRIMARY KEY,
+    Tipo  TEXT NOT NULL,
+    Valor REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+@contextmanager
+def conectar(db_path: str = DB_PATH):
+    """
+    Abre o banco (criando o schema se preciso) e faz commit/rollback no final.
+    Na primeira criação importa os CSVs antigos do mesmo diretório.
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+        if con.execute("PRAGMA user_version").fetchone()[0] == 0:
+            _criar(con, db_path)
+
+        yield con
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+
+
+def _criar(con: sqlite3.Connection, db_path: str):
+    """
+    Schema + importação dos CSVs antigos numa única transação BEGIN IMMEDIATE:
+    dois processos abrindo o banco novo ao mesmo tempo não migram duas vezes.
+    """
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        # outro processo pode ter migrado entre a primeira checagem e o lock
+        if con.execute("PRAGMA user_version").fetchone()[0] == 0:
+            # executescript faria COMMIT antes de rodar: um comando por vez
+            for comando in filter(str.strip, SCHEMA.split(";")):
+                con.execute(comando)
+            _migrar_csvs(con, db_path)
+            con.execute("PRAGMA user_version = 1")
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+
+
+# ---------- Normalização ----------
+def _none(v):
+    return None if pd.isna(v) else v
+
+
+def _int_ou_none(v):
+    return None if pd.isna(v) else int(v)
+
+
+def normalizar_receitas(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante colunas/tipos das receitas (aceita CSVs antigos, com Status e sem ID)."""
+    df = df.copy()
+
+    if "ID" not in df.columns:
+        df.insert(0, "ID", [str(uuid.uuid4()) for _ in range(len(df))])
+
+    if "Recebido" not in df.columns:
+        # se existia Status antigo, tenta converter
+        if "Status" in df.columns:
+            df["Recebido"] = df["Status"].astype(str).str.strip().str.upper().eq("RECEBIDO")
+            df = df.drop(columns=["Status"])
+        else:
+            df["Recebido"] = False
+
+    for c in ["Observacao", "Pessoa"]:
+        if c not in df.columns:
+            df[c] = ""
+    for c in ["ParcelaAtual", "ParcelaTotal"]:
+        if c not in df.columns:
+            df[c] = pd.NA
+
+    df["Tipo"] = df.get("Tipo", "Reembolso").fillna("Reembolso")
+    df["Pessoa"] = df["Pessoa"].fillna("")
+    df["Valor"] = pd.to_numeric(df.get("Valor"), errors="coerce").fillna(0.0)
+    df["Vezes"] = pd.to_numeric(df.get("Vezes"), errors="coerce").fillna(1).astype(int)
+    df["Data"] = pd.to_datetime(df.get("Data"), errors="coerce").dt.date
+    df["Recebido"] = df["Recebido"].where(df["Recebido"].notna(), False).astype(bool)
+    df["Observacao"] = df["Observacao"].fillna("")
+    df["ParcelaAtual"] = pd.to_numeric(df["ParcelaAtual"], errors="coerce")
+    df["ParcelaTotal"] = pd.to_numeric(df["ParcelaTotal"], errors="coerce")
+    df["MesRef"] = pd.to_datetime(df["Data"], errors="coerce").dt.strftime("%Y-%m")
+
+    return df[COLS_RECEITAS]
+
+
+def _linhas_receitas(df: pd.DataFrame) -> List[tuple]:
+    df = normalizar_receitas(df)
+    return [
+        (
+            r.ID, r.Tipo, r.Pessoa, float(r.Valor), int(r.Vezes),
+            r.Data.isoformat() if pd.notna(r.Data) else None,
+            int(bool(r.Recebido)), r.Observacao,
+            _int_ou_none(r.ParcelaAtual),
+            _int_ou_none(r.ParcelaTotal),
+            _none(r.MesRef),
+        )
+        for r in df.itertuples(index=False)
+    ]
+
+
+def _linhas_despesa_fixa(df: pd.DataFrame) -> List[tuple]:
+    df = df.copy()
+    if "ID" not in df.columns:
+        df.insert(0, "ID", [str(uuid.uuid4()) for _ in range(len(df))])
+    df["Tipo"] = df.get("Tipo", "Reembolso").fillna("Reembolso")
+    df["Valor"] = pd.to_numeric(df.get("Valor"), errors="coerce").fillna(0.0)
+    return [(r.ID, r.Tipo, float(r.Valor)) for r in df[COLS_DESPESA_FIXA].itertuples(index=False)]
+
+
+def _csv_ao_lado(db_path: str, csv_padrao: str) -> str:
+    return os.path.join(os.path.dirname(db_path) or ".", os.path.basename(csv_padrao))
+
+
+def _migrar_csvs(con: sqlite3.Connection, db_path: str):
+    csv_rec = _csv_ao_lado(db_path, CSV_RECEITAS)
+    csv_fix = _csv_ao_lado(db_path, CSV_DESPESA_FIXA)
+    # roda dentro da transação de _criar
+    if os.path.exists(csv_rec):
+        _inserir(con, "receitas", COLS_RECEITAS, _linhas_receitas(pd.read_csv(csv_rec)))
+    if os.path.exists(csv_fix):
+        _inserir(con, "despesas_fixas", COLS_DESPESA_FIXA, _linhas_despesa_fixa(pd.read_csv(csv_fix)))
+
+
+def _inserir(con: sqlite3.Connection, tabela: str, cols: List[str], linhas: Iterable[tuple]):
+    placeholders = ", ".join("?" for _ in cols)
+    con.executemany(
+        f"INSERT OR REPLACE INTO {tabela} ({', '.join(cols)}) VALUES ({placeholders})",
+        linhas,
+    )
+
+
+# ---------- Receitas ----------
+def carregar_receitas(db_path: str = DB_PATH) -> pd.DataFrame:
+    with conectar(db_path) as con:
+        df = pd.read_sql_query(f"SELECT {', '.join(COLS_RECEITAS)} FROM receitas", con)
+    return normalizar_receitas(df)
+
+
+def inserir_receitas(rows: List[Dict], db_path: str = DB_PATH):
+    """Insere várias receitas (ex.: N parcelas) numa única transação."""
+    linhas = _linhas_receitas(pd.DataFrame(rows))
+    with conectar(db_path) as con:
+        _inserir(con, "receitas", COLS_RECEITAS, linhas)
+
+
+def atualizar_receitas(alteradas: pd.DataFrame, db_path: str = DB_PATH):
+    """
+    Atualiza só as linhas alteradas (colunas ID, Recebido, Observacao).
+    Recebido vira um UPDATE ... WHERE ID IN (...) por valor.
+    """
+    if alteradas.empty:
+        return
+
+    with conectar(db_path) as con:
+        if "Recebido" in alteradas.columns:
+            for valor, grupo in alteradas.groupby(alteradas["Recebido"].astype(bool)):
+                ids = grupo["ID"].tolist()
+                placeholders = ", ".join("?" for _ in ids)
+                con.execute(
+                    f"UPDATE receitas SET Recebido = ? WHERE ID IN ({placeholders})",
+                    [int(valor), *ids],
+                )
+
+        if "Observacao" in alteradas.columns:
+            con.executemany(
+                "UPDATE receitas SET Observacao = ? WHERE ID = ?",
+                [(str(o) if pd.notna(o) else "", i) for i, o in zip(alteradas["ID"], alteradas["Observacao"])],
+            )
+
+
+def receitas_dos_meses(meses: List[str], db_path: str = DB_PATH) -> pd.DataFrame:
+    """Só as receitas dos meses pedidos (usa o índice em MesRef)."""
+    if not meses:
+        return normalizar_receitas(pd.DataFrame(columns=COLS_RECEITAS))
+
+    placeholders = ", ".join("?" for _ in meses)
+    with conectar(db_path) as con:
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(COLS_RECEITAS)} FROM receitas WHERE MesRef IN ({placeholders})",
+            con,
+            params=list(meses),
+        )
+    return normalizar_receitas(df)
+
+
+# ---------- Despesas fixas ----------
+def carregar_despesas_fixas(db_path: str = DB_PATH) -> pd.DataFrame:
+    with conectar(db_path) as con:
+        return pd.read_sql_query(f"SELECT {', '.join(COLS_DESPESA_FIXA)} FROM despesas_fixas", con)
+
+
+def inserir_despesas_fixas(rows: List[Dict], db_path: str = DB_PATH):
+    linhas = _linhas_despesa_fixa(pd.DataFrame(rows))
+    with conectar(db_path) as con:
+        _inserir(con, "despesas_fixas", COLS_DESPESA_FIXA, linhas)
+
+
+# ---------- Backup CSV ----------
+def importar_csv(tabela: str, csv_path: str, db_path: str = DB_PATH):
+    """Importa (upsert por ID) um CSV de backup para a tabela."""
+    df = pd.read_csv(csv_path)
+    if tabela == "receitas":
+        cols, linhas = COLS_RECEITAS, _linhas_receitas(df)
+    elif tabela == "despesas_fixas":
+        cols, linhas = COLS_DESPESA_FIXA, _linhas_despesa_fixa(df)
+    else:
+        raise ValueError(f"Tabela desconhecida: {tabela}")
+
+    with conectar(db_path) as con:
+        _inserir(con, tabela, cols, linhas)
+
+
+def exportar_csv(tabela: str, csv_path: Optional[str] = None, db_path: str = DB_PATH) -> str:
+    """Grava a tabela inteira num CSV de backup (por padrão, o CSV antigo ao lado do banco)."""
+    if tabela == "receitas":
+        df = carregar_receitas(db_path)
+        csv_path = csv_path or _csv_ao_lado(db_path, CSV_RECEITAS)
+    elif tabela == "despesas_fixas":
+        df = carregar_despesas_fixas(db_path)
+        csv_path = csv_path or _csv_ao_lado(db_path, CSV_DESPESA_FIXA)
+    else:
+        raise ValueError(f"Tabela desconhecida: {tabela}")
+
+    salvar_csv_atomico(df, csv_path)
+    return csv_path
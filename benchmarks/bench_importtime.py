@@ -0,0 +1,135 @@
+"""
+Tempo de import a frio (estilo `python -X importtime`) dos caminhos do app.
+
+Os cenários saem das próprias páginas: para main.py e cada pages/*.py, os imports
+de nível de módulo são lidos do arquivo e executados num processo novo (o corpo da
+página não roda, ele precisa do runtime do Streamlit). Assim a lista nunca fica
+desatualizada. Mostra o tempo total de import e se a pilha do LLM (langchain/groq)
+foi carregada.
+
+Com `--referencia <commit>`, mede também a árvore daquele commit (extraída com
+`git archive` numa pasta temporária) e mostra antes x depois.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_importtime.py [--repeticoes 5] [--referencia 90d9696]
+"""
+import argparse
+import ast
+import glob
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# cenários que não são páginas
+EXTRAS = {
+    "agente (sem categorizar)": ["agente"],
+    # referência: o que a primeira categorização passa a pagar
+    "pilha do LLM": ["dotenv", "langchain_core.prompts", "langchain_core.output_parsers", "langchain_groq"],
+}
+
+PILHA_LLM = ("langchain", "langchain_core", "langchain_groq", "groq", "dotenv")
+
+LINHA_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def imports_da_pagina(path: str) -> List[str]:
+    """Módulos importados no nível do módulo do script (sem imports relativos)."""
+    with open(path, encoding="utf-8") as f:
+        arvore = ast.parse(f.read(), filename=path)
+
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos += [a.name for a in no.names]
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            modulos.append(no.module)
+    return list(dict.fromkeys(modulos))
+
+
+def cenarios(raiz: str) -> Dict[str, List[str]]:
+    paginas = ["main.py"] + sorted(os.path.relpath(p, raiz) for p in glob.glob(os.path.join(raiz, "pages", "*.py")))
+    res = {p: imports_da_pagina(os.path.join(raiz, p)) for p in paginas if os.path.exists(os.path.join(raiz, p))}
+    res.update(EXTRAS)
+    return res
+
+
+def medir(modulos: List[str], raiz: str = RAIZ) -> Tuple[int, bool]:
+    """Roda `python -X importtime -c 'import ...'` e devolve (total_us, carregou_llm)."""
+    cmd = [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {m}" for m in modulos)]
+    proc = subprocess.run(cmd, cwd=raiz, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    total = 0
+    carregou_llm = False
+    for linha in proc.stderr.splitlines():
+        m = LINHA_RE.match(linha)
+        if not m:
+            continue
+        cumulativo, recuo, nome = int(m.group(2)), m.group(3), m.group(4)
+        # só os imports de nível mais alto (o cumulativo deles já inclui os filhos)
+        if len(recuo) == 1:
+            total += cumulativo
+        if nome.split(".")[0] in PILHA_LLM:
+            carregou_llm = True
+
+    return total, carregou_llm
+
+
+def medir_arvore(raiz: str, repeticoes: int) -> Dict[str, Optional[Tuple[float, bool]]]:
+    """Cenário -> (mediana em ms, carregou LLM?); None se o import falhou."""
+    res = {}
+    for nome, modulos in cenarios(raiz).items():
+        try:
+            amostras = [medir(modulos, raiz) for _ in range(repeticoes)]
+        except RuntimeError:
+            res[nome] = None
+            continue
+        res[nome] = (statistics.median(t / 1000 for t, _ in amostras), any(l for _, l in amostras))
+    return res
+
+
+def extrair_commit(commit: str, destino: str):
+    arquivo = subprocess.run(["git", "archive", commit], cwd=RAIZ, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", destino], input=arquivo, check=True)
+
+
+def _fmt(r: Optional[Tuple[float, bool]]) -> str:
+    if r is None:
+        return f"{'-':>10} {'':>4}"
+    return f"{r[0]:>10.1f} {'LLM' if r[1] else '':>4}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--referencia", help="commit para comparar (ex.: o anterior à mudança)")
+    args = parser.parse_args()
+
+    atual = medir_arvore(RAIZ, args.repeticoes)
+
+    if not args.referencia:
+        print(f"{'cenário':<28} {'mediana (ms)':>10}")
+        for nome, r in atual.items():
+            print(f"{nome:<28} {_fmt(r)}")
+        return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        extrair_commit(args.referencia, pasta)
+        antes = medir_arvore(pasta, args.repeticoes)
+
+    print(f"{'cenário (mediana, ms)':<28} {args.referencia[:10]:>15} {'atual':>15} {'diferença':>10}")
+    for nome in list(dict.fromkeys([*antes, *atual])):
+        a, d = antes.get(nome), atual.get(nome)
+        dif = f"{d[0] - a[0]:>+10.1f}" if a and d else f"{'':>10}"
+        print(f"{nome:<28} {_fmt(a)} {_fmt(d)} {dif}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Pico de memória (RSS) do pipeline com o arquivo inteiro vs em blocos.
+
+Gera um CSV sintético grande (export consolidado de vários anos) e roda cada
+modo num processo novo, para o pico de um não contaminar o outro. O LLM é
+trocado por uma cadeia local que responde "Outros": aqui só interessa memória.
+
+Uso (na raiz do projeto; só Linux/macOS, usa o módulo `resource`):
+    python benchmarks/bench_memoria.py [--linhas 500000] [--unicos 5000] [--bloco 50000]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODOS = ["inteiro", "blocos"]
+ACAO = "Ler CSV + parcelas + categorizar"
+
+
+def gerar_csv(path: str, linhas: int, unicos: int, seed: int = 42):
+    rng = random.Random(seed)
+    lojas = [f"LOJA {i:05d} SAO PAULO BRA" for i in range(unicos)]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("data,lançamento,valor\n")
+        for _ in range(linhas):
+            loja = rng.choice(lojas)
+            if rng.random() < 0.2:
+                total = rng.randint(2, 12)
+                loja = f"{loja}{rng.randint(1, total):02d}/{total:02d}"
+            f.write(f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},{loja},{rng.uniform(-50, 900):.2f}\n")
+
+
+def _rss_mb() -> float:
+    import resource
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux devolve KB, macOS devolve bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+class _CadeiaLocal:
+    def batch(self, entradas, config=None):
+        return ["Outros"] * len(entradas)
+
+
+def _medir(modo: str, csv: str, bloco: int):
+    """Roda dentro do processo filho (cwd temporário: cache/backup não tocam o projeto)."""
+    sys.path.insert(0, RAIZ)
+    from agente import AgenteCartao, AgenteCartaoConfig
+    from pipeline import executar_pipeline, executar_pipeline_chunks
+
+    agente = AgenteCartao(AgenteCartaoConfig(sleep_seconds=0, batch_size=500))
+    agente.chain = _CadeiaLocal()
+    base = _rss_mb()
+
+    t0 = time.perf_counter()
+    saida = os.path.join(os.getcwd(), "saida.csv")
+    backup = os.path.join(os.getcwd(), "finances_cartao.csv")
+    if modo == "inteiro":
+        df = executar_pipeline(agente, csv, ACAO, False, "2024-12", backup)
+        df.to_csv(saida, index=False)
+        n = len(df)
+    else:
+        n = executar_pipeline_chunks(agente, csv, ACAO, False, "2024-12", backup, saida, linhas=bloco)
+
+    print(json.dumps({"linhas": n, "tempo_s": time.perf_counter() - t0, "base_mb": base, "pico_mb": _rss_mb()}))
+
+
+def medir(modo: str, csv: str, bloco: int, pasta: str):
+    cmd = [sys.executable, os.path.abspath(__file__), "--_modo", modo, "--_csv", csv, "--bloco", str(bloco)]
+    proc = subprocess.run(cmd, cwd=pasta, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=500_000)
+    parser.add_argument("--unicos", type=int, default=5_000)
+    parser.add_argument("--bloco", type=int, default=50_000)
+    parser.add_argument("--_modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--_csv", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._modo:
+        _medir(args._modo, args._csv, args.bloco)
+        return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        csv = os.path.join(pasta, "export.csv")
+        gerar_csv(csv, args.linhas, args.unicos)
+        tamanho = os.path.getsize(csv) / (1024 * 1024)
+        print(f"CSV sintético: {args.linhas} linhas, {args.unicos} descrições, {tamanho:.1f} MB; bloco = {args.bloco} linhas\n")
+
+        print(f"{'modo':<10} {'linhas':>9} {'tempo (s)':>10} {'RSS base (MB)':>14} {'RSS pico (MB)':>14} {'pico - base':>12}")
+        for modo in MODOS:
+            trabalho = os.path.join(pasta, modo)
+            os.makedirs(trabalho)
+            try:
+                r = medir(modo, csv, args.bloco, trabalho)
+            except RuntimeError as e:
+                print(f"{modo:<10} erro: {e}")
+                continue
+            print(
+                f"{modo:<10} {r['linhas']:>9} {r['tempo_s']:>10.1f} {r['base_mb']:>14.0f} "
+                f"{r['pico_mb']:>14.0f} {r['pico_mb'] - r['base_mb']:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+from typing import Dict
+
+import pandas as pd
+
+from arquivos import bloqueio, escrever_atomico
+from categorias import validar_categoria
+from workspace import COMPARTILHADO_DIR
+
+CACHE_PATH = os.path.join(COMPARTILHADO_DIR, "categorias.csv")
+
+
+def carregar_cache(path: str = CACHE_PATH) -> Dict[str, str]:
+    """
+    Cache compartilhado entre workspaces: Lancamento_Limpo -> Categoria.
+    Para os workspaces ele é só leitura; novas entradas entram via `atualizar_cache`.
+    Categorias fora da lista oficial são corrigidas por `validar_categoria` ou descartadas.
+    """
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, dtype=str).dropna()
+    oficial = {c: validar_categoria(c)[0] for c in df["Categoria"].unique()}
+    df["Categoria"] = df["Categoria"].map(oficial)
+    df = df.dropna(subset=["Categoria"])
+    return dict(zip(df["Lancamento_Limpo"], df["Categoria"]))
+
+
+def atualizar_cache(novos: Dict[str, str], path: str = CACHE_PATH) -> int:
+    """
+    Acrescenta descrições ainda não conhecidas (quem gravou primeiro vence).
+    Retorna quantas entradas foram adicionadas.
+    """
+    if not novos:
+        return 0
+
+    with bloqueio(path):
+        atual = carregar_cache(path)
+        add = {k: v for k, v in novos.items() if k and v and k not in atual}
+        if not add:
+            return 0
+
+        atual.update(add)
+        df = pd.DataFrame({"Lancamento_Limpo": list(atual.keys()), "Categoria": list(atual.values())})
+        escrever_atomico(path, lambda tmp: df.to_csv(tmp, index=False))
+
+    return len(add)
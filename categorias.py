@@ -0,0 +1,100 @@
+import difflib
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+# fonte única: a lista do prompt do agente sai daqui (e só elas podem ir para a coluna Categoria)
+CATEGORIAS: List[str] = [
+    "Moradia",
+    "Contas da casa",
+    "Internet & Telefone",
+    "Streaming/Assinaturas",
+    "Carro",
+    "Transporte",
+    "Mercado",
+    "Delivery/Restaurantes",
+    "Saúde",
+    "Educação",
+    "Pets",
+    "Beleza",
+    "Compras & Casa",
+    "Lazer",
+    "Bancos & Tarifas",
+    "Outros",
+    "Reembolsos & Créditos",
+]
+
+CATEGORIA_PADRAO = "Outros"
+
+# similaridade mínima (difflib) para corrigir erro de digitação do modelo
+CORTE_FUZZY = 0.85
+
+# regras do prompt que dá para aplicar sem LLM (fallback local): padrão -> categoria.
+# \b no começo evita falso positivo no meio de palavra (PRAIA, UBERLANDIA)
+REGRAS_LOCAIS = [
+    (r"\b(DROGASIL|DROGARIA|DROGA ?RAIA|FARMACIA|UNIMED|UNIODONTO|ODONTOPREV)", "Saúde"),
+    (r"\b(ANUIDADE|JUROS|MULTA|IOF|ENCARGO|ROTATIVO|PARCELAMEN\w* FATURA|TARIFA)\b", "Bancos & Tarifas"),
+    (r"\b(NETFLIX|SPOTIFY|DISNEY|PRIME VIDEO|HBO|CANVA|GLOBOPLAY|MICROSOFT|APPLE)", "Streaming/Assinaturas"),
+    (r"\b(UBER|99|IFOOD|RAPPI)\b", "Delivery/Restaurantes"),
+    (r"\b(ASIMOV|PASSEI DIRETO)", "Educação"),
+    (r"\b(MERCADO ?LIVRE)", "Compras & Casa"),
+    (r"\b(PETZ|AGRO)", "Pets"),
+]
+_REGRAS_RE = [(re.compile(p), c) for p, c in REGRAS_LOCAIS]
+
+APARAR = "\"'`“”‘’*.;:! "
+PREFIXO_RE = re.compile(r"^(categoria|resposta)\s*:\s*", re.IGNORECASE)
+
+
+def _chave(texto: str) -> str:
+    """Minúsculas, sem acento e só letras/dígitos: "Saúde." e "saude" viram a mesma chave."""
+    s = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "", s.lower())
+
+
+_POR_CHAVE: Dict[str, str] = {_chave(c): c for c in CATEGORIAS}
+
+
+def limpar_resposta(resposta: str) -> str:
+    """Primeira linha não vazia, sem marcador de lista, aspas, prefixo "Categoria:" e ponto final."""
+    linhas = [l.strip() for l in str(resposta).splitlines() if l.strip()]
+    s = linhas[0] if linhas else ""
+    s = s.lstrip("-•> ").strip(APARAR)
+    return PREFIXO_RE.sub("", s).strip(APARAR)
+
+
+def validar_categoria(resposta: str) -> Tuple[Optional[str], bool]:
+    """
+    (categoria oficial, ajustada?) para a resposta do LLM, ou (None, False) se
+    não dá para saber qual é. Tenta, nessa ordem: igual após normalizar, uma
+    única categoria citada dentro da resposta, e a mais parecida (difflib).
+    """
+    limpa = limpar_resposta(resposta)
+    if limpa in CATEGORIAS:
+        return limpa, False
+
+    chave = _chave(limpa)
+    if not chave:
+        return None, False
+    if chave in _POR_CHAVE:
+        return _POR_CHAVE[chave], True
+
+    # ex.: "A categoria é Mercado"
+    citadas = {c for k, c in _POR_CHAVE.items() if k in chave}
+    if len(citadas) == 1:
+        return citadas.pop(), True
+
+    parecidas = difflib.get_close_matches(chave, list(_POR_CHAVE), n=1, cutoff=CORTE_FUZZY)
+    if parecidas:
+        return _POR_CHAVE[parecidas[0]], True
+
+    return None, False
+
+
+def categoria_por_regras(texto: str) -> Optional[str]:
+    """Categoria pelas regras fixas do prompt (sem LLM), ou None se nenhuma se aplica."""
+    s = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii").upper()
+    for padrao, categoria in _REGRAS_RE:
+        if padrao.search(s):
+            return categoria
+    return None
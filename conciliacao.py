@@ -0,0 +1,163 @@
+import re
+
+import pandas as pd
+
+import banco
+import repositorio
+
+# crédito no cartão até N dias antes/depois da data prevista do reembolso
+JANELA_DIAS = 10
+# diferença aceita no valor (centavos), para arredondamento de quem pagou
+TOLERANCIA_CENTAVOS = 0
+
+# anotação gravada em Observacao; também marca o crédito como já usado.
+# Notas antigas não têm o valor: vale o do próprio reembolso
+NOTA = "Conciliado: {lanc} em {data} ({valor:.2f})"
+NOTA_RE = re.compile(
+    r"Conciliado: (?P<lanc>.+?) em (?P<data>\d{2}/\d{2}/\d{4})(?: \((?P<valor>\d+\.\d{2})\))?"
+)
+
+COLS_PROPOSTA = [
+    "ID", "Pessoa", "Data", "Valor", "Observacao",
+    "DataCredito", "Lançamento", "ValorCredito", "MesRefCredito", "Dias",
+]
+
+
+def _ja_usados(receitas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Quantos créditos de cada (Lançamento, data, centavos) já foram usados por
+    conciliações anteriores, contando as notas. Créditos idênticos no mesmo dia
+    (duas corridas de R$ 20) são distintos: cada nota consome só um deles.
+    """
+    usados = receitas["Observacao"].fillna("").astype(str).str.extractall(NOTA_RE)
+    if usados.empty:
+        return pd.DataFrame(columns=["Lançamento", "DataCredito", "_cent", "_usados"])
+
+    valor_receita = receitas["Valor"].reindex(usados.index.get_level_values(0)).to_numpy()
+    usados = pd.DataFrame({
+        "Lançamento": usados["lanc"].str.strip(),
+        "DataCredito": pd.to_datetime(usados["data"], format="%d/%m/%Y", errors="coerce"),
+        "_cent": _centavos(pd.to_numeric(usados["valor"]).fillna(pd.Series(valor_receita, index=usados.index))),
+    }).dropna()
+    return (
+        usados.astype({"_cent": "int64"})
+        .groupby(["Lançamento", "DataCredito", "_cent"]).size().rename("_usados").reset_index()
+    )
+
+
+def _centavos(valor: pd.Series) -> pd.Series:
+    return (pd.to_numeric(valor, errors="coerce").abs() * 100).round()
+
+
+def propor_conciliacao(
+    receitas: pd.DataFrame,
+    creditos: pd.DataFrame,
+    janela_dias: int = JANELA_DIAS,
+    tolerancia_centavos: int = TOLERANCIA_CENTAVOS,
+) -> pd.DataFrame:
+    """
+    Casa reembolsos pendentes com créditos do cartão de mesmo valor (± tolerância)
+    dentro da janela de datas, todos os meses de uma vez: merge_asof por data,
+    agrupado pelo valor em centavos. Cada crédito casa com no máximo um reembolso.
+    """
+    pend = receitas[(receitas["Tipo"] == "Reembolso") & ~receitas["Recebido"].astype(bool)]
+    pend = pend.assign(_data=pd.to_datetime(pend["Data"], errors="coerce"), _cent=_centavos(pend["Valor"]))
+    pend = pend.dropna(subset=["_data", "_cent"]).astype({"_cent": "int64"})
+
+    cred = pd.DataFrame({
+        "_credito": creditos.index,
+        "DataCredito": pd.to_datetime(creditos["Data"], errors="coerce"),
+        "Lançamento": creditos["Lançamento"].astype(str),
+        "ValorCredito": pd.to_numeric(creditos["Valor"], errors="coerce"),
+        "MesRefCredito": creditos["MesRef"].astype(str) if "MesRef" in creditos.columns else "",
+        "_cent": _centavos(creditos["Valor"]),
+    }).dropna(subset=["DataCredito", "_cent"]).astype({"_cent": "int64"})
+
+    # um crédito já conciliado não paga outro reembolso: de cada grupo de créditos
+    # idênticos saem os primeiros N, N = notas que já citam aquele crédito
+    usados = _ja_usados(receitas)
+    if not usados.empty:
+        chave = ["Lançamento", "DataCredito", "_cent"]
+        ordem = cred.sort_values("_credito").groupby(chave).cumcount().reindex(cred.index)
+        n_usados = cred[chave].merge(usados, how="left", on=chave)["_usados"].fillna(0).to_numpy()
+        cred = cred[ordem.to_numpy() >= n_usados]
+
+    if pend.empty or cred.empty:
+        return pd.DataFrame(columns=COLS_PROPOSTA)
+
+    # tolerância no valor: o crédito entra uma vez para cada valor aceito
+    if tolerancia_centavos:
+        cred = pd.concat(
+            [cred.assign(_cent=cred["_cent"] + d) for d in range(-tolerancia_centavos, tolerancia_centavos + 1)],
+            ignore_index=True,
+        )
+    cred = cred.sort_values("DataCredito")
+
+    # cada rodada casa 1-para-1 (crédito = linha do backup); quem perdeu a disputa
+    # tenta de novo com os créditos que sobraram, até nada mais casar
+    casados = []
+    while not pend.empty and not cred.empty:
+        m = pd.merge_asof(
+            pend.sort_values("_data"),
+            cred,
+            left_on="_data",
+            right_on="DataCredito",
+            by="_cent",
+            direction="nearest",
+            tolerance=pd.Timedelta(days=janela_dias),
+        ).dropna(subset=["_credito"])
+        if m.empty:
+            break
+
+        # disputa pelo mesmo crédito: fica o de valor mais exato e data mais próxima
+        m["_dif"] = (m["ValorCredito"].abs() - m["Valor"]).abs()
+        m["Dias"] = (m["DataCredito"] - m["_data"]).dt.days
+        m = m.sort_values(["_dif", "Dias"], key=lambda s: s.abs()).drop_duplicates("_credito")
+
+        casados.append(m)
+        pend = pend[~pend["ID"].isin(m["ID"])]
+        cred = cred[~cred["_credito"].isin(m["_credito"])]
+
+    if not casados:
+        return pd.DataFrame(columns=COLS_PROPOSTA)
+
+    res = pd.concat(casados, ignore_index=True)
+    res["DataCredito"] = res["DataCredito"].dt.date
+    return res.sort_values(["Data", "Pessoa"])[COLS_PROPOSTA].reset_index(drop=True)
+
+
+def aplicar_conciliacao(propostas: pd.DataFrame, db_path: str = banco.DB_PATH) -> int:
+    """Marca os reembolsos como recebidos, anotando o crédito na observação."""
+    if propostas.empty:
+        return 0
+
+    datas = pd.to_datetime(propostas["DataCredito"]).dt.strftime("%d/%m/%Y")
+    valores = pd.to_numeric(propostas["ValorCredito"], errors="coerce").abs()
+    nota = pd.Series(
+        [NOTA.format(lanc=l, data=d, valor=v) for l, d, v in zip(propostas["Lançamento"].astype(str), datas, valores)],
+        index=propostas.index,
+    )
+    obs = propostas["Observacao"].fillna("").astype(str)
+    alteradas = pd.DataFrame({
+        "ID": propostas["ID"],
+        "Recebido": True,
+        "Observacao": obs.where(obs.eq(""), obs + " · ") + nota,
+    })
+    repositorio.atualizar_receitas(alteradas, db_path)
+    return len(alteradas)
+
+
+def conciliar(
+    db_path: str,
+    backup_path: str,
+    aplicar: bool = False,
+    janela_dias: int = JANELA_DIAS,
+    tolerancia_centavos: int = TOLERANCIA_CENTAVOS,
+) -> pd.DataFrame:
+    """Propõe (e, com `aplicar=True`, já grava) a conciliação de todo o histórico."""
+    propostas = propor_conciliacao(
+        repositorio.carregar_receitas(db_path), repositorio.creditos_cartao(backup_path), janela_dias, tolerancia_centavos
+    )
+    if aplicar:
+        aplicar_conciliacao(propostas, db_path)
+    return propostas
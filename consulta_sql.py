@@ -0,0 +1,175 @@
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import duckdb
+import pandas as pd
+
+import banco
+import repositorio
+from metricas import METRICAS
+
+# só leitura: uma instrução, começando por um destes comandos
+COMANDOS_PERMITIDOS = ("SELECT", "WITH", "FROM", "DESCRIBE", "SUMMARIZE", "SHOW", "PIVOT", "UNPIVOT", "VALUES")
+LIMITE_LINHAS = 10_000
+
+# tipos fixos: coluna toda vazia (ex.: ParcelaAtual sem parcelados) viraria DOUBLE
+TIPOS_CARTAO = {
+    "Data": "DATE", "Lançamento": "VARCHAR", "Valor": "DOUBLE", "MesRef": "VARCHAR",
+    "ParcelaAtual": "BIGINT", "ParcelaTotal": "BIGINT", "Parcela": "VARCHAR",
+    "Lancamento_Limpo": "VARCHAR", "Categoria": "VARCHAR", "Alerta": "VARCHAR",
+}
+TIPOS_CUBO = {"MesRef": "VARCHAR", "Origem": "VARCHAR", "Categoria": "VARCHAR", "Valor": "DOUBLE", "Qtde": "BIGINT"}
+
+EXEMPLOS = {
+    "Top estabelecimentos (últimos 12 meses)": """
+SELECT Lancamento_Limpo AS estabelecimento, Categoria, SUM(Valor) AS total, COUNT(*) AS qtde
+FROM cartao
+WHERE Valor > 0 AND MesRef >= strftime(current_date - INTERVAL 12 MONTH, '%Y-%m')
+GROUP BY ALL
+ORDER BY total DESC
+LIMIT 20""",
+    "Total por mês e categoria": """
+SELECT MesRef, Categoria, SUM(Valor) AS total
+FROM cartao
+GROUP BY ALL
+ORDER BY MesRef, total DESC""",
+    "Parcelas em aberto no cartão": """
+SELECT Lancamento_Limpo, Parcela, Valor, (ParcelaTotal - ParcelaAtual) * Valor AS restante
+FROM cartao
+WHERE MesRef = (SELECT MAX(MesRef) FROM cartao) AND ParcelaTotal IS NOT NULL
+ORDER BY restante DESC""",
+    "Reembolsos pendentes por pessoa": """
+SELECT Pessoa, COUNT(*) AS parcelas, SUM(Valor) AS pendente, MIN(Data) AS proxima
+FROM receitas
+WHERE Tipo = 'Reembolso' AND NOT Recebido
+GROUP BY Pessoa
+ORDER BY pendente DESC""",
+    "Receita x cartão x fixas por mês": """
+SELECT c.MesRef, r.receita, c.cartao, (SELECT SUM(Valor) FROM despesas_fixas) AS fixas
+FROM (SELECT MesRef, SUM(Valor) AS cartao FROM cartao GROUP BY MesRef) c
+LEFT JOIN (SELECT MesRef, SUM(Valor) AS receita FROM receitas GROUP BY MesRef) r USING (MesRef)
+ORDER BY c.MesRef""",
+}
+
+
+def validar_sql(sql: str) -> str:
+    """Aceita uma única consulta de leitura; devolve o SQL sem o ';' final."""
+    s = sql.strip().rstrip(";").strip()
+    if not s:
+        raise ValueError("Consulta vazia.")
+    if ";" in re.sub(r"'[^']*'", "", s):
+        raise ValueError("Envie uma consulta por vez.")
+    # ignora comentários no começo para achar o comando
+    comando = re.sub(r"^(\s*(--[^\n]*\n|/\*.*?\*/))*", "", s, flags=re.S).split(None, 1)[0].upper()
+    if comando not in COMANDOS_PERMITIDOS:
+        raise ValueError(f"Só consultas de leitura ({', '.join(COMANDOS_PERMITIDOS)}).")
+    return s
+
+
+def _coluna(nome: str, tipo: Optional[str]) -> str:
+    ident = '"' + nome.replace('"', '""') + '"'
+    return f"TRY_CAST({ident} AS {tipo}) AS {ident}" if tipo else ident
+
+
+class MotorSQL:
+    """
+    DuckDB em memória sobre os dados do workspace:
+      - cartao / cubo: os frames do repositório copiados para tabelas colunares
+        (tipos fixos), refeitas só quando o arquivo muda (mtime/tamanho)
+      - receitas / despesas_fixas: DataFrames do SQLite registrados no DuckDB
+        (sem cópia), recarregados só quando o banco muda
+
+    Tudo é carregado pelo Python: a conexão não acessa arquivos nem URLs
+    (`read_csv('/etc/passwd')`, `glob`, ATTACH, COPY... falham) e a configuração
+    fica travada, então a consulta do usuário não consegue religar o acesso.
+    """
+
+    def __init__(self, backup_path: str, db_path: str, cubo_path: Optional[str] = None):
+        self.backup_path = backup_path
+        self.db_path = db_path
+        self.cubo_path = cubo_path
+
+        self._con = duckdb.connect()
+        self._con.execute("SET enable_external_access = false")
+        self._con.execute("SET lock_configuration = true")
+        self._lock = threading.Lock()
+        self._versoes: Dict[str, Tuple] = {}
+
+    def _carregar_tabela(self, nome: str, path: Optional[str], ler: Callable[[], pd.DataFrame], tipos: Dict[str, str]):
+        existe = bool(path) and os.path.exists(path)
+        versao = repositorio.versao(path) if existe else None
+        if self._versoes.get(nome, "?") == versao:
+            return
+
+        self._con.execute(f"DROP TABLE IF EXISTS {nome}")
+        if existe:
+            t0 = time.perf_counter()
+            df = ler()
+            colunas = ", ".join(_coluna(str(c), tipos.get(c)) for c in df.columns)
+            self._con.register("_carga", df)
+            try:
+                self._con.execute(f"CREATE TABLE {nome} AS SELECT {colunas} FROM _carga")
+            finally:
+                self._con.unregister("_carga")
+            METRICAS.registrar_tempo("sql.carga", time.perf_counter() - t0)
+        self._versoes[nome] = versao
+
+    def _atualizar(self):
+        if self.cubo_path and not os.path.exists(self.cubo_path):
+            # o pipeline só atualiza um cubo que já existe: monta aqui na primeira consulta
+            repositorio.reconstruir_cubo(self.cubo_path, self.backup_path, self.db_path)
+        self._carregar_tabela("cartao", self.backup_path, lambda: repositorio.carregar_backup(self.backup_path), TIPOS_CARTAO)
+        self._carregar_tabela(
+            "cubo",
+            self.cubo_path,
+            lambda: repositorio.carregar_cubo(self.cubo_path, self.backup_path, self.db_path),
+            TIPOS_CUBO,
+        )
+
+        versao_db = repositorio.versao(self.db_path, f"{self.db_path}-wal")
+        if self._versoes.get("db") != versao_db:
+            self._con.register("receitas", repositorio.carregar_receitas(self.db_path))
+            self._con.register("despesas_fixas", repositorio.carregar_despesas_fixas(self.db_path))
+            self._versoes["db"] = versao_db
+
+    def consultar(self, sql: str, limite: int = LIMITE_LINHAS) -> pd.DataFrame:
+        """Roda uma consulta de leitura e devolve no máximo `limite` linhas."""
+        sql = validar_sql(sql)
+        t0 = time.perf_counter()
+        with self._lock:
+            self._atualizar()
+            res = self._con.execute(f"SELECT * FROM ({sql}) LIMIT {int(limite)}").df()
+        METRICAS.registrar_tempo("sql.consulta", time.perf_counter() - t0)
+        return res
+
+    def tabelas(self) -> Dict[str, List[str]]:
+        """Tabela/view -> colunas disponíveis para consulta."""
+        with self._lock:
+            self._atualizar()
+            linhas = self._con.execute(
+                "SELECT table_name, column_name FROM information_schema.columns ORDER BY table_name, ordinal_position"
+            ).fetchall()
+        res: Dict[str, List[str]] = {}
+        for tabela, coluna in linhas:
+            res.setdefault(tabela, []).append(coluna)
+        return res
+
+
+_motores: Dict[Tuple[str, str, Optional[str]], MotorSQL] = {}
+_lock = threading.Lock()
+
+
+def motor(backup_path: str, db_path: str, cubo_path: Optional[str] = None) -> MotorSQL:
+    """Um motor por workspace, reaproveitado entre sessões/reruns."""
+    chave = (os.path.abspath(backup_path), os.path.abspath(db_path), cubo_path and os.path.abspath(cubo_path))
+    with _lock:
+        if chave not in _motores:
+            _motores[chave] = MotorSQL(backup_path, db_path, cubo_path)
+        return _motores[chave]
+
+
+def consultar(sql: str, backup_path: str, db_path: str = banco.DB_PATH, cubo_path: Optional[str] = None) -> pd.DataFrame:
+    return motor(backup_path, db_path, cubo_path).consultar(sql)
@@ -0,0 +1,99 @@
+import os
+from typing import Callable, Iterable, Optional
+
+import pandas as pd
+
+import banco
+from arquivos import bloqueio, escrever_atomico
+
+ARQ_CUBO = "cubo.csv"
+COLS_CUBO = ["MesRef", "Origem", "Categoria", "Valor", "Qtde"]
+
+ORIGEM_CARTAO = "Cartão"
+ORIGEM_RECEITA = "Receita"
+
+
+def _vazio() -> pd.DataFrame:
+    return pd.DataFrame(columns=COLS_CUBO)
+
+
+def agregar(df: pd.DataFrame, origem: str, col_categoria: str = "Categoria") -> pd.DataFrame:
+    """MesRef x Categoria -> soma e quantidade, já no formato do cubo."""
+    if df.empty:
+        return _vazio()
+
+    base = pd.DataFrame({
+        "MesRef": df["MesRef"].astype(str),
+        "Categoria": df[col_categoria].fillna("Sem categoria").astype(str) if col_categoria in df.columns else "Sem categoria",
+        "Valor": pd.to_numeric(df["Valor"], errors="coerce").fillna(0.0),
+    })
+    ag = base.groupby(["MesRef", "Categoria"], as_index=False).agg(Valor=("Valor", "sum"), Qtde=("Valor", "size"))
+    ag["Origem"] = origem
+    return ag[COLS_CUBO]
+
+
+def combinar(partes: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Soma agregados parciais (ex.: um por bloco do CSV) num só."""
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return _vazio()
+    ag = pd.concat(partes, ignore_index=True).groupby(["MesRef", "Origem", "Categoria"], as_index=False)[["Valor", "Qtde"]].sum()
+    return ag[COLS_CUBO]
+
+
+def carregar_cubo(path: str) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return _vazio()
+    return pd.read_csv(path, dtype={"MesRef": str})
+
+
+def atualizar_meses(path: str, agregado: pd.DataFrame, origem: str, meses: Iterable[str]):
+    """
+    Troca no cubo só as células de `origem` nos `meses` informados
+    (os demais meses ficam como estão). Sob lock, com escrita atômica.
+    """
+    meses = {str(m) for m in meses}
+    with bloqueio(path):
+        # ainda não existe: será montado inteiro (reconstruir) na primeira leitura
+        if not os.path.exists(path):
+            return
+        cubo = carregar_cubo(path)
+        manter = ~((cubo["Origem"] == origem) & cubo["MesRef"].isin(meses))
+        partes = [p for p in (cubo[manter], agregado) if not p.empty]
+        novo = pd.concat(partes, ignore_index=True) if partes else _vazio()
+        novo = novo.sort_values(["MesRef", "Origem", "Categoria"])
+        escrever_atomico(path, lambda tmp: novo.to_csv(tmp, index=False))
+
+
+def atualizar_cartao(path: str, df_mes: pd.DataFrame):
+    """Chamado ao salvar o(s) mês(es) da fatura no backup."""
+    atualizar_meses(path, agregar(df_mes, ORIGEM_CARTAO), ORIGEM_CARTAO, df_mes["MesRef"].unique())
+
+
+def atualizar_receitas(path: str, meses: Iterable[str], db_path: str):
+    """Recalcula as células de receita dos meses alterados direto no banco."""
+    meses = [str(m) for m in meses]
+    agregado = agregar(banco.receitas_dos_meses(meses, db_path), ORIGEM_RECEITA, col_categoria="Tipo")
+    atualizar_meses(path, agregado, ORIGEM_RECEITA, meses)
+
+
+def reconstruir(
+    path: str,
+    ler_backup: Callable[[], Optional[pd.DataFrame]],
+    ler_receitas: Callable[[], pd.DataFrame],
+) -> pd.DataFrame:
+    """
+    Monta o cubo do zero (só quando ainda não existe). Os dados vêm dos loaders
+    do repositório (`ler_backup` devolve None sem backup), lidos já sob o lock.
+    """
+    with bloqueio(path):
+        partes = []
+        backup = ler_backup()
+        if backup is not None:
+            partes.append(agregar(backup, ORIGEM_CARTAO))
+        partes.append(agregar(ler_receitas(), ORIGEM_RECEITA, col_categoria="Tipo"))
+
+        partes = [p for p in partes if not p.empty]
+        cubo = pd.concat(partes, ignore_index=True) if partes else _vazio()
+        escrever_atomico(path, lambda tmp: cubo.to_csv(tmp, index=False))
+    return cubo
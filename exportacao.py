@@ -0,0 +1,172 @@
+import atexit
+import gzip
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import pandas as pd
+import streamlit as st
+
+# formato -> (extensão, mime)
+FORMATOS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+CHUNK_LINHAS = 50_000
+MAX_CACHE = 8
+
+# (versão, formato) -> arquivo temporário com o export: o cache fica em disco, não na memória
+_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@atexit.register
+def _limpar_cache():
+    with _cache_lock:
+        while _cache:
+            _remover(_cache.popitem()[1])
+
+
+def _remover(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def versao_df(df: pd.DataFrame) -> str:
+    """
+    Versão de um DataFrame em memória (hash do conteúdo).
+    Só é calculada na hora do download, nunca a cada rerun.
+    """
+    h = pd.util.hash_pandas_object(df, index=True).sum()
+    return f"{len(df)}-{int(h)}"
+
+
+def _escrever_csv(df: pd.DataFrame, out, chunk: int):
+    # escreve em blocos para não montar a string inteira em memória
+    for i in range(0, max(len(df), 1), chunk):
+        parte = df.iloc[i:i + chunk]
+        out.write(parte.to_csv(index=False, header=(i == 0)).encode("utf-8"))
+
+
+def _escrever_parquet(df: pd.DataFrame, out, chunk: int):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # object misturado (ex.: datas e strings) não converte direto pro arrow
+    df = df.reset_index(drop=True)
+    for c in df.columns:
+        if df[c].dtype == object:
+            df[c] = df[c].astype("string")
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(out, schema) as writer:
+        for i in range(0, len(df), chunk):
+            tabela = pa.Table.from_pandas(df.iloc[i:i + chunk], schema=schema, preserve_index=False)
+            writer.write_table(tabela)
+
+
+def gerar_export(df: pd.DataFrame, formato: str, destino: str, chunk: int = CHUNK_LINHAS):
+    """
+    Grava o DataFrame em `destino` no formato pedido (CSV, CSV gzip ou Parquet),
+    em blocos de `chunk` linhas: o arquivo vai direto para o disco.
+    """
+    if formato == "CSV":
+        with open(destino, "wb") as f:
+            _escrever_csv(df, f, chunk)
+    elif formato == "CSV (gzip)":
+        with gzip.open(destino, "wb") as gz:
+            _escrever_csv(df, gz, chunk)
+    elif formato == "Parquet":
+        _escrever_parquet(df, destino, chunk)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+
+def export_cacheado(df: pd.DataFrame, formato: str, versao: Optional[str] = None) -> bytes:
+    """
+    Conteúdo do export, gerado uma vez por (versão, formato) e guardado em arquivo temporário.
+    Sem versão explícita, usa o hash do conteúdo.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    chave = (versao or versao_df(df), formato)
+
+    with _cache_lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            # aberto com o lock: se for descartado em seguida, a leitura continua valendo
+            f = open(_cache[chave], "rb")
+        else:
+            f = None
+    if f is not None:
+        with f:
+            return f.read()
+
+    fd, path = tempfile.mkstemp(prefix="export-", suffix=FORMATOS[formato][0])
+    os.close(fd)
+    try:
+        gerar_export(df, formato, path)
+        with open(path, "rb") as f:
+            data = f.read()
+    except BaseException:
+        _remover(path)
+        raise
+
+    with _cache_lock:
+        if chave in _cache:
+            # outra thread gerou o mesmo export enquanto isso
+            _remover(path)
+        else:
+            _cache[chave] = path
+        while len(_cache) > MAX_CACHE:
+            _remover(_cache.popitem(last=False)[1])
+
+    return data
+
+
+def _sob_demanda(df: pd.DataFrame, formato: str, versao: Optional[str]) -> Callable[[], bytes]:
+    # o st.download_button chama isso só quando o usuário clica
+    def gerar():
+        return export_cacheado(df, formato, versao)
+    return gerar
+
+
+def render_download(
+    df: pd.DataFrame,
+    nome_base: str,
+    key: str,
+    df_filtrado: Optional[pd.DataFrame] = None,
+    versao: Optional[str] = None,
+):
+    """
+    Botão de download com escolha de formato (e opcionalmente "só o filtrado").
+    O arquivo é gerado apenas no clique e reaproveitado enquanto a versão não mudar.
+    """
+    col1, col2, col3 = st.columns([1, 1, 1])
+
+    formato = col1.selectbox("Formato", list(FORMATOS.keys()), key=f"{key}_formato")
+
+    escopo = "Tudo"
+    if df_filtrado is not None:
+        escopo = col2.radio("Exportar", ["Tudo", "Somente filtrado"], horizontal=True, key=f"{key}_escopo")
+
+    if escopo == "Somente filtrado":
+        df_exp, versao_exp = df_filtrado, None  # hash calculado no clique
+    else:
+        df_exp, versao_exp = df, versao
+
+    ext, mime = FORMATOS[formato]
+    col3.download_button(
+        f"Baixar {formato}",
+        data=_sob_demanda(df_exp, formato, versao_exp),
+        file_name=f"{nome_base}{ext}",
+        mime=mime,
+        key=f"{key}_download",
+        on_click="ignore",
+    )
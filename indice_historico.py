@@ -0,0 +1,83 @@
+import heapq
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from metricas import METRICAS
+
+
+def normalizar_texto(texto: str) -> str:
+    """Maiúsculas, sem acento, só letras e espaços (números de parcela/loja não ajudam)."""
+    s = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    s = re.sub(r"[^A-Z ]+", " ", s.upper())
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def trigramas(texto: str) -> List[str]:
+    s = f" {normalizar_texto(texto)} "
+    return [s[i:i + 3] for i in range(len(s) - 2)]
+
+
+class IndiceHistorico:
+    """
+    Vizinhos mais próximos por TF-IDF de trigramas de caracteres, só com CPU.
+    Índice invertido trigrama -> [(doc, peso)]: a busca só toca os documentos
+    que compartilham algum trigrama com a consulta.
+    """
+
+    def __init__(self, rotulados: Dict[str, str]):
+        t0 = time.perf_counter()
+
+        self.textos: List[str] = []
+        self.categorias: List[str] = []
+        contagens: List[Counter] = []
+        df_termos: Counter = Counter()
+
+        for texto, cat in rotulados.items():
+            tri = Counter(trigramas(texto))
+            if not tri or not cat:
+                continue
+            self.textos.append(texto)
+            self.categorias.append(cat)
+            contagens.append(tri)
+            df_termos.update(tri.keys())
+
+        n = len(self.textos)
+        self.idf: Dict[str, float] = {t: math.log((1 + n) / (1 + d)) + 1 for t, d in df_termos.items()}
+
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for doc, tri in enumerate(contagens):
+            pesos = {t: (1 + math.log(c)) * self.idf[t] for t, c in tri.items()}
+            norma = math.sqrt(sum(w * w for w in pesos.values())) or 1.0
+            for t, w in pesos.items():
+                self.postings[t].append((doc, w / norma))
+
+        self.tempo_build = time.perf_counter() - t0
+        METRICAS.registrar_tempo("rag.build", self.tempo_build)
+
+    def __len__(self) -> int:
+        return len(self.textos)
+
+    def _vetor(self, texto: str) -> Dict[str, float]:
+        tri = Counter(t for t in trigramas(texto) if t in self.idf)
+        pesos = {t: (1 + math.log(c)) * self.idf[t] for t, c in tri.items()}
+        norma = math.sqrt(sum(w * w for w in pesos.values())) or 1.0
+        return {t: w / norma for t, w in pesos.items()}
+
+    def buscar(self, texto: str, k: int = 5, min_score: float = 0.0) -> List[Tuple[str, str, float]]:
+        """Top-k (texto, categoria, similaridade cosseno) mais parecidos com `texto`."""
+        t0 = time.perf_counter()
+
+        scores: Dict[int, float] = defaultdict(float)
+        for t, wq in self._vetor(texto).items():
+            for doc, wd in self.postings.get(t, ()):
+                scores[doc] += wq * wd
+
+        melhores = heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+        res = [(self.textos[d], self.categorias[d], s) for d, s in melhores if s >= min_score]
+
+        METRICAS.registrar_tempo("rag.query", time.perf_counter() - t0)
+        return res
@@ -0,0 +1,94 @@
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from indice_historico import trigramas
+from metricas import METRICAS
+
+# primo de Mersenne: a, b e h < 2^31, então a*h + b cabe em uint64 sem estouro
+PRIMO = (1 << 31) - 1
+
+
+def shingles(texto: str) -> Set[str]:
+    return set(trigramas(texto))
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class IndiceLSH:
+    """
+    MinHash + LSH por bandas sobre os trigramas das descrições conhecidas.
+    A busca só olha os documentos que caem no mesmo balde em alguma banda
+    (custo sub-linear no tamanho do histórico) e confirma com o Jaccard exato.
+    """
+
+    def __init__(self, rotulados: Dict[str, str], permutacoes: int = 60, bandas: int = 20, seed: int = 42):
+        if permutacoes % bandas:
+            raise ValueError("permutacoes precisa ser múltiplo de bandas")
+
+        t0 = time.perf_counter()
+
+        self.bandas = bandas
+        self.linhas = permutacoes // bandas
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, PRIMO, size=permutacoes, dtype=np.uint64)
+        self._b = rng.integers(0, PRIMO, size=permutacoes, dtype=np.uint64)
+
+        self.textos: List[str] = []
+        self.categorias: List[str] = []
+        self.conjuntos: List[Set[str]] = []
+        self.baldes: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bandas)]
+
+        for texto, cat in rotulados.items():
+            sh = shingles(texto)
+            if not sh or not cat:
+                continue
+            doc = len(self.textos)
+            self.textos.append(texto)
+            self.categorias.append(cat)
+            self.conjuntos.append(sh)
+            for banda, chave in enumerate(self._chaves(sh)):
+                self.baldes[banda][chave].append(doc)
+
+        self.tempo_build = time.perf_counter() - t0
+        METRICAS.registrar_tempo("lsh.build", self.tempo_build)
+
+    def __len__(self) -> int:
+        return len(self.textos)
+
+    def _assinatura(self, sh: Set[str]) -> np.ndarray:
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) % PRIMO for s in sh), dtype=np.uint64, count=len(sh))
+        # (a*h + b) mod p, mínimo por permutação
+        return ((self._a[:, None] * h[None, :] + self._b[:, None]) % PRIMO).min(axis=1)
+
+    def _chaves(self, sh: Set[str]):
+        sig = self._assinatura(sh)
+        for banda in range(self.bandas):
+            yield sig[banda * self.linhas:(banda + 1) * self.linhas].tobytes()
+
+    def buscar(self, texto: str, threshold: float) -> Optional[Tuple[str, str, float]]:
+        """(texto conhecido, categoria, Jaccard) mais parecido acima do threshold, ou None."""
+        t0 = time.perf_counter()
+
+        sh = shingles(texto)
+        melhor = None
+        if sh:
+            candidatos = set()
+            for banda, chave in enumerate(self._chaves(sh)):
+                candidatos.update(self.baldes[banda].get(chave, ()))
+
+            for doc in candidatos:
+                sim = jaccard(sh, self.conjuntos[doc])
+                if sim >= threshold and (melhor is None or sim > melhor[2]):
+                    melhor = (self.textos[doc], self.categorias[doc], sim)
+
+        METRICAS.registrar_tempo("lsh.query", time.perf_counter() - t0)
+        return melhor
@@ -0,0 +1,291 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from agente import CSV_CHUNK_LINHAS, AgenteCartao, AgenteCartaoConfig, eh_ofx
+from arquivos import escrever_atomico
+from metricas import METRICAS
+from pipeline import executar_pipeline, executar_pipeline_chunks
+
+JOBS_DIR = "jobs"
+MAX_WORKERS = 1  # o Groq on_demand não aguenta mais que isso; os demais ficam na fila
+LIMIAR_CHUNKS_BYTES = 20 * 1024 * 1024  # CSV acima disso é processado em blocos
+COPIA_BLOCO_BYTES = 1024 * 1024  # o upload vai para o disco nesse passo
+# resultado maior que isso não é carregado inteiro na interface: ela mostra o
+# resumo por categoria (calculado em blocos no fim do job) e uma prévia
+LIMITE_LINHAS_UI = 100_000
+PREVIA_LINHAS = 1_000
+RETENCAO_DIAS = 7  # jobs finalizados há mais tempo que isso (status + CSV) são apagados
+
+# status possíveis
+NA_FILA = "na_fila"
+RODANDO = "rodando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+INTERROMPIDO = "interrompido"  # processo reiniciou no meio
+
+FINALIZADOS = (CONCLUIDO, ERRO, INTERROMPIDO)
+
+# estado do processo (sobrevive aos reruns do Streamlit; o módulo é importado uma vez)
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="job")
+_futuros: Dict[str, Future] = {}
+# upload idêntico (mesmo workspace, arquivo e opções) já na fila ou rodando -> id do job:
+# com um worker só, é aqui que dois envios do mesmo arquivo compartilham as chamadas ao LLM
+_em_andamento: Dict[Tuple, str] = {}
+_lock = threading.Lock()
+_agente: Optional[AgenteCartao] = None
+
+
+def _obter_agente() -> AgenteCartao:
+    global _agente
+    with _lock:
+        if _agente is None:
+            # limites de orçamento vêm do ambiente (ver AgenteCartaoConfig.do_ambiente)
+            _agente = AgenteCartao(AgenteCartaoConfig.do_ambiente())
+        return _agente
+
+
+# ---------- Persistência ----------
+def _pasta(ws_dir: str) -> str:
+    pasta = os.path.join(ws_dir, JOBS_DIR)
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def _path_status(ws_dir: str, job_id: str) -> str:
+    return os.path.join(_pasta(ws_dir), f"{job_id}.json")
+
+
+def _path_resultado(ws_dir: str, job_id: str) -> str:
+    return os.path.join(_pasta(ws_dir), f"{job_id}.csv")
+
+
+def _path_entrada(ws_dir: str, job: Dict) -> str:
+    # cópia do upload em disco; a extensão original ajuda a detectar csv/ofx
+    ext = os.path.splitext(job["arquivo"])[1].lower()
+    return os.path.join(_pasta(ws_dir), f"{job['id']}.entrada{ext}")
+
+
+def _gravar(ws_dir: str, job: Dict):
+    def escrever(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+
+    escrever_atomico(_path_status(ws_dir, job["id"]), escrever)
+
+
+def status(job_id: str, ws_dir: str) -> Optional[Dict]:
+    """Status persistido do job (None se não existe nesse workspace)."""
+    path = _path_status(ws_dir, job_id)
+    if not os.path.exists(path):
+        return None
+
+    # checa antes de ler: o worker grava o status final antes de sair de _futuros
+    with _lock:
+        ativo = job_id in _futuros
+
+    with open(path, encoding="utf-8") as f:
+        job = json.load(f)
+
+    # ficou "rodando" mas ninguém neste processo está tocando: servidor reiniciou
+    if job["status"] not in FINALIZADOS and not ativo:
+        job["status"] = INTERROMPIDO
+
+    return job
+
+
+def listar(ws_dir: str, limite: Optional[int] = 10) -> List[Dict]:
+    pasta = _pasta(ws_dir)
+    ids = [a[:-5] for a in os.listdir(pasta) if a.endswith(".json")]
+    jobs = [j for j in (status(i, ws_dir) for i in ids) if j]
+    return sorted(jobs, key=lambda j: j["criado_em"], reverse=True)[:limite]
+
+
+def limpar(ws_dir: str, retencao_dias: float = RETENCAO_DIAS) -> int:
+    """Apaga status e resultado dos jobs finalizados há mais de `retencao_dias`; devolve quantos."""
+    limite = time.time() - retencao_dias * 24 * 3600
+    removidos = 0
+    for job in listar(ws_dir, limite=None):
+        # interrompido não tem finalizado_em: vale a criação
+        if job["status"] not in FINALIZADOS or job.get("finalizado_em", job["criado_em"]) >= limite:
+            continue
+        # a entrada de um job interrompido fica para trás: sai junto
+        for path in (_path_resultado(ws_dir, job["id"]), _path_entrada(ws_dir, job), _path_status(ws_dir, job["id"])):
+            if os.path.exists(path):
+                os.remove(path)
+        removidos += 1
+    return removidos
+
+
+def resultado(job_id: str, ws_dir: str, max_linhas: Optional[int] = None) -> pd.DataFrame:
+    """Resultado do job (só as `max_linhas` primeiras, se informado)."""
+    return pd.read_csv(_path_resultado(ws_dir, job_id), nrows=max_linhas)
+
+
+def resumir_resultado(path: str, linhas: int = CSV_CHUNK_LINHAS) -> List[Dict]:
+    """Total e quantidade por categoria, lendo o CSV em blocos (memória limitada)."""
+    partes = []
+    with pd.read_csv(path, usecols=lambda c: c in ("Categoria", "Valor"), chunksize=linhas) as leitor:
+        for bloco in leitor:
+            if "Categoria" in bloco.columns:
+                chave = bloco["Categoria"].fillna("Sem categoria")
+            else:
+                chave = pd.Series("Total", index=bloco.index)
+            valor = pd.to_numeric(bloco["Valor"], errors="coerce")
+            partes.append(valor.groupby(chave.rename("Categoria")).agg(Valor="sum", Qtde="size"))
+
+    if not partes:
+        return []
+    resumo = pd.concat(partes).groupby(level=0).sum().sort_values("Valor", ascending=False)
+    return [
+        {"Categoria": str(c), "Valor": float(r.Valor), "Qtde": int(r.Qtde)}
+        for c, r in resumo.iterrows()
+    ]
+
+
+# ---------- Execução ----------
+def _rodar(job: Dict, entrada: str, ws_dir: str, backup_path: str):
+    def on_status(pct: int, msg: str):
+        job.update(pct=pct, etapa=msg)
+        _gravar(ws_dir, job)
+
+    job["status"] = RODANDO
+    job["iniciado_em"] = time.time()
+    _gravar(ws_dir, job)
+
+    try:
+        # cópia por job: histórico e resultados não vazam entre workspaces
+        agente = _obter_agente().nova_execucao()
+        res = _path_resultado(ws_dir, job["id"])
+
+        # o arquivo é lido do disco: nem o caminho em blocos segura o upload inteiro na memória
+        if os.path.getsize(entrada) >= LIMIAR_CHUNKS_BYTES and not eh_ofx(entrada):
+            linhas = executar_pipeline_chunks(
+                agente,
+                entrada,
+                job["acao"],
+                job["salvar_csv"],
+                job["mes_ref"],
+                backup_path,
+                res,
+                on_status=on_status,
+            )
+        else:
+            df = executar_pipeline(
+                agente,
+                entrada,
+                job["acao"],
+                job["salvar_csv"],
+                job["mes_ref"],
+                backup_path,
+                on_status=on_status,
+            )
+            escrever_atomico(res, lambda tmp: df.to_csv(tmp, index=False))
+            linhas = len(df)
+
+        if linhas > LIMITE_LINHAS_UI:
+            job["resumo"] = resumir_resultado(res)
+        job.update(status=CONCLUIDO, pct=100, linhas=linhas)
+        if job["acao"] not in ("Só ler CSV", "Ler CSV + parcelas"):
+            job["cobertura"] = agente.cobertura
+    except Exception as e:
+        job.update(status=ERRO, erro=f"{type(e).__name__}: {e}", trace=traceback.format_exc())
+    finally:
+        if os.path.exists(entrada):
+            os.remove(entrada)
+        job["finalizado_em"] = time.time()
+        _gravar(ws_dir, job)
+        with _lock:
+            _liberar(job["id"])
+
+
+def _liberar(job_id: str):
+    # chamar com _lock
+    _futuros.pop(job_id, None)
+    for chave in [c for c, i in _em_andamento.items() if i == job_id]:
+        del _em_andamento[chave]
+
+
+def _copiar_upload(origem: IO[bytes], destino: str) -> str:
+    """Copia o upload para `destino` em blocos e devolve o sha256 do conteúdo."""
+    h = hashlib.sha256()
+    if hasattr(origem, "seek"):
+        origem.seek(0)
+    with open(destino, "wb") as f:
+        for bloco in iter(lambda: origem.read(COPIA_BLOCO_BYTES), b""):
+            h.update(bloco)
+            f.write(bloco)
+    return h.hexdigest()
+
+
+def submeter(
+    upload: Union[bytes, IO[bytes]],
+    nome_arquivo: str,
+    acao: str,
+    salvar_csv: bool,
+    mes_ref: str,
+    ws_dir: str,
+    backup_path: str,
+) -> str:
+    """
+    Coloca o processamento de um upload na fila e devolve o ID do job.
+    O upload (bytes ou file object, ex.: UploadedFile, que não vale fora da sessão)
+    é copiado para a pasta de jobs e o worker lê do disco; caminhos já resolvidos.
+    Se o mesmo upload (workspace, conteúdo e opções) já está na fila ou rodando,
+    devolve o ID desse job em vez de processar de novo.
+    """
+    limpar(ws_dir)
+
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "status": NA_FILA,
+        "arquivo": nome_arquivo,
+        "acao": acao,
+        "salvar_csv": bool(salvar_csv),
+        "mes_ref": mes_ref,
+        "pct": 0,
+        "etapa": "⏳ Na fila...",
+        "criado_em": time.time(),
+    }
+    entrada = _path_entrada(ws_dir, job)
+    if isinstance(upload, (bytes, bytearray)):
+        upload = io.BytesIO(upload)
+    try:
+        digest = _copiar_upload(upload, entrada)
+    except BaseException:
+        if os.path.exists(entrada):
+            os.remove(entrada)
+        raise
+    chave = (os.path.abspath(ws_dir), digest, acao, bool(salvar_csv), mes_ref, os.path.abspath(backup_path))
+
+    # registra antes de gravar o status: sem isso, quem lê o JSON nesse intervalo
+    # vê um job "na fila" sem ninguém tocando e o dá como interrompido
+    with _lock:
+        existente = _em_andamento.get(chave)
+        if existente in _futuros:
+            METRICAS.incr("jobs.coalescidos")
+            os.remove(entrada)
+            return existente
+        _futuros[job["id"]] = Future()
+        _em_andamento[chave] = job["id"]
+    try:
+        _gravar(ws_dir, job)
+    except BaseException:
+        with _lock:
+            _liberar(job["id"])
+        os.remove(entrada)
+        raise
+
+    with _lock:
+        _futuros[job["id"]] = _executor.submit(_rodar, job, entrada, ws_dir, backup_path)
+
+    return job["id"]
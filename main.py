@@ -1,35 +1,44 @@
 import streamlit as st
-from agente import AgenteCartao
+import repositorio
 from ui_sidebar import render_sidebar
-from ui_analysis import carregar_backup, processar_upload, render_result
+from ui_analysis import (
+    caminho_backup, carregar_backup, job_ativo, processar_upload,
+    render_fila, render_job, render_metricas, render_result,
+)
 
 st.set_page_config(page_title="Analisador Cartão", layout="wide")
 st.title("Analisador de Fatura do Cartão")
 
-agente = AgenteCartao()
-
 ui = render_sidebar()
 
 # modo backup
 if ui["fonte"].startswith("Ler do backup"):
     df = carregar_backup()
-    render_result(df)
-    st.stop()
-
-# modo upload
-if ui["uploaded"] is None:
-    st.info("Faça o upload de um CSV na barra lateral para começar.")
+    path = caminho_backup()
+    render_result(df, versao=f"{path}:{repositorio.versao(path)}")
     st.stop()
 
+# modo upload: o processamento roda em background (job), a página só acompanha
 if ui["rodar"]:
-    df = processar_upload(
-        agente,
+    if ui["uploaded"] is None:
+        st.info("Faça o upload de um CSV na barra lateral para começar.")
+        st.stop()
+    processar_upload(
         ui["uploaded"],
         ui["acao"],
         ui["salvar_csv"],
         ui["mes_ref"],
     )
-    render_result(df)
+
+render_fila()
+render_metricas()
+
+job_id = job_ativo()
+if job_id:
+    df = render_job(job_id)
+    if df is not None:
+        render_result(df, versao=f"job:{job_id}")
+elif ui["uploaded"] is None:
+    st.info("Faça o upload de um CSV na barra lateral para começar.")
 else:
     st.info("Escolha as opções na barra lateral e clique em Executar.")
-
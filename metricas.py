@@ -0,0 +1,62 @@
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional
+
+MAX_AMOSTRAS = 1000
+
+
+def _percentil(ordenadas: list, p: float) -> float:
+    # interpolação linear entre as amostras vizinhas
+    pos = (len(ordenadas) - 1) * p
+    i = int(pos)
+    j = min(i + 1, len(ordenadas) - 1)
+    return ordenadas[i] + (ordenadas[j] - ordenadas[i]) * (pos - i)
+
+
+class Metricas:
+    """
+    Contadores e tempos do processo (compartilhados entre sessões e jobs).
+    Thread-safe; os tempos guardam só as últimas MAX_AMOSTRAS amostras.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores: Dict[str, int] = defaultdict(int)
+        self._tempos: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=MAX_AMOSTRAS))
+
+    def incr(self, nome: str, n: int = 1):
+        with self._lock:
+            self._contadores[nome] += n
+
+    def registrar_tempo(self, nome: str, segundos: float):
+        with self._lock:
+            self._tempos[nome].append(float(segundos))
+
+    def contadores(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._contadores)
+
+    def tempos(self, nome: str) -> list:
+        with self._lock:
+            return list(self._tempos.get(nome, ()))
+
+    def percentil(self, nome: str, p: float, minimo_amostras: int = 1) -> Optional[float]:
+        """Percentil `p` (0-1) das amostras de `nome`; None se há menos de `minimo_amostras`."""
+        amostras = self.tempos(nome)
+        if not amostras or len(amostras) < minimo_amostras:
+            return None
+        return _percentil(sorted(amostras), p)
+
+    def resumo_tempos(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            itens = {k: list(v) for k, v in self._tempos.items() if v}
+        return {
+            k: {
+                "n": len(v), "media_s": sum(v) / len(v), "max_s": max(v), "ultimo_s": v[-1],
+                "p50_s": _percentil(sorted(v), 0.5), "p95_s": _percentil(sorted(v), 0.95),
+            }
+            for k, v in itens.items()
+        }
+
+
+METRICAS = Metricas()
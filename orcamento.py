@@ -0,0 +1,111 @@
+import json
+import math
+import os
+import threading
+from datetime import date
+from typing import Dict, Optional
+
+from arquivos import bloqueio, escrever_atomico
+from workspace import COMPARTILHADO_DIR
+
+# a cota do Groq é por chave de API, não por workspace
+ORCAMENTO_PATH = os.path.join(COMPARTILHADO_DIR, "orcamento_llm.json")
+
+CHARS_POR_TOKEN = 4  # estimativa: a chain devolve só o texto, sem o uso real de tokens
+
+
+def estimar_tokens(texto: str) -> int:
+    return math.ceil(len(str(texto)) / CHARS_POR_TOKEN)
+
+
+def _hoje() -> str:
+    return date.today().isoformat()
+
+
+class OrcamentoLLM:
+    """
+    Limites de requisições/tokens por execução e por dia (None = sem limite).
+    O consumo do dia fica em JSON compartilhado, sob lock: vale para todos os
+    processos e jobs que usam a mesma chave.
+    """
+
+    def __init__(
+        self,
+        max_requisicoes_execucao: Optional[int] = None,
+        max_tokens_execucao: Optional[int] = None,
+        max_requisicoes_dia: Optional[int] = None,
+        max_tokens_dia: Optional[int] = None,
+        path: str = ORCAMENTO_PATH,
+    ):
+        self.max_requisicoes_execucao = max_requisicoes_execucao
+        self.max_tokens_execucao = max_tokens_execucao
+        self.max_requisicoes_dia = max_requisicoes_dia
+        self.max_tokens_dia = max_tokens_dia
+        self.path = path
+
+        self._lock = threading.Lock()
+        self.requisicoes = 0  # desta execução
+        self.tokens = 0
+
+    @property
+    def limitado(self) -> bool:
+        return any(
+            v is not None
+            for v in (self.max_requisicoes_execucao, self.max_tokens_execucao, self.max_requisicoes_dia, self.max_tokens_dia)
+        )
+
+    def iniciar_execucao(self):
+        with self._lock:
+            self.requisicoes = 0
+            self.tokens = 0
+
+    def consumo_dia(self) -> Dict[str, int]:
+        vazio = {"dia": _hoje(), "requisicoes": 0, "tokens": 0}
+        if not os.path.exists(self.path):
+            return vazio
+        with open(self.path, encoding="utf-8") as f:
+            dados = json.load(f)
+        # virou o dia: zera
+        return dados if dados.get("dia") == vazio["dia"] else vazio
+
+    def disponivel(self) -> Dict[str, float]:
+        """Requisições e tokens que ainda cabem (o menor entre execução e dia)."""
+        dia = self.consumo_dia() if self.max_requisicoes_dia is not None or self.max_tokens_dia is not None else None
+
+        def resta(limite_exec, usado_exec, limite_dia, campo):
+            livre = math.inf
+            if limite_exec is not None:
+                livre = min(livre, limite_exec - usado_exec)
+            if limite_dia is not None:
+                livre = min(livre, limite_dia - dia[campo])
+            return max(livre, 0)
+
+        with self._lock:
+            return {
+                "requisicoes": resta(self.max_requisicoes_execucao, self.requisicoes, self.max_requisicoes_dia, "requisicoes"),
+                "tokens": resta(self.max_tokens_execucao, self.tokens, self.max_tokens_dia, "tokens"),
+            }
+
+    def cabe(self, requisicoes: int, tokens: int) -> bool:
+        livre = self.disponivel()
+        return requisicoes <= livre["requisicoes"] and tokens <= livre["tokens"]
+
+    def registrar(self, requisicoes: int, tokens: int):
+        with self._lock:
+            self.requisicoes += requisicoes
+            self.tokens += tokens
+
+        # sem limite diário ninguém lê o consumo do dia: não precisa tocar no arquivo
+        if self.max_requisicoes_dia is None and self.max_tokens_dia is None:
+            return
+
+        with bloqueio(self.path):
+            dados = self.consumo_dia()
+            dados["requisicoes"] += requisicoes
+            dados["tokens"] += tokens
+
+            def escrever(tmp):
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(dados, f)
+
+            escrever_atomico(self.path, escrever)
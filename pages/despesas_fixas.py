@@ -1,14 +1,19 @@
-import os
 import uuid
 import pandas as pd
 import streamlit as st
 from streamlit_tags import st_tags, st_tags_sidebar
-
-BKP_PATH = "bkp/despesa_fixa.csv"
+from exportacao import render_download
+import banco
+import repositorio
+import workspace
 
 st.set_page_config(page_title="Despesas Fixas", layout="wide")
 st.title("Despesas Fixas")
 
+# dados do workspace da sessão (escolhido na página principal)
+DB_PATH = workspace.caminho_db()
+st.sidebar.caption(f"Workspace: {workspace.workspace_atual()}")
+
 # lista base
 if "keywords" not in st.session_state:
     st.session_state["keywords"] = [
@@ -29,29 +34,14 @@ def format_brl(value) -> str:
     return f"R$ {s}"
 
 def load_despesa_fixa() -> pd.DataFrame:
-    os.makedirs("bkp", exist_ok=True)
-
-    if not os.path.exists(BKP_PATH):
-        return pd.DataFrame(columns=["ID", "Tipo", "Valor", ])
-
-    df = pd.read_csv(BKP_PATH)
-
-    # garante colunas
-    if "ID" not in df.columns:
-        df.insert(0, "ID", [str(uuid.uuid4()) for _ in range(len(df))])
-
-    df["Tipo"] = df.get("Tipo", "Reembolso").fillna("Reembolso")
-    df["Valor"] = pd.to_numeric(df.get("Valor"), errors="coerce").fillna(0.0)
-    return df
-
-def save_despesa_fixa(df: pd.DataFrame):
-    os.makedirs("bkp", exist_ok=True)
-    df.to_csv(BKP_PATH, index=False)
+    return repositorio.carregar_despesas_fixas(DB_PATH)
 
 # ---------- Load ----------
 df = load_despesa_fixa()
 
 # ---------- Sidebar: filtros ----------
+if st.sidebar.button("Gravar backup CSV"):
+    st.sidebar.success(f"Backup salvo em {banco.exportar_csv('despesas_fixas', db_path=DB_PATH)}")
 
 
 # ---------- Cadastro ----------
@@ -93,8 +83,7 @@ if submitted:
           "Valor": float(valor),
       })
 
-    df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
-    save_despesa_fixa(df)
+    repositorio.inserir_despesas_fixas(rows, DB_PATH)
     st.success(f"Despesa Fixa Adicionada.")
     st.rerun()
 
@@ -127,9 +116,4 @@ else:
     colS1, colS2 = st.columns([1, 2])
 
     with colS2:
-        st.download_button(
-            "Baixar despesa_fixa.csv",
-            data=df.to_csv(index=False).encode("utf-8"),
-            file_name="despesa_fixa.csv",
-            mime="text/csv",
-        )
+        render_download(df, "despesa_fixa", key="export_despesa_fixa")
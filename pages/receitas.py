@@ -1,16 +1,25 @@
-import os
 import uuid
 import pandas as pd
 import streamlit as st
 from datetime import date
 import calendar
+from exportacao import render_download
 from datetime import date
-
-BKP_PATH = "bkp/receitas.csv"
+import banco
+import conciliacao
+import cubo
+import repositorio
+import workspace
+from ui_analysis import caminho_backup
 
 st.set_page_config(page_title="Receitas", layout="wide")
 st.title("Receitas (a receber)")
 
+# dados do workspace da sessão (escolhido na página principal)
+DB_PATH = workspace.caminho_db()
+CUBO_PATH = workspace.caminho(cubo.ARQ_CUBO)
+st.sidebar.caption(f"Workspace: {workspace.workspace_atual()}")
+
 
 def default_dia_10() -> date:
     hoje = date.today()
@@ -45,50 +54,7 @@ def format_brl(value) -> str:
     return f"R$ {s}"
 
 def load_receitas() -> pd.DataFrame:
-    os.makedirs("bkp", exist_ok=True)
-
-    if not os.path.exists(BKP_PATH):
-        return pd.DataFrame(columns=["ID", "Tipo", "Pessoa", "Valor", "Vezes", "Data", "Recebido", "Observacao"])
-
-    df = pd.read_csv(BKP_PATH)
-
-    # garante colunas
-    if "ID" not in df.columns:
-        df.insert(0, "ID", [str(uuid.uuid4()) for _ in range(len(df))])
-
-    if "Recebido" not in df.columns:
-        # se existia Status antigo, tenta converter
-        if "Status" in df.columns:
-            df["Recebido"] = df["Status"].astype(str).str.strip().str.upper().eq("RECEBIDO")
-            df = df.drop(columns=["Status"])
-        else:
-            df["Recebido"] = False
-
-    if "Observacao" not in df.columns:
-        df["Observacao"] = ""
-
-    df["Tipo"] = df.get("Tipo", "Reembolso").fillna("Reembolso")
-    df["Pessoa"] = df.get("Pessoa", "").fillna("")
-    df["Valor"] = pd.to_numeric(df.get("Valor"), errors="coerce").fillna(0.0)
-    df["Vezes"] = pd.to_numeric(df.get("Vezes"), errors="coerce").fillna(1).astype(int)
-    df["Data"] = pd.to_datetime(df.get("Data"), errors="coerce").dt.date
-    df["Recebido"] = df["Recebido"].fillna(False).astype(bool)
-    df["Observacao"] = df["Observacao"].fillna("")
-
-    if "ParcelaAtual" not in df.columns:
-        df["ParcelaAtual"] = pd.NA
-    if "ParcelaTotal" not in df.columns:
-        df["ParcelaTotal"] = pd.NA
-
-    df["ParcelaAtual"] = pd.to_numeric(df["ParcelaAtual"], errors="coerce")
-    df["ParcelaTotal"] = pd.to_numeric(df["ParcelaTotal"], errors="coerce")
-
-
-    return df
-
-def save_receitas(df: pd.DataFrame):
-    os.makedirs("bkp", exist_ok=True)
-    df.to_csv(BKP_PATH, index=False)
+    return repositorio.carregar_receitas(DB_PATH)
 
 # ---------- Load ----------
 df = load_receitas()
@@ -136,6 +102,9 @@ recebido_sel = st.sidebar.pills(
     selection_mode="multi",
 )
 
+if st.sidebar.button("Gravar backup CSV"):
+    st.sidebar.success(f"Backup salvo em {banco.exportar_csv('receitas', db_path=DB_PATH)}")
+
 # ---------- Cadastro ----------
 st.subheader("Adicionar receita")
 
@@ -176,10 +145,9 @@ if submitted:
             "ParcelaTotal": n if n > 1 else pd.NA,
         })
 
-    df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
-    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
-    df["MesRef"] = df["Data"].dt.to_period("M")
-    save_receitas(df)
+    # uma transação só para as N parcelas
+    repositorio.inserir_receitas(rows, DB_PATH)
+    repositorio.atualizar_cubo_receitas(CUBO_PATH, {r["Data"].strftime("%Y-%m") for r in rows}, DB_PATH)
     st.success(f"Receita adicionada ({n}x).")
     st.rerun()
 
@@ -256,6 +224,46 @@ else:
         resumo_show = resumo_show.rename(columns={"Valor": "Total pendente"})
         st.dataframe(resumo_show, use_container_width=True, hide_index=True)
 
+# ---------- Conciliação com créditos do cartão ----------
+with st.expander("🔗 Conciliar reembolsos com créditos do cartão", expanded=False):
+    st.caption(
+        "Procura, em todos os meses, créditos do cartão com o mesmo valor de um reembolso "
+        "pendente e data próxima. Os casamentos marcados viram Recebido."
+    )
+    colC1, colC2 = st.columns(2)
+    janela = colC1.number_input("Janela (dias)", min_value=0, max_value=60, value=conciliacao.JANELA_DIAS, step=1)
+    tolerancia = colC2.number_input(
+        "Tolerância no valor (centavos)", min_value=0, max_value=100, value=conciliacao.TOLERANCIA_CENTAVOS, step=1
+    )
+
+    propostas = conciliacao.propor_conciliacao(
+        df, repositorio.creditos_cartao(caminho_backup()), int(janela), int(tolerancia)
+    )
+
+    if propostas.empty:
+        st.info("Nenhum crédito do cartão casa com reembolsos pendentes.")
+    else:
+        revisao = propostas.assign(Aplicar=True)
+        revisado = st.data_editor(
+            revisao[["Aplicar", "Pessoa", "Data", "Valor", "DataCredito", "Lançamento", "ValorCredito", "Dias"]],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Aplicar": st.column_config.CheckboxColumn("Aplicar"),
+                "Data": st.column_config.DateColumn("Previsto", format="DD/MM/YYYY"),
+                "Valor": st.column_config.NumberColumn("Valor", format="%.2f"),
+                "DataCredito": st.column_config.DateColumn("Crédito em", format="DD/MM/YYYY"),
+                "ValorCredito": st.column_config.NumberColumn("Crédito", format="%.2f"),
+            },
+            disabled=["Pessoa", "Data", "Valor", "DataCredito", "Lançamento", "ValorCredito", "Dias"],
+            key="editor_conciliacao",
+        )
+
+        if st.button(f"Marcar como recebidos ({int(revisado['Aplicar'].sum())})", type="primary"):
+            n = conciliacao.aplicar_conciliacao(propostas[revisado["Aplicar"].to_numpy()], DB_PATH)
+            st.success(f"{n} reembolso(s) conciliado(s).")
+            st.rerun()
+
 # ---------- Tabela de lançamentos (editável) ----------
 st.subheader("Lançamentos")
 
@@ -273,7 +281,7 @@ else:
         axis=1
     )
     # Mostra uma tabela editável pra marcar "Recebido"
-    df_edit = df_view.copy()
+    df_edit = df_view.set_index("ID")
     
     df_edit["Valor"] = df_edit["Valor"].apply(format_brl)
 
@@ -298,23 +306,14 @@ else:
     colS1, colS2 = st.columns([1, 2])
     with colS1:
         if st.button("Salvar alterações", type="primary"):
-            # aplica alterações no df original pelo ID
-            df_new = df.copy()
-            upd = edited[["ID", "Recebido", "Observacao"]].copy()
-
-            df_new = df_new.merge(upd, on="ID", how="left", suffixes=("", "_new"))
-            df_new["Recebido"] = df_new["Recebido_new"].fillna(df_new["Recebido"]).astype(bool)
-            df_new["Observacao"] = df_new["Observacao_new"].fillna(df_new["Observacao"])
-            df_new = df_new.drop(columns=["Recebido_new", "Observacao_new"])
+            # grava só as linhas que mudaram (o índice do editor é o ID)
+            orig = df_edit.loc[edited.index, ["Recebido", "Observacao"]]
+            upd = edited[["Recebido", "Observacao"]]
+            mudou = (upd["Recebido"] != orig["Recebido"]) | (upd["Observacao"].fillna("") != orig["Observacao"])
 
-            save_receitas(df_new)
+            repositorio.atualizar_receitas(upd[mudou].rename_axis("ID").reset_index(), DB_PATH)
             st.success("Alterações salvas!")
             st.rerun()
 
     with colS2:
-        st.download_button(
-            "Baixar receitas.csv",
-            data=df.to_csv(index=False).encode("utf-8"),
-            file_name="receitas.csv",
-            mime="text/csv",
-        )
+        render_download(df, "receitas", key="export_receitas", df_filtrado=df_view)
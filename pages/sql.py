@@ -0,0 +1,68 @@
+import time
+
+import streamlit as st
+
+import consulta_sql
+import cubo
+import workspace
+from exportacao import render_download
+from ui_analysis import caminho_backup
+
+st.set_page_config(page_title="Consulta SQL", layout="wide")
+st.title("Consulta SQL")
+
+st.sidebar.caption(f"Workspace: {workspace.workspace_atual()}")
+
+motor = consulta_sql.motor(caminho_backup(), workspace.caminho_db(), workspace.caminho(cubo.ARQ_CUBO))
+
+# ---------- Tabelas ----------
+with st.sidebar.expander("Tabelas", expanded=True):
+    for tabela, colunas in motor.tabelas().items():
+        st.markdown(f"**{tabela}**")
+        st.caption(", ".join(colunas))
+
+# ---------- Consulta ----------
+def carregar_exemplo():
+    # só quando troca o exemplo: não sobrescreve o que foi editado depois
+    nome = st.session_state["sql_exemplo"]
+    if nome in consulta_sql.EXEMPLOS:
+        st.session_state["sql_texto"] = consulta_sql.EXEMPLOS[nome].strip()
+
+
+st.selectbox(
+    "Exemplos",
+    ["(escrever a minha)"] + list(consulta_sql.EXEMPLOS),
+    key="sql_exemplo",
+    on_change=carregar_exemplo,
+)
+
+sql = st.text_area(
+    "SQL (DuckDB, só leitura)",
+    key="sql_texto",
+    height=180,
+    placeholder="SELECT Categoria, SUM(Valor) FROM cartao GROUP BY ALL ORDER BY 2 DESC",
+)
+
+# o resultado fica na sessão: trocar o formato do download (rerun) não pode apagá-lo
+if st.button("Executar", type="primary"):
+    if not sql.strip():
+        st.info("Escreva uma consulta ou escolha um exemplo.")
+        st.stop()
+
+    st.session_state.pop("sql_resultado", None)
+    t0 = time.perf_counter()
+    try:
+        res = motor.consultar(sql)
+    except Exception as e:
+        st.error(f"{type(e).__name__}: {e}")
+        st.stop()
+    st.session_state["sql_resultado"] = {"sql": sql, "res": res, "ms": (time.perf_counter() - t0) * 1000}
+
+ultimo = st.session_state.get("sql_resultado")
+if ultimo is not None:
+    res = ultimo["res"]
+    st.caption(f"{len(res)} linha(s) em {ultimo['ms']:.0f} ms (máx. {consulta_sql.LIMITE_LINHAS})")
+    if ultimo["sql"] != sql:
+        st.caption("Resultado da última consulta executada (o SQL foi editado depois).")
+    st.dataframe(res, use_container_width=True, hide_index=True)
+    render_download(res, "consulta", key="export_sql")
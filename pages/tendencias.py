@@ -0,0 +1,82 @@
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+import cubo
+import repositorio
+import workspace
+from ui_analysis import ARQ_DESPESA, format_brl
+
+st.set_page_config(page_title="Tendências", layout="wide")
+st.title("Tendências")
+
+DB_PATH = workspace.caminho_db()
+CUBO_PATH = workspace.caminho(cubo.ARQ_CUBO)
+st.sidebar.caption(f"Workspace: {workspace.workspace_atual()}")
+
+# ---------- Load ----------
+# os gráficos leem o cubo pré-agregado (MesRef x Origem x Categoria),
+# que é atualizado mês a mês quando a fatura/receita é salva
+df = repositorio.carregar_cubo(CUBO_PATH, workspace.caminho(ARQ_DESPESA), DB_PATH)
+
+if st.sidebar.button("Recalcular cubo"):
+    df = repositorio.reconstruir_cubo(CUBO_PATH, workspace.caminho(ARQ_DESPESA), DB_PATH)
+
+if df.empty:
+    st.info("Ainda não há meses salvos. Processe uma fatura ou cadastre receitas primeiro.")
+    st.stop()
+
+meses = sorted(df["MesRef"].dropna().unique().tolist())
+ini, fim = st.sidebar.select_slider(
+    "Período",
+    options=meses,
+    value=(meses[max(len(meses) - 12, 0)], meses[-1]),
+) if len(meses) > 1 else (meses[0], meses[0])
+
+df = df[(df["MesRef"] >= ini) & (df["MesRef"] <= fim)]
+
+cartao = df[df["Origem"] == cubo.ORIGEM_CARTAO]
+receita = df[df["Origem"] == cubo.ORIGEM_RECEITA]
+despesas_fixas = repositorio.total_despesas_fixas(DB_PATH)
+
+# ---------- Gasto por categoria ----------
+st.subheader("Cartão por categoria")
+
+categorias = sorted(cartao["Categoria"].unique().tolist())
+cat_sel = st.sidebar.pills("Categoria", options=categorias, default=categorias, selection_mode="multi")
+cartao_cat = cartao[cartao["Categoria"].isin(cat_sel)] if cat_sel else cartao
+
+fig = px.bar(cartao_cat, x="MesRef", y="Valor", color="Categoria", labels={"MesRef": "Mês", "Valor": "R$"})
+st.plotly_chart(fig, use_container_width=True)
+
+# ---------- Totais por mês ----------
+tot_cartao = cartao.groupby("MesRef")["Valor"].sum()
+tot_receita = receita.groupby("MesRef")["Valor"].sum()
+
+resumo = pd.DataFrame({"Cartão": tot_cartao, "Receita": tot_receita}).reindex(
+    sorted(set(tot_cartao.index) | set(tot_receita.index))
+).fillna(0.0)
+resumo["Fixas"] = despesas_fixas
+resumo["Saldo"] = resumo["Receita"] - resumo["Fixas"] - resumo["Cartão"]
+resumo.index.name = "MesRef"
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.subheader("Fixas x variáveis")
+    fx = resumo[["Fixas", "Cartão"]].rename(columns={"Cartão": "Variáveis (cartão)"}).reset_index()
+    fig = px.bar(fx.melt(id_vars="MesRef", var_name="Tipo", value_name="Valor"), x="MesRef", y="Valor", color="Tipo",
+                 labels={"MesRef": "Mês", "Valor": "R$"})
+    st.plotly_chart(fig, use_container_width=True)
+
+with col2:
+    st.subheader("Receitas x cartão")
+    rc = resumo[["Receita", "Cartão"]].reset_index()
+    fig = px.line(rc.melt(id_vars="MesRef", var_name="Origem", value_name="Valor"), x="MesRef", y="Valor", color="Origem",
+                  markers=True, labels={"MesRef": "Mês", "Valor": "R$"})
+    st.plotly_chart(fig, use_container_width=True)
+
+resumo_show = resumo.reset_index()
+for c in ["Cartão", "Receita", "Fixas", "Saldo"]:
+    resumo_show[c] = resumo_show[c].apply(format_brl)
+st.dataframe(resumo_show, use_container_width=True, hide_index=True)
@@ -0,0 +1,297 @@
+import os
+import tempfile
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+import repositorio
+from agente import CSV_CHUNK_LINHAS
+from arquivos import bloqueio, escrever_atomico
+from cache_categorias import atualizar_cache, carregar_cache
+from cubo import ARQ_CUBO, ORIGEM_CARTAO, agregar, atualizar_cartao, atualizar_meses, combinar
+
+ARQ_REVISAO_LSH = "revisao_lsh.csv"
+
+# colunas de saída de cada etapa (modo em blocos grava o cabeçalho antes do 1º bloco)
+COLS_LEITURA = ["Data", "Lançamento", "Valor", "MesRef"]
+COLS_PARCELAS = COLS_LEITURA + ["ParcelaAtual", "ParcelaTotal", "Parcela", "Lancamento_Limpo"]
+
+# (pct 0-100, mensagem)
+OnStatus = Callable[[int, str], None]
+
+
+def salvar_backup(df: pd.DataFrame, path: str):
+    """
+    Grava o(s) mês(es) de `df` no backup, mantendo os outros meses.
+    Lê e regrava sob lock, com escrita atômica (duas sessões não se sobrescrevem).
+    """
+    with bloqueio(path):
+        if os.path.exists(path) and "MesRef" in df.columns:
+            antigo = pd.read_csv(path)
+            antigo = antigo[~antigo["MesRef"].isin(df["MesRef"].unique())]
+            df = pd.concat([antigo, df], ignore_index=True)
+        escrever_atomico(path, lambda tmp: df.to_csv(tmp, index=False))
+    repositorio.invalidar(path)
+
+
+def _blocos_texto(path: str, linhas: int):
+    """Lê um CSV em blocos com tudo como texto: regravar não muda a formatação (1 -> 1.0)."""
+    with pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=linhas) as leitor:
+        yield from leitor
+
+
+def _gravar_blocos(blocos: Iterable[pd.DataFrame], destino: str, colunas: List[str]) -> int:
+    """Escreve o cabeçalho e depois cada bloco em append; devolve o nº de linhas."""
+    pd.DataFrame(columns=colunas).to_csv(destino, index=False)
+    n = 0
+    for bloco in blocos:
+        bloco.reindex(columns=colunas).to_csv(destino, mode="a", header=False, index=False)
+        n += len(bloco)
+    return n
+
+
+def salvar_backup_em_blocos(novo_path: str, meses: Iterable[str], path: str, linhas: int = CSV_CHUNK_LINHAS):
+    """
+    Igual a `salvar_backup`, mas os meses novos vêm de um CSV e os dois arquivos
+    são copiados em blocos, sem carregar nenhum deles inteiro na memória.
+    """
+    meses = {str(m) for m in meses}
+    with bloqueio(path):
+        colunas = list(pd.read_csv(novo_path, nrows=0).columns)
+        existe = os.path.exists(path)
+        if existe:
+            antigas = list(pd.read_csv(path, nrows=0).columns)
+            colunas = antigas + [c for c in colunas if c not in antigas]
+
+        def blocos():
+            if existe:
+                for bloco in _blocos_texto(path, linhas):
+                    yield bloco[~bloco["MesRef"].isin(meses)] if "MesRef" in bloco.columns else bloco
+            yield from _blocos_texto(novo_path, linhas)
+
+        escrever_atomico(path, lambda tmp: _gravar_blocos(blocos(), tmp, colunas))
+    repositorio.invalidar(path)
+
+
+def historico_rotulado(backup_path: str, cache: Dict[str, str]) -> Dict[str, str]:
+    """Lancamento_Limpo -> Categoria do backup (sem créditos, que têm categoria forçada) + cache."""
+    rotulados: Dict[str, str] = {}
+    if os.path.exists(backup_path):
+        hist = pd.read_csv(backup_path, usecols=lambda c: c in ("Lancamento_Limpo", "Categoria", "Valor"))
+        if {"Lancamento_Limpo", "Categoria"} <= set(hist.columns):
+            if "Valor" in hist.columns:
+                hist = hist[pd.to_numeric(hist["Valor"], errors="coerce") >= 0]
+            hist = hist.dropna(subset=["Lancamento_Limpo", "Categoria"])
+            rotulados = dict(zip(hist["Lancamento_Limpo"].astype(str), hist["Categoria"].astype(str)))
+
+    rotulados.update(cache)
+    return rotulados
+
+
+def registrar_matches_lsh(matches, mes_ref: str, pasta: str):
+    """Acrescenta as categorias herdadas por similaridade em revisao_lsh.csv, para conferência."""
+    if not matches:
+        return
+
+    path = os.path.join(pasta, ARQ_REVISAO_LSH)
+    novos = pd.DataFrame(matches).assign(MesRef=mes_ref)
+    with bloqueio(path):
+        novos.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+# origens que não entram no cache compartilhado: o fallback local (na próxima vez vai
+# pro LLM) e o herdado por similaridade, que ainda está em revisão (revisao_lsh.csv)
+ORIGENS_FORA_DO_CACHE = ("local", "lsh")
+
+
+def _para_cache(mapa: Dict[str, str], origens: Dict[str, str]) -> Dict[str, str]:
+    return {t: c for t, c in mapa.items() if origens.get(t) not in ORIGENS_FORA_DO_CACHE}
+
+
+def resumo_cobertura(cobertura: Dict[str, float]) -> str:
+    """Fração do valor da fatura por origem da categoria (ver AgenteCartao.cobertura)."""
+    nomes = {"llm": "LLM", "cache": "cache", "lsh": "similaridade", "local": "fallback local (orçamento)"}
+    partes = [f"{nomes.get(o, o)} {f:.0%}" for o, f in sorted(cobertura.items(), key=lambda x: -x[1]) if f > 0]
+    return "Valor categorizado por: " + ", ".join(partes) if partes else ""
+
+
+def filtrar_pagamento_efetuado(df: pd.DataFrame) -> pd.DataFrame:
+    # remove "PAGAMENTO EFETUADO" (robusto)
+    if "Lancamento_Limpo" in df.columns:
+        mask = df["Lancamento_Limpo"].astype(str).str.strip().str.upper() != "PAGAMENTO EFETUADO"
+        return df[mask].copy()
+    return df
+
+
+def executar_pipeline(
+    agente,
+    file,
+    acao: str,
+    salvar_csv: bool,
+    mes_ref: str,
+    backup_path: str,
+    on_status: Optional[OnStatus] = None,
+) -> pd.DataFrame:
+    """
+    Leitura -> parcelas -> categorização -> backup, sem nada de Streamlit
+    (roda tanto no script quanto no worker de jobs).
+    """
+    def status(pct: int, msg: str):
+        if on_status:
+            on_status(pct, msg)
+
+    status(15, "📥 Lendo arquivo do cartão...")
+    df = agente.ler_arquivo_cartao(file)
+
+    df["MesRef"] = mes_ref
+
+    if acao == "Só ler CSV":
+        status(100, "✅ Concluído.")
+        return df
+
+    status(40, "🧾 Adicionando parcelas...")
+    df = agente.adicionar_parcelas(df, copiar=False)
+
+    # remove pagamento efetuado antes do LLM
+    df = filtrar_pagamento_efetuado(df)
+
+    if acao == "Ler CSV + parcelas":
+        status(100, "✅ Concluído.")
+        return df
+
+    status(70, "🤖 Categorizando lançamentos via Groq...")
+
+    def on_llm_progress(done: int, total: int):
+        base = 70
+        span = 20
+        pct = base + int(span * (done / max(total, 1)))
+        status(pct, f"🤖 Categorizando lançamentos via Groq... {done}/{total}")
+
+    # cache compartilhado entre workspaces: descrição já vista não vai pro LLM
+    cache = carregar_cache()
+
+    # histórico rotulado (backup + cache) vira exemplos few-shot no prompt
+    agente.carregar_historico(historico_rotulado(backup_path, cache))
+    df = agente.categorizar_batch(df, on_progress=on_llm_progress, conhecidas=cache, copiar=False)
+    atualizar_cache(_para_cache(dict(zip(df["Lancamento_Limpo"].astype(str), df["Categoria"])), agente.origens))
+    registrar_matches_lsh(agente.matches_lsh, mes_ref, os.path.dirname(backup_path) or ".")
+
+    # regra final: valor negativo = reembolso/crédito
+    df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce")
+    df.loc[df["Valor"] < 0, "Categoria"] = "Reembolsos & Créditos"
+
+    if salvar_csv:
+        status(95, "💾 Salvando arquivo...")
+        salvar_backup(df, backup_path)
+        cubo_path = os.path.join(os.path.dirname(backup_path) or ".", ARQ_CUBO)
+        atualizar_cartao(cubo_path, df)
+        repositorio.invalidar(cubo_path)
+
+    status(100, f"✅ Processamento concluído. {resumo_cobertura(agente.cobertura)}".strip())
+    return df
+
+
+def executar_pipeline_chunks(
+    agente,
+    file,
+    acao: str,
+    salvar_csv: bool,
+    mes_ref: str,
+    backup_path: str,
+    saida_path: str,
+    on_status: Optional[OnStatus] = None,
+    linhas: int = CSV_CHUNK_LINHAS,
+) -> int:
+    """
+    Mesmo fluxo de `executar_pipeline` para CSVs grandes, com memória limitada
+    pelo tamanho do bloco:
+      1. lê + parcelas bloco a bloco, gravando num CSV intermediário e guardando
+         só o conjunto de descrições únicas;
+      2. categoriza as descrições únicas de uma vez;
+      3. relê o intermediário em blocos, aplica as categorias e grava em `saida_path`.
+    Devolve o nº de linhas gravadas.
+    """
+    def status(pct: int, msg: str):
+        if on_status:
+            on_status(pct, msg)
+
+    parcelas = acao != "Só ler CSV"
+    categorizar = parcelas and acao != "Ler CSV + parcelas"
+    # descrição -> soma de |Valor|: prioridade no orçamento do LLM
+    pesos: Dict[str, float] = {}
+
+    def ler():
+        lidas = 0
+        for bloco in agente.ler_csv_cartao_chunks(file, linhas):
+            bloco["MesRef"] = mes_ref
+            if parcelas:
+                bloco = filtrar_pagamento_efetuado(agente.adicionar_parcelas(bloco, copiar=False))
+                soma = pd.to_numeric(bloco["Valor"], errors="coerce").abs().groupby(bloco["Lancamento_Limpo"].astype(str)).sum()
+                for texto, valor in soma.items():
+                    pesos[texto] = pesos.get(texto, 0.0) + valor
+            lidas += len(bloco)
+            status(15, f"📥 Lendo arquivo do cartão em blocos... {lidas} linhas")
+            yield bloco
+
+    colunas = COLS_PARCELAS if parcelas else COLS_LEITURA
+    if not categorizar:
+        n = 0
+
+        def escrever(tmp):
+            nonlocal n
+            n = _gravar_blocos(ler(), tmp, colunas)
+
+        escrever_atomico(saida_path, escrever)
+        status(100, "✅ Concluído.")
+        return n
+
+    pasta = os.path.dirname(saida_path) or "."
+    fd, intermediario = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+    os.close(fd)
+    try:
+        _gravar_blocos(ler(), intermediario, colunas)
+
+        status(70, "🤖 Categorizando lançamentos via Groq...")
+
+        def on_llm_progress(done: int, total: int):
+            pct = 70 + int(20 * (done / max(total, 1)))
+            status(pct, f"🤖 Categorizando lançamentos via Groq... {done}/{total}")
+
+        cache = carregar_cache()
+        agente.carregar_historico(historico_rotulado(backup_path, cache))
+        mapa = agente.mapear_categorias(sorted(pesos), on_progress=on_llm_progress, conhecidas=cache, pesos=pesos)
+        atualizar_cache(_para_cache(mapa, agente.origens))
+        registrar_matches_lsh(agente.matches_lsh, mes_ref, os.path.dirname(backup_path) or ".")
+        pesos.clear()
+
+        status(90, "🏷️ Aplicando categorias...")
+        agregados: List[pd.DataFrame] = []
+
+        def categorizados():
+            for bloco in _blocos_texto(intermediario, linhas):
+                bloco["Categoria"] = bloco["Lancamento_Limpo"].map(mapa)
+                # regra final: valor negativo = reembolso/crédito
+                bloco.loc[pd.to_numeric(bloco["Valor"], errors="coerce") < 0, "Categoria"] = "Reembolsos & Créditos"
+                agregados.append(agregar(bloco, ORIGEM_CARTAO))
+                yield bloco
+
+        n = 0
+
+        def escrever(tmp):
+            nonlocal n
+            n = _gravar_blocos(categorizados(), tmp, colunas + ["Categoria"])
+
+        escrever_atomico(saida_path, escrever)
+    finally:
+        if os.path.exists(intermediario):
+            os.remove(intermediario)
+
+    if salvar_csv:
+        status(95, "💾 Salvando arquivo...")
+        salvar_backup_em_blocos(saida_path, [mes_ref], backup_path, linhas)
+        cubo_path = os.path.join(os.path.dirname(backup_path) or ".", ARQ_CUBO)
+        atualizar_meses(cubo_path, combinar(agregados), ORIGEM_CARTAO, [mes_ref])
+        repositorio.invalidar(cubo_path)
+
+    status(100, f"✅ Processamento concluído. {resumo_cobertura(agente.cobertura)}".strip())
+    return n
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import banco
+import cubo
+from metricas import METRICAS
+
+# (tipo, caminho) -> (versão dos arquivos, DataFrame já tipado)
+_frames: Dict[Tuple[str, str], Tuple[Tuple, pd.DataFrame]] = {}
+_lock = threading.Lock()
+
+COLS_CREDITOS = ["Data", "Lançamento", "Valor", "MesRef"]
+
+
+def versao(*paths: str) -> Tuple:
+    # mtime + tamanho (o SQLite em WAL escreve primeiro no -wal): só um stat, sem ler o arquivo
+    return tuple((os.stat(p).st_mtime_ns, os.stat(p).st_size) if os.path.exists(p) else None for p in paths)
+
+
+def _obter(tipo: str, path: str, versao_atual: Tuple, carregar: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """Frame em memória se o arquivo não mudou; senão relê (fora do lock) e guarda."""
+    chave = (tipo, os.path.abspath(path))
+    with _lock:
+        guardado = _frames.get(chave)
+    if guardado is not None and guardado[0] == versao_atual:
+        METRICAS.incr("repositorio.acerto")
+        return guardado[1]
+
+    t0 = time.perf_counter()
+    df = carregar()
+    METRICAS.registrar_tempo(f"repositorio.carga.{tipo}", time.perf_counter() - t0)
+    with _lock:
+        _frames[chave] = (versao_atual, df)
+    return df
+
+
+def invalidar(*paths: str):
+    """Descarta o que estiver guardado desses arquivos (chamado por quem grava)."""
+    alvos = {os.path.abspath(p) for p in paths}
+    with _lock:
+        for chave in [c for c in _frames if c[1] in alvos]:
+            del _frames[chave]
+
+
+# ---------- Backup do cartão ----------
+def _ler_backup(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    if "Valor" in df.columns:
+        df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce")
+    return df
+
+
+def _backup(path: str) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    return _obter("backup", path, versao(path), lambda: _ler_backup(path))
+
+
+def carregar_backup(path: str) -> Optional[pd.DataFrame]:
+    """Backup do cartão (Valor numérico); None se ainda não existe."""
+    df = _backup(path)
+    return None if df is None else df.copy()
+
+
+def creditos_cartao(path: str) -> pd.DataFrame:
+    """Créditos (Valor < 0) do backup, com o índice original da linha (ver conciliacao)."""
+    df = _backup(path)
+    if df is None:
+        return pd.DataFrame(columns=COLS_CREDITOS)
+    return df.loc[df["Valor"] < 0, [c for c in COLS_CREDITOS if c in df.columns]].copy()
+
+
+# ---------- Cubo ----------
+def carregar_cubo(path: str, backup_path: str, db_path: str) -> pd.DataFrame:
+    """Cubo mensal; monta do zero na primeira vez (ver cubo.reconstruir)."""
+    if not os.path.exists(path):
+        return reconstruir_cubo(path, backup_path, db_path)
+    return _obter("cubo", path, versao(path), lambda: cubo.carregar_cubo(path)).copy()
+
+
+def reconstruir_cubo(path: str, backup_path: str, db_path: str) -> pd.DataFrame:
+    # o cubo é montado a partir dos mesmos frames em memória que as páginas usam
+    df = cubo.reconstruir(path, lambda: _backup(backup_path), lambda: carregar_receitas(db_path))
+    invalidar(path)
+    return df
+
+
+def atualizar_cubo_receitas(path: str, meses: Iterable[str], db_path: str):
+    cubo.atualizar_receitas(path, meses, db_path)
+    invalidar(path)
+
+
+# ---------- Banco (receitas / despesas fixas) ----------
+def _versao_db(db_path: str) -> Tuple:
+    return versao(db_path, f"{db_path}-wal")
+
+
+def carregar_receitas(db_path: str = banco.DB_PATH) -> pd.DataFrame:
+    return _obter("receitas", db_path, _versao_db(db_path), lambda: banco.carregar_receitas(db_path)).copy()
+
+
+def carregar_despesas_fixas(db_path: str = banco.DB_PATH) -> pd.DataFrame:
+    return _obter("despesas_fixas", db_path, _versao_db(db_path), lambda: banco.carregar_despesas_fixas(db_path)).copy()
+
+
+def total_receitas_mes(mes_ref: str, db_path: str = banco.DB_PATH) -> float:
+    df = _obter("receitas", db_path, _versao_db(db_path), lambda: banco.carregar_receitas(db_path))
+    return float(df.loc[df["MesRef"] == mes_ref, "Valor"].sum())
+
+
+def total_despesas_fixas(db_path: str = banco.DB_PATH) -> float:
+    df = _obter("despesas_fixas", db_path, _versao_db(db_path), lambda: banco.carregar_despesas_fixas(db_path))
+    return float(pd.to_numeric(df["Valor"], errors="coerce").sum())
+
+
+def inserir_receitas(rows: List[Dict], db_path: str = banco.DB_PATH):
+    banco.inserir_receitas(rows, db_path)
+    invalidar(db_path)
+
+
+def atualizar_receitas(alteradas: pd.DataFrame, db_path: str = banco.DB_PATH):
+    banco.atualizar_receitas(alteradas, db_path)
+    invalidar(db_path)
+
+
+def inserir_despesas_fixas(rows: List[Dict], db_path: str = banco.DB_PATH):
+    banco.inserir_despesas_fixas(rows, db_path)
+    invalidar(db_path)
@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# os módulos do app ficam soltos na raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def pasta_isolada(tmp_path, monkeypatch):
+    """Cada teste roda numa pasta vazia: os caminhos relativos (bkp/...) não tocam nos dados reais."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class CadeiaFalsa:
+    """Substitui a chain do LLM: `responder(entrada) -> str`, com atraso opcional; guarda as chamadas."""
+
+    def __init__(self, responder=lambda entrada: "Outros", atraso: float = 0.0):
+        self.responder = responder
+        self.atraso = atraso
+        self.chamadas = []
+        self._lock = threading.Lock()
+
+    def invoke(self, entrada, config=None):
+        with self._lock:
+            self.chamadas.append(entrada)
+        time.sleep(self.atraso)
+        return self.responder(entrada)
+
+    def batch(self, entradas, config=None):
+        return [self.invoke(e) for e in entradas]
+
+
+@pytest.fixture
+def agente_falso():
+    """Fábrica de AgenteCartao com a chain trocada por uma CadeiaFalsa e sem sleep entre lotes."""
+    from agente import AgenteCartao, AgenteCartaoConfig
+
+    def criar(cadeia=None, **config):
+        config.setdefault("sleep_seconds", 0)
+        agente = AgenteCartao(AgenteCartaoConfig(**config))
+        agente.chain = cadeia or CadeiaFalsa()
+        return agente
+
+    return criar
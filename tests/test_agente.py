@@ -0,0 +1,155 @@
+import pytest
+
+import agente as agente_mod
+from conftest import CadeiaFalsa
+from metricas import Metricas
+
+
+def test_execucoes_tem_historico_proprio_e_compartilham_o_cliente(agente_falso):
+    base = agente_falso()
+    a = base.nova_execucao()
+    b = base.nova_execucao()
+
+    a.carregar_historico({"PADARIA DO ZE": "Mercado"})
+
+    assert a.indice is not None
+    assert b.indice is None and base.indice is None
+    assert a.chain is b.chain is base.chain
+    assert a.orcamento is not b.orcamento
+
+
+def test_exemplos_do_prompt_vem_so_do_historico_da_execucao(agente_falso):
+    cadeia = CadeiaFalsa(lambda e: "Mercado")
+    base = agente_falso(cadeia)
+    a = base.nova_execucao()
+    b = base.nova_execucao()
+    a.carregar_historico({"PADARIA DO ZE CENTRO": "Mercado"})
+    b.carregar_historico({"FARMACIA SAO JOAO": "Saúde"})
+
+    b.mapear_categorias(["PADARIA DO ZE"])
+
+    assert "PADARIA DO ZE CENTRO" not in cadeia.chamadas[-1]["exemplos"]
+    assert b.origens == {"PADARIA DO ZE": "llm"}
+    assert a.origens == {}
+
+
+# ---------- política de latência ----------
+FALLBACK = "modelo-fallback"
+
+
+class ErroLimite(Exception):
+    status_code = 429
+
+
+def _sempre_limitado(entrada):
+    raise ErroLimite("rate limit")
+
+
+@pytest.fixture
+def metricas(monkeypatch):
+    m = Metricas()
+    monkeypatch.setattr(agente_mod, "METRICAS", m)
+    return m
+
+
+def _com_politica(agente_falso, cadeia, fallback=None, **config):
+    config = {"prazo_requisicao_s": 1.0, "modelos_fallback": (FALLBACK,), "espera_limite_s": 0,
+              "batch_size": 1, "reenvios_validacao": 0, **config}
+    agente = agente_falso(cadeia, **config)
+    agente._chains[FALLBACK] = fallback or CadeiaFalsa(lambda e: "Pets")
+    return agente
+
+
+def test_politica_e_opcional():
+    assert agente_mod.AgenteCartaoConfig().prazo_requisicao_s is None
+
+
+def test_limite_de_taxa_nao_cai_no_fallback(agente_falso, metricas):
+    principal = CadeiaFalsa(_sempre_limitado)
+    fallback = CadeiaFalsa(lambda e: "Pets")
+    agente = _com_politica(agente_falso, principal, fallback, max_retries=2)
+
+    with pytest.raises(ErroLimite):
+        agente.categorizar_textos(["PADARIA X"])
+
+    assert len(principal.chamadas) == 3  # 1 + max_retries, sempre no mesmo modelo
+    assert fallback.chamadas == []
+    assert agente.categorizadas_local == set()
+
+
+def test_limite_de_taxa_espera_e_tenta_de_novo(agente_falso, metricas):
+    respostas = iter([ErroLimite("rate limit"), "Mercado"])
+
+    def responder(entrada):
+        r = next(respostas)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    principal = CadeiaFalsa(responder)
+    agente = _com_politica(agente_falso, principal)
+    assert agente.categorizar_textos(["PADARIA X"]) == {"PADARIA X": "Mercado"}
+    assert metricas.contadores()[f"llm.{agente.config.model}.limite_taxa"] == 1
+
+
+def test_sem_hedge_antes_das_amostras_minimas(agente_falso, metricas):
+    principal = CadeiaFalsa(lambda e: "Mercado", atraso=0.3)
+    agente = _com_politica(agente_falso, principal, hedge_min_s=0.05, hedge_amostras_min=20)
+
+    agente.categorizar_textos(["PADARIA X"])
+    assert len(principal.chamadas) == 1
+
+    # com histórico de latência baixa, a chamada lenta ganha uma cópia
+    for _ in range(20):
+        metricas.registrar_tempo(f"llm.latencia.{agente.config.model}", 0.01)
+    principal.chamadas.clear()
+    agente.nova_execucao().categorizar_textos(["PADARIA Y"])
+    assert len(principal.chamadas) == 2
+
+
+def test_prazo_estourado_usa_local_e_nao_conta_como_resposta(agente_falso, metricas):
+    lento = CadeiaFalsa(lambda e: "Mercado", atraso=0.5)
+    agente = _com_politica(agente_falso, lento, CadeiaFalsa(lambda e: "Mercado", atraso=0.5), prazo_requisicao_s=0.1)
+
+    assert agente.mapear_categorias(["DROGARIA X"]) == {"DROGARIA X": "Saúde"}  # regra local
+    assert agente.origens == {"DROGARIA X": "local"}
+    contadores = metricas.contadores()
+    assert contadores.get(f"llm.{agente.config.model}.respostas", 0) == 0
+    assert contadores["llm.fallback_local"] == 1
+
+
+class ErroChave(Exception):
+    status_code = 401
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+def test_metricas_ficam_no_modelo_que_respondeu(agente_falso, metricas):
+    def responder(entrada):
+        raise APITimeoutError("timeout")
+
+    fallback = CadeiaFalsa(lambda e: "Pets" if e["text"] == "PETZ" else "não sei")
+    agente = _com_politica(agente_falso, CadeiaFalsa(responder), fallback)
+
+    agente.categorizar_textos(["PETZ", "LOJA X"])
+
+    contadores = metricas.contadores()
+    assert contadores.get(f"llm.{agente.config.model}.respostas", 0) == 0
+    assert contadores[f"llm.{FALLBACK}.respostas"] == 2
+    assert contadores[f"llm.{FALLBACK}.invalidas"] == 1
+
+
+@pytest.mark.parametrize("erro", [ErroChave("invalid api key"), ValueError("400 bad request")])
+def test_erro_que_nao_e_timeout_derruba_a_execucao(agente_falso, metricas, erro):
+    def responder(entrada):
+        raise erro
+
+    fallback = CadeiaFalsa(lambda e: "Pets")
+    agente = _com_politica(agente_falso, CadeiaFalsa(responder), fallback)
+
+    with pytest.raises(type(erro)):
+        agente.categorizar_textos(["PADARIA X"])
+    assert fallback.chamadas == []
+    assert agente.categorizadas_local == set()
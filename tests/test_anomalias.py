@@ -0,0 +1,32 @@
+import pandas as pd
+
+from anomalias import detectar_anomalias, detectar_anomalias_com_historico
+
+
+def _mes(mes_ref, valor, loja="STREAMING PLUS"):
+    return {"Data": f"{mes_ref}-10", "Lançamento": loja, "Lancamento_Limpo": loja, "Valor": valor,
+            "MesRef": mes_ref, "Parcela": "", "ParcelaAtual": None, "ParcelaTotal": None}
+
+
+def test_aumento_so_aparece_comparando_com_o_historico():
+    historico = pd.DataFrame([_mes("2025-01", 39.9), _mes("2025-02", 39.9), _mes("2025-03", 39.9)])
+    job = pd.DataFrame([_mes("2025-04", 55.9)])
+
+    # sozinho, o mês do job não tem com o que comparar
+    assert detectar_anomalias(job)["Alerta"].tolist() == [""]
+
+    res = detectar_anomalias_com_historico(job, historico)
+    assert res["Alerta"].tolist() == ["Aumento de preço em recorrente"]
+    assert len(res) == 1 and list(res.columns) == list(job.columns) + ["Alerta"]
+
+
+def test_mes_do_job_substitui_o_mesmo_mes_do_backup():
+    historico = pd.DataFrame([_mes("2025-01", 39.9), _mes("2025-02", 39.9), _mes("2025-03", 39.9)])
+    # reprocessar março: a linha antiga do backup não conta como duplicada
+    job = pd.DataFrame([_mes("2025-03", 39.9)])
+    assert detectar_anomalias_com_historico(job, historico)["Alerta"].tolist() == [""]
+
+
+def test_cobranca_duplicada_no_dia():
+    df = pd.DataFrame([_mes("2025-01", 20.0, "LOJA X"), _mes("2025-01", 20.0, "LOJA X")])
+    assert detectar_anomalias(df)["Alerta"].tolist() == ["Cobrança duplicada no dia"] * 2
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from arquivos import bloqueio, escrever_atomico
+from cache_categorias import atualizar_cache, carregar_cache
+
+
+def _gravar_texto(texto: str):
+    def escrever(tmp):
+        with open(tmp, "w") as f:
+            f.write(texto)
+    return escrever
+
+
+def _incrementar(path: str, vezes: int):
+    for _ in range(vezes):
+        with bloqueio(path):
+            with open(path) as f:
+                n = int(f.read() or 0)
+            time.sleep(0.001)  # sem o lock, outra thread/processo leria o mesmo n
+            escrever_atomico(path, _gravar_texto(str(n + 1)))
+
+
+def test_bloqueio_serializa_threads(tmp_path):
+    path = str(tmp_path / "contador.txt")
+    open(path, "w").close()
+
+    threads = [threading.Thread(target=_incrementar, args=(path, 20)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with open(path) as f:
+        assert f.read() == "80"
+
+
+def test_bloqueio_serializa_processos(tmp_path):
+    path = str(tmp_path / "contador.txt")
+    open(path, "w").close()
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_incrementar, args=(path, 10)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+
+    with open(path) as f:
+        assert f.read() == "30"
+
+
+def test_escrita_que_falha_nao_estraga_o_arquivo(tmp_path):
+    path = tmp_path / "dados.csv"
+    path.write_text("original")
+
+    def escrever(tmp):
+        with open(tmp, "w") as f:
+            f.write("pela met")
+        raise OSError("disco cheio")
+
+    with pytest.raises(OSError):
+        escrever_atomico(str(path), escrever)
+    assert path.read_text() == "original"
+    assert os.listdir(tmp_path) == ["dados.csv"]
+
+
+def test_cache_compartilhado_nao_perde_entradas_concorrentes(tmp_path):
+    path = str(tmp_path / "categorias.csv")
+    threads = [
+        threading.Thread(target=atualizar_cache, args=({f"LOJA {i}": "Mercado", "COMUM": cat}, path))
+        for i, cat in enumerate(["Pets", "Saúde", "Lazer", "Beleza"] * 2)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    cache = carregar_cache(path)
+    assert {f"LOJA {i}" for i in range(8)} <= set(cache)
+    assert cache["COMUM"] in {"Pets", "Saúde", "Lazer", "Beleza"}  # quem gravou primeiro vence
@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+import banco
+
+
+def _csv_antigo(pasta, linhas=3):
+    # formato antigo: sem ID e com Status no lugar de Recebido
+    pd.DataFrame({
+        "Tipo": ["Reembolso"] * linhas,
+        "Pessoa": [f"P{i}" for i in range(linhas)],
+        "Valor": [10.0 * (i + 1) for i in range(linhas)],
+        "Vezes": [1] * linhas,
+        "Data": ["2025-01-10"] * linhas,
+        "Status": ["RECEBIDO"] + ["PENDENTE"] * (linhas - 1),
+    }).to_csv(pasta / "receitas.csv", index=False)
+
+
+def test_migracao_dos_csvs_roda_uma_vez(tmp_path):
+    _csv_antigo(tmp_path)
+    db = str(tmp_path / "financas.db")
+
+    df = banco.carregar_receitas(db)
+    assert len(df) == 3
+    assert list(df["Recebido"]) == [True, False, False]
+    assert set(df["MesRef"]) == {"2025-01"}
+    with sqlite3.connect(db) as con:
+        assert con.execute("PRAGMA user_version").fetchone()[0] == 1
+
+    # o CSV continua lá, mas o banco já foi migrado: nada é importado de novo
+    _csv_antigo(tmp_path, linhas=5)
+    assert len(banco.carregar_receitas(db)) == 3
+
+
+def test_processos_abrindo_o_banco_novo_juntos_migram_uma_vez(tmp_path):
+    # CSV sem ID: migrar duas vezes duplicaria as linhas (cada vez gera IDs novos)
+    _csv_antigo(tmp_path, linhas=50)
+    db = str(tmp_path / "financas.db")
+    largada = threading.Barrier(4)
+    erros = []
+
+    def abrir():
+        largada.wait()
+        try:
+            with banco.conectar(db):
+                pass
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=abrir) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert erros == []
+    assert len(banco.carregar_receitas(db)) == 50
+
+
+def test_atualizar_receitas_mexe_so_nos_ids_informados(tmp_path):
+    db = str(tmp_path / "financas.db")
+    banco.inserir_receitas(
+        [{"ID": i, "Tipo": "Reembolso", "Pessoa": "Ana", "Valor": 5, "Vezes": 1, "Data": "2025-02-01"} for i in "abc"],
+        db,
+    )
+
+    alteradas = pd.DataFrame({"ID": ["a", "c"], "Recebido": [True, False], "Observacao": ["pago", None]})
+    banco.atualizar_receitas(alteradas, db)
+
+    df = banco.carregar_receitas(db).set_index("ID")
+    assert df.loc[["a", "b", "c"], "Recebido"].tolist() == [True, False, False]
+    assert df.loc[["a", "b", "c"], "Observacao"].tolist() == ["pago", "", ""]
+
+    banco.atualizar_receitas(pd.DataFrame({"ID": ["c"], "Recebido": [True]}), db)
+    assert banco.carregar_receitas(db).set_index("ID").loc["c", "Recebido"]
+
+
+def test_exportar_e_importar_csv_ida_e_volta(tmp_path):
+    origem = str(tmp_path / "origem.db")
+    banco.inserir_receitas(
+        [
+            {"ID": "r1", "Tipo": "Salário", "Pessoa": "Ana", "Valor": 3500.5, "Vezes": 1, "Data": "2025-03-05", "Recebido": True},
+            {"ID": "r2", "Tipo": "Reembolso", "Pessoa": "Bia", "Valor": 120, "Vezes": 3, "Data": "2025-04-10",
+             "Observacao": "1/3", "ParcelaAtual": 1, "ParcelaTotal": 3},
+        ],
+        origem,
+    )
+    banco.inserir_despesas_fixas([{"ID": "d1", "Tipo": "Aluguel", "Valor": 1800}], origem)
+
+    destino = str(tmp_path / "destino" / "financas.db")
+    for tabela in ("receitas", "despesas_fixas"):
+        csv = banco.exportar_csv(tabela, str(tmp_path / f"{tabela}.csv"), origem)
+        banco.importar_csv(tabela, csv, destino)
+
+    pd.testing.assert_frame_equal(
+        banco.carregar_receitas(destino).sort_values("ID").reset_index(drop=True),
+        banco.carregar_receitas(origem).sort_values("ID").reset_index(drop=True),
+    )
+    pd.testing.assert_frame_equal(banco.carregar_despesas_fixas(destino), banco.carregar_despesas_fixas(origem))
+
+    # importar de novo é upsert por ID: não duplica
+    banco.importar_csv("receitas", str(tmp_path / "receitas.csv"), destino)
+    assert len(banco.carregar_receitas(destino)) == 2
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from cache_categorias import atualizar_cache, carregar_cache
+from categorias import CATEGORIAS, categoria_por_regras, validar_categoria
+
+
+def test_validar_categoria():
+    assert validar_categoria("Mercado") == ("Mercado", False)
+    assert validar_categoria("Categoria: saude.") == ("Saúde", True)
+    assert validar_categoria("A categoria é Pets") == ("Pets", True)
+    assert validar_categoria("Mercdo") == ("Mercado", True)
+    assert validar_categoria("Viagens") == (None, False)
+    assert validar_categoria("") == (None, False)
+
+
+def test_regras_locais():
+    assert categoria_por_regras("DROGARIA SAO PAULO") == "Saúde"
+    assert categoria_por_regras("UBERLANDIA SHOPPING") is None
+
+
+def test_prompt_lista_exatamente_as_categorias(agente_falso):
+    template = agente_falso().template
+    listadas = [l[2:] for l in template.splitlines() if l.startswith("- ")]
+    assert listadas == CATEGORIAS
+    assert "{exemplos}" in template and "{text}" in template
+
+
+def test_cache_descarta_ou_corrige_categoria_fora_da_lista(tmp_path):
+    path = tmp_path / "categorias.csv"
+    pd.DataFrame({
+        "Lancamento_Limpo": ["PADARIA", "FARMACIA", "HOTEL"],
+        "Categoria": ["Mercado", "saude", "Viagens"],
+    }).to_csv(path, index=False)
+
+    assert carregar_cache(str(path)) == {"PADARIA": "Mercado", "FARMACIA": "Saúde"}
+
+    # ao regravar, a entrada inválida sai do arquivo
+    assert atualizar_cache({"PETZ": "Pets"}, str(path)) == 1
+    assert set(pd.read_csv(path)["Categoria"]) == {"Mercado", "Saúde", "Pets"}
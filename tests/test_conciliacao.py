@@ -0,0 +1,90 @@
+import pandas as pd
+
+import banco
+import conciliacao
+
+
+def _receitas(*linhas):
+    """(ID, Data, Valor[, Observacao, Recebido]) -> frame de receitas normalizado."""
+    rows = [
+        {"ID": l[0], "Tipo": "Reembolso", "Pessoa": "Ana", "Vezes": 1, "Data": l[1], "Valor": l[2],
+         "Observacao": l[3] if len(l) > 3 else "", "Recebido": l[4] if len(l) > 4 else False}
+        for l in linhas
+    ]
+    return banco.normalizar_receitas(pd.DataFrame(rows))
+
+
+def _creditos(*linhas):
+    return pd.DataFrame([{"Data": d, "Lançamento": l, "Valor": v, "MesRef": d[:7]} for d, l, v in linhas])
+
+
+def _aplicar_em_memoria(receitas, propostas):
+    """O que aplicar_conciliacao gravaria, sem banco."""
+    propostas = propostas.copy()
+    datas = pd.to_datetime(propostas["DataCredito"]).dt.strftime("%d/%m/%Y")
+    notas = [
+        conciliacao.NOTA.format(lanc=l, data=d, valor=abs(v))
+        for l, d, v in zip(propostas["Lançamento"], datas, propostas["ValorCredito"])
+    ]
+    receitas = receitas.set_index("ID")
+    receitas.loc[propostas["ID"], "Observacao"] = notas
+    receitas.loc[propostas["ID"], "Recebido"] = True
+    return receitas.reset_index()
+
+
+def test_creditos_identicos_no_mesmo_dia_sao_usados_um_de_cada_vez():
+    creditos = _creditos(("2025-03-10", "PIX ANA", -20.0), ("2025-03-10", "PIX ANA", -20.0))
+    receitas = _receitas(("r1", "2025-03-09", 20.0))
+
+    p1 = conciliacao.propor_conciliacao(receitas, creditos)
+    assert p1["ID"].tolist() == ["r1"]
+
+    # num segundo momento aparece outro reembolso igual: o outro crédito idêntico ainda está livre
+    receitas = pd.concat([_aplicar_em_memoria(receitas, p1), _receitas(("r2", "2025-03-11", 20.0))], ignore_index=True)
+    p2 = conciliacao.propor_conciliacao(receitas, creditos)
+    assert p2["ID"].tolist() == ["r2"]
+
+    # e agora os dois créditos estão usados
+    receitas = pd.concat([_aplicar_em_memoria(receitas, p2), _receitas(("r3", "2025-03-10", 20.0))], ignore_index=True)
+    assert conciliacao.propor_conciliacao(receitas, creditos).empty
+
+
+def test_nota_antiga_sem_valor_usa_o_valor_do_reembolso():
+    creditos = _creditos(("2025-03-10", "PIX ANA", -20.0), ("2025-03-10", "PIX ANA", -35.0))
+    receitas = _receitas(
+        ("r1", "2025-03-09", 20.0, "Conciliado: PIX ANA em 10/03/2025", True),
+        ("r2", "2025-03-09", 35.0),
+        ("r3", "2025-03-09", 20.0),
+    )
+    assert conciliacao.propor_conciliacao(receitas, creditos)["ID"].tolist() == ["r2"]
+
+
+def test_disputa_continua_ate_nao_sobrar_credito():
+    # 5 reembolsos iguais em dias seguidos e 5 créditos: o mais próximo de cada
+    # crédito ganha a rodada e quem perdeu tenta de novo, quantas vezes precisar
+    dias = [f"2025-03-{d:02d}" for d in range(10, 15)]
+    receitas = _receitas(*[(f"r{i}", d, 50.0) for i, d in enumerate(dias)])
+    creditos = _creditos(*[("2025-03-20", "PIX", -50.0)] * 5)
+
+    p = conciliacao.propor_conciliacao(receitas, creditos)
+    assert sorted(p["ID"]) == [f"r{i}" for i in range(5)]
+
+
+def test_conciliar_grava_e_nao_repete(tmp_path):
+    db = str(tmp_path / "financas.db")
+    backup = str(tmp_path / "cartao.csv")
+    _creditos(("2025-03-10", "PIX ANA", -20.0), ("2025-03-10", "PIX ANA", -20.0)).to_csv(backup, index=False)
+    banco.inserir_receitas(
+        [{"ID": "r1", "Tipo": "Reembolso", "Pessoa": "Ana", "Vezes": 1, "Data": "2025-03-09", "Valor": 20.0}], db
+    )
+
+    assert conciliacao.conciliar(db, backup, aplicar=True)["ID"].tolist() == ["r1"]
+    rec = banco.carregar_receitas(db).set_index("ID")
+    assert bool(rec.loc["r1", "Recebido"])
+    assert rec.loc["r1", "Observacao"] == "Conciliado: PIX ANA em 10/03/2025 (20.00)"
+
+    banco.inserir_receitas(
+        [{"ID": "r2", "Tipo": "Reembolso", "Pessoa": "Ana", "Vezes": 1, "Data": "2025-03-10", "Valor": 20.0}], db
+    )
+    assert conciliacao.conciliar(db, backup, aplicar=True)["ID"].tolist() == ["r2"]
+    assert conciliacao.conciliar(db, backup).empty
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+import banco
+import consulta_sql
+from consulta_sql import MotorSQL, validar_sql
+
+
+@pytest.fixture
+def motor(tmp_path):
+    backup = tmp_path / "cartao.csv"
+    pd.DataFrame({
+        "Data": ["2025-01-05", "2025-01-20"],
+        "Lançamento": ["PADARIA", "PETZ"],
+        "Valor": [10.5, 30.0],
+        "MesRef": ["2025-01", "2025-01"],
+        "ParcelaAtual": [None, None],
+        "Categoria": ["Mercado", "Pets"],
+    }).to_csv(backup, index=False)
+    db = str(tmp_path / "financas.db")
+    banco.inserir_receitas([{"ID": "r1", "Tipo": "Reembolso", "Pessoa": "Ana", "Vezes": 1, "Data": "2025-01-10", "Valor": 7.0}], db)
+    return MotorSQL(str(backup), db)
+
+
+def test_consulta_de_leitura(motor):
+    res = motor.consultar("SELECT Categoria, SUM(Valor) AS total FROM cartao GROUP BY ALL ORDER BY total DESC")
+    assert res.to_dict("records") == [{"Categoria": "Pets", "total": 30.0}, {"Categoria": "Mercado", "total": 10.5}]
+
+    tipos = dict(motor._con.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'cartao'").fetchall())
+    assert tipos["Data"] == "DATE" and tipos["ParcelaAtual"] == "BIGINT"
+    assert motor.consultar("SELECT SUM(Valor) AS v FROM receitas")["v"].tolist() == [7.0]
+
+
+def test_tabela_acompanha_o_arquivo(motor):
+    assert len(motor.consultar("SELECT * FROM cartao")) == 2
+    df = pd.read_csv(motor.backup_path)
+    pd.concat([df, df]).to_csv(motor.backup_path, index=False)
+    assert len(motor.consultar("SELECT * FROM cartao")) == 4
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM read_csv('/etc/passwd')",
+    "SELECT * FROM read_text('/etc/hostname')",
+    "SELECT * FROM glob('/etc/*')",
+    "SELECT * FROM '/etc/passwd'",
+    "FROM read_csv('.env')",
+    "SELECT * FROM read_parquet('https://example.com/x.parquet')",
+])
+def test_nao_le_arquivos_nem_urls(motor, sql):
+    with pytest.raises(Exception, match="(?i)permission|disabled|does not exist"):
+        motor.consultar(sql)
+
+
+def test_configuracao_travada(motor):
+    # uma consulta que passe pela validação não consegue religar o acesso externo
+    with pytest.raises(Exception):
+        motor._con.execute("SET enable_external_access = true")
+    with pytest.raises(Exception):
+        motor.consultar("SELECT * FROM read_csv('/etc/passwd')")
+
+
+@pytest.mark.parametrize("sql", [
+    "DROP TABLE cartao",
+    "SELECT 1; DROP TABLE cartao",
+    "COPY cartao TO '/tmp/x.csv'",
+    "ATTACH '/tmp/x.db'",
+    "SET enable_external_access = true",
+    "  ",
+])
+def test_validar_sql_recusa(sql):
+    with pytest.raises(ValueError):
+        validar_sql(sql)
+
+
+def test_validar_sql_aceita():
+    assert validar_sql("-- total\nSELECT 'a;b' AS x;") == "-- total\nSELECT 'a;b' AS x"
+    assert validar_sql("with t as (select 1) select * from t").startswith("with")
+
+
+def test_motor_por_workspace(tmp_path):
+    a = consulta_sql.motor(str(tmp_path / "a.csv"), str(tmp_path / "a.db"))
+    assert consulta_sql.motor(str(tmp_path / "a.csv"), str(tmp_path / "a.db")) is a
+    assert consulta_sql.motor(str(tmp_path / "b.csv"), str(tmp_path / "b.db")) is not a
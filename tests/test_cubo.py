@@ -0,0 +1,95 @@
+import os
+
+import pandas as pd
+
+import banco
+import cubo
+import repositorio
+from consulta_sql import MotorSQL
+
+
+def _backup(path, linhas):
+    pd.DataFrame(linhas, columns=["Data", "Lançamento", "Valor", "MesRef", "Categoria"]).to_csv(path, index=False)
+
+
+def _celulas(path):
+    df = cubo.carregar_cubo(path)
+    return {(r.MesRef, r.Origem, r.Categoria): (round(r.Valor, 2), r.Qtde) for r in df.itertuples()}
+
+
+def _arquivos(tmp_path):
+    backup, db, path = str(tmp_path / "cartao.csv"), str(tmp_path / "financas.db"), str(tmp_path / cubo.ARQ_CUBO)
+    _backup(backup, [
+        ("2025-01-05", "PADARIA", 10.0, "2025-01", "Mercado"),
+        ("2025-01-07", "MERCADO", 5.5, "2025-01", "Mercado"),
+        ("2025-02-03", "PETZ", 30.0, "2025-02", "Pets"),
+    ])
+    banco.inserir_receitas([{"ID": "r1", "Tipo": "Salário", "Pessoa": "", "Vezes": 1, "Data": "2025-01-10", "Valor": 1000}], db)
+    return backup, db, path
+
+
+def test_reconstruir_usa_backup_e_banco(tmp_path):
+    backup, db, path = _arquivos(tmp_path)
+
+    repositorio.carregar_cubo(path, backup, db)
+
+    assert _celulas(path) == {
+        ("2025-01", "Cartão", "Mercado"): (15.5, 2),
+        ("2025-02", "Cartão", "Pets"): (30.0, 1),
+        ("2025-01", "Receita", "Salário"): (1000.0, 1),
+    }
+
+
+def test_atualizar_cartao_troca_so_os_meses_do_lote(tmp_path):
+    backup, db, path = _arquivos(tmp_path)
+    repositorio.carregar_cubo(path, backup, db)
+
+    lote = pd.DataFrame({"MesRef": ["2025-02", "2025-03"], "Categoria": ["Saúde", None], "Valor": [20.0, 4.0]})
+    cubo.atualizar_cartao(path, lote)
+
+    assert _celulas(path) == {
+        ("2025-01", "Cartão", "Mercado"): (15.5, 2),
+        ("2025-02", "Cartão", "Saúde"): (20.0, 1),  # Pets de fevereiro saiu
+        ("2025-03", "Cartão", "Sem categoria"): (4.0, 1),
+        ("2025-01", "Receita", "Salário"): (1000.0, 1),
+    }
+
+
+def test_atualizar_receitas_recalcula_do_banco(tmp_path):
+    backup, db, path = _arquivos(tmp_path)
+    repositorio.carregar_cubo(path, backup, db)
+
+    banco.inserir_receitas([
+        {"ID": "r2", "Tipo": "Reembolso", "Pessoa": "Ana", "Vezes": 1, "Data": "2025-01-20", "Valor": 50},
+        {"ID": "r3", "Tipo": "Reembolso", "Pessoa": "Ana", "Vezes": 1, "Data": "2025-02-20", "Valor": 70},
+    ], db)
+    repositorio.atualizar_cubo_receitas(path, ["2025-01"], db)
+
+    celulas = _celulas(path)
+    assert celulas[("2025-01", "Receita", "Reembolso")] == (50.0, 1)
+    assert celulas[("2025-01", "Receita", "Salário")] == (1000.0, 1)
+    # fevereiro não foi pedido: fica como estava
+    assert ("2025-02", "Receita", "Reembolso") not in celulas
+    assert celulas[("2025-02", "Cartão", "Pets")] == (30.0, 1)
+    # quem lê pelo repositório vê a atualização
+    assert len(repositorio.carregar_cubo(path, backup, db)) == len(celulas)
+
+
+def test_sem_cubo_atualizar_nao_cria_e_a_leitura_monta_inteiro(tmp_path):
+    backup, db, path = _arquivos(tmp_path)
+
+    cubo.atualizar_cartao(path, pd.DataFrame({"MesRef": ["2025-02"], "Categoria": ["Pets"], "Valor": [1.0]}))
+    cubo.atualizar_receitas(path, ["2025-01"], db)
+    assert not os.path.exists(path)
+
+    assert len(repositorio.carregar_cubo(path, backup, db)) == 3
+
+
+def test_consulta_sql_monta_o_cubo_que_ainda_nao_existe(tmp_path):
+    backup, db, path = _arquivos(tmp_path)
+    motor = MotorSQL(backup, db, path)
+
+    res = motor.consultar("SELECT Origem, SUM(Valor) AS total FROM cubo GROUP BY ALL ORDER BY Origem")
+
+    assert res.to_dict("records") == [{"Origem": "Cartão", "total": 45.5}, {"Origem": "Receita", "total": 1000.0}]
+    assert os.path.exists(path)
@@ -0,0 +1,83 @@
+import gzip
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import exportacao
+
+
+@pytest.fixture(autouse=True)
+def cache_vazio(monkeypatch):
+    monkeypatch.setattr(exportacao, "_cache", type(exportacao._cache)())
+    yield
+    exportacao._limpar_cache()
+
+
+def _df(linhas=5):
+    return pd.DataFrame({
+        "Data": pd.date_range("2025-01-01", periods=linhas).date,
+        "Lançamento": [f"LOJA {i}, CENTRO" for i in range(linhas)],
+        "Valor": [10.5 * i for i in range(linhas)],
+        "Categoria": ["Mercado", None] * (linhas // 2) + ["Outros"] * (linhas % 2),
+    })
+
+
+@pytest.mark.parametrize("chunk", [2, exportacao.CHUNK_LINHAS])
+def test_csv_gzip_e_parquet_tem_o_mesmo_conteudo(tmp_path, chunk):
+    df = _df()
+    for formato in exportacao.FORMATOS:
+        exportacao.gerar_export(df, formato, str(tmp_path / formato), chunk=chunk)
+
+    csv = (tmp_path / "CSV").read_bytes()
+    assert csv == df.to_csv(index=False).encode("utf-8")
+    assert gzip.decompress((tmp_path / "CSV (gzip)").read_bytes()) == csv
+
+    parquet = pd.read_parquet(tmp_path / "Parquet")
+    esperado = pd.read_csv(io.BytesIO(csv))
+    assert list(parquet.columns) == list(df.columns)
+    assert parquet["Valor"].tolist() == esperado["Valor"].tolist()
+    assert parquet["Lançamento"].tolist() == esperado["Lançamento"].tolist()
+    assert parquet["Categoria"].fillna("").tolist() == esperado["Categoria"].fillna("").tolist()
+
+
+def test_formato_desconhecido(tmp_path):
+    with pytest.raises(ValueError):
+        exportacao.gerar_export(_df(), "XLSX", str(tmp_path / "x"))
+    with pytest.raises(ValueError):
+        exportacao.export_cacheado(_df(), "XLSX", versao="v")
+
+
+def test_cache_reaproveita_e_descarta_o_mais_antigo(monkeypatch):
+    monkeypatch.setattr(exportacao, "MAX_CACHE", 2)
+    chamadas = []
+    gerar = exportacao.gerar_export
+    monkeypatch.setattr(exportacao, "gerar_export", lambda *a, **k: chamadas.append(a[1:3]) or gerar(*a, **k))
+
+    df = _df()
+    v1 = exportacao.export_cacheado(df, "CSV", versao="v1")
+    assert exportacao.export_cacheado(df, "CSV", versao="v1") == v1
+    assert len(chamadas) == 1
+
+    exportacao.export_cacheado(df, "CSV (gzip)", versao="v1")
+    exportacao.export_cacheado(df, "CSV", versao="v1")  # v1/CSV volta a ser o mais recente
+    arquivos = dict(exportacao._cache)
+    exportacao.export_cacheado(df, "Parquet", versao="v2")
+
+    assert list(exportacao._cache) == [("v1", "CSV"), ("v2", "Parquet")]
+    # o descartado sai do disco junto
+    assert not os.path.exists(arquivos[("v1", "CSV (gzip)")])
+    assert os.path.exists(arquivos[("v1", "CSV")])
+    assert len(chamadas) == 3
+
+
+def test_sem_versao_usa_o_hash_do_conteudo():
+    df = _df()
+    exportacao.export_cacheado(df, "CSV")
+    exportacao.export_cacheado(df.copy(), "CSV")
+    assert len(exportacao._cache) == 1
+
+    outro = df.assign(Valor=df["Valor"] + 1)
+    assert exportacao.export_cacheado(outro, "CSV") == outro.to_csv(index=False).encode("utf-8")
+    assert len(exportacao._cache) == 2
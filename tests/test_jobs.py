@@ -0,0 +1,156 @@
+import io
+import json
+import os
+import threading
+import time
+
+import jobs
+from conftest import CadeiaFalsa
+
+
+def _job(ws_dir, job_id, status, criado_em, **extra):
+    job = {"id": job_id, "status": status, "arquivo": "f.csv", "acao": "Só ler CSV", "salvar_csv": False,
+           "mes_ref": "2025-01", "pct": 0, "etapa": "", "criado_em": criado_em, **extra}
+    jobs._gravar(ws_dir, job)
+    with open(jobs._path_resultado(ws_dir, job_id), "w") as f:
+        f.write("a\n1\n")
+    return job
+
+
+def test_job_recem_submetido_nao_aparece_como_interrompido(monkeypatch, tmp_path):
+    liberar = threading.Event()
+    vistos = []
+
+    def rodar(job, conteudo, ws_dir, backup_path):
+        liberar.wait(5)
+        with jobs._lock:
+            jobs._liberar(job["id"])
+
+    gravar = jobs._gravar
+
+    def gravar_e_consultar(ws_dir, job):
+        gravar(ws_dir, job)
+        # o status já está visível: quem consultar agora tem que ver o job ativo
+        vistos.append(jobs.status(job["id"], ws_dir)["status"])
+
+    monkeypatch.setattr(jobs, "_rodar", rodar)
+    monkeypatch.setattr(jobs, "_gravar", gravar_e_consultar)
+
+    job_id = jobs.submeter(b"x", "f.csv", "Só ler CSV", False, "2025-01", str(tmp_path), "bkp.csv")
+    try:
+        assert vistos == [jobs.NA_FILA]
+        assert jobs.status(job_id, str(tmp_path))["status"] == jobs.NA_FILA
+    finally:
+        liberar.set()
+
+
+def test_limpar_apaga_so_finalizados_antigos(tmp_path):
+    ws = str(tmp_path)
+    velho = time.time() - (jobs.RETENCAO_DIAS + 1) * 24 * 3600
+    _job(ws, "antigo", jobs.CONCLUIDO, velho, finalizado_em=velho)
+    _job(ws, "interrompido", jobs.RODANDO, velho)  # ninguém tocando: conta como interrompido
+    _job(ws, "recente", jobs.CONCLUIDO, time.time(), finalizado_em=time.time())
+    _job(ws, "ativo", jobs.RODANDO, velho)
+    with jobs._lock:
+        jobs._futuros["ativo"] = jobs.Future()
+
+    try:
+        assert jobs.limpar(ws) == 2
+    finally:
+        with jobs._lock:
+            jobs._futuros.pop("ativo", None)
+
+    restantes = sorted(a for a in os.listdir(jobs._pasta(ws)))
+    assert restantes == ["ativo.csv", "ativo.json", "recente.csv", "recente.json"]
+    with open(jobs._path_status(ws, "recente")) as f:
+        assert json.load(f)["status"] == jobs.CONCLUIDO
+
+
+def test_resumo_em_blocos_igual_ao_do_arquivo_inteiro(tmp_path):
+    import pandas as pd
+
+    path = tmp_path / "res.csv"
+    df = pd.DataFrame({
+        "Valor": [10.0, 5.5, -3.0, 7.25, 1.0, 2.0, 4.0],
+        "Categoria": ["Mercado", "Pets", "Reembolsos & Créditos", "Mercado", None, "Pets", "Mercado"],
+    })
+    df.to_csv(path, index=False)
+
+    resumo = jobs.resumir_resultado(str(path), linhas=2)
+
+    esperado = df.fillna({"Categoria": "Sem categoria"}).groupby("Categoria")["Valor"].agg(["sum", "size"])
+    assert {r["Categoria"]: (r["Valor"], r["Qtde"]) for r in resumo} == {
+        c: (v["sum"], v["size"]) for c, v in esperado.iterrows()
+    }
+    assert resumo[0]["Categoria"] == "Mercado"  # maior valor primeiro
+
+
+def test_resultado_le_so_a_previa(tmp_path):
+    ws = str(tmp_path)
+    with open(jobs._path_resultado(ws, "j"), "w") as f:
+        f.write("Valor\n" + "\n".join(str(i) for i in range(50)) + "\n")
+    assert len(jobs.resultado("j", ws, max_linhas=10)) == 10
+    assert len(jobs.resultado("j", ws)) == 50
+
+
+ACAO_LLM = "Ler CSV + parcelas + categorizar (LLM)"
+FATURA = "data,lançamento,valor\n2025-02-03,PADARIA X,12.50\n2025-02-04,LOJA Y,99.90\n".encode("utf-8")
+
+
+def _esperar(job_id, ws):
+    with jobs._lock:
+        fut = jobs._futuros.get(job_id)
+    if fut is not None:
+        fut.result(timeout=10)
+    return jobs.status(job_id, ws)
+
+
+def test_mesmo_upload_enviado_duas_vezes_compartilha_as_chamadas(agente_falso, monkeypatch, tmp_path):
+    liberar = threading.Event()
+    cadeia = CadeiaFalsa(lambda e: liberar.wait(5) and "Mercado")
+    monkeypatch.setattr(jobs, "_agente", agente_falso(cadeia))
+    ws, backup = str(tmp_path / "ws"), str(tmp_path / "ws" / "cartao.csv")
+
+    try:
+        primeiro = jobs.submeter(FATURA, "fatura.csv", ACAO_LLM, False, "2025-02", ws, backup)
+        # outra aba/sessão manda o mesmo arquivo enquanto o primeiro ainda está no LLM
+        segundo = jobs.submeter(FATURA, "fatura (1).csv", ACAO_LLM, False, "2025-02", ws, backup)
+        # opções diferentes não são o mesmo job
+        outro = jobs.submeter(FATURA, "fatura.csv", "Ler CSV + parcelas", False, "2025-02", ws, backup)
+    finally:
+        liberar.set()
+
+    assert segundo == primeiro and outro != primeiro
+    assert _esperar(primeiro, ws)["status"] == jobs.CONCLUIDO
+    assert _esperar(outro, ws)["status"] == jobs.CONCLUIDO
+    assert sorted(c["text"] for c in cadeia.chamadas) == ["LOJA Y", "PADARIA X"]
+    assert set(jobs.resultado(primeiro, ws)["Categoria"]) == {"Mercado"}
+    # a cópia do upload em disco some quando o job termina
+    assert not [a for a in os.listdir(jobs._pasta(ws)) if ".entrada" in a]
+
+    # terminado, o mesmo upload vira um job novo
+    terceiro = jobs.submeter(FATURA, "fatura.csv", ACAO_LLM, False, "2025-02", ws, backup)
+    assert terceiro != primeiro
+    _esperar(terceiro, ws)
+
+
+def test_upload_grande_vai_do_disco_para_o_modo_em_blocos(monkeypatch, tmp_path):
+    import pipeline
+
+    chamadas = []
+    em_blocos = pipeline.executar_pipeline_chunks
+
+    def espiar(agente, arquivo, *args, **kwargs):
+        chamadas.append(arquivo)
+        return em_blocos(agente, arquivo, *args, **kwargs)
+
+    monkeypatch.setattr(jobs, "LIMIAR_CHUNKS_BYTES", 1)
+    monkeypatch.setattr(jobs, "executar_pipeline_chunks", espiar)
+    ws = str(tmp_path / "ws")
+
+    job_id = jobs.submeter(io.BytesIO(FATURA), "fatura.csv", "Ler CSV + parcelas", False, "2025-02", ws, "bkp.csv")
+    job = _esperar(job_id, ws)
+
+    assert job["status"] == jobs.CONCLUIDO and job["linhas"] == 2
+    # o worker recebeu o caminho da cópia em disco, não os bytes
+    assert isinstance(chamadas[0], str) and chamadas[0].endswith(".entrada.csv")
@@ -0,0 +1,80 @@
+import io
+
+import pandas as pd
+
+import agente as agente_mod
+from agente import eh_ofx
+
+# OFX 1.x: SGML, sem tags de fechamento nos campos
+SGML = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+CHARSET:1252
+
+<OFX>
+<CREDITCARDMSGSRSV1><CCSTMTTRNRS><CCSTMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250105120000[-3:BRT]
+<TRNAMT>-52,90
+<MEMO>PADARIA P&amp;G
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20250110
+<TRNAMT>100.00
+<NAME>ESTORNO LOJA
+</STMTTRN>
+</BANKTRANLIST></CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1>
+</OFX>
+"""
+
+# OFX 2.x: XML, com tags de fechamento
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<?OFX OFXHEADER="200" VERSION="211"?>
+<OFX><CREDITCARDMSGSRSV1><CCSTMTTRNRS><CCSTMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20250105</DTPOSTED><TRNAMT>-52.90</TRNAMT><MEMO>PADARIA P&amp;G</MEMO></STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20250110</DTPOSTED><TRNAMT>100.00</TRNAMT><NAME>ESTORNO &lt;LOJA&gt;</NAME></STMTTRN>
+</BANKTRANLIST></CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1></OFX>
+"""
+
+
+def _ler(agente_falso, texto, nome="fatura.ofx"):
+    arquivo = io.BytesIO(texto.encode("utf-8"))
+    arquivo.name = nome
+    return agente_falso().ler_arquivo_cartao(arquivo)
+
+
+def test_sgml_compra_positiva_credito_negativo_e_entidades(agente_falso):
+    df = _ler(agente_falso, SGML)
+    assert list(df.columns) == ["Data", "Lançamento", "Valor"]
+    assert list(df["Lançamento"]) == ["PADARIA P&G", "ESTORNO LOJA"]
+    assert list(df["Valor"]) == [52.90, -100.0]
+    assert list(df["Data"]) == [pd.Timestamp("2025-01-05"), pd.Timestamp("2025-01-10")]
+
+
+def test_xml_desescapa_o_texto_das_tags(agente_falso):
+    df = _ler(agente_falso, XML)
+    assert list(df["Lançamento"]) == ["PADARIA P&G", "ESTORNO <LOJA>"]
+    assert list(df["Valor"]) == [52.90, -100.0]
+
+
+def test_transacao_cortada_entre_blocos(agente_falso, monkeypatch):
+    esperado = _ler(agente_falso, SGML)
+    # blocos pequenos: tags, entidades e transações ficam divididas entre leituras
+    for tamanho in (7, 16, 61):
+        monkeypatch.setattr(agente_mod, "OFX_CHUNK", tamanho)
+        pd.testing.assert_frame_equal(_ler(agente_falso, SGML), esperado)
+        assert list(_ler(agente_falso, XML)["Lançamento"]) == ["PADARIA P&G", "ESTORNO <LOJA>"]
+
+
+def test_deteccao_pela_extensao_ou_pelo_cabecalho(tmp_path):
+    sem_extensao = tmp_path / "extrato"
+    sem_extensao.write_text(SGML, encoding="utf-8")
+    assert eh_ofx(str(sem_extensao))
+    assert eh_ofx(io.BytesIO(XML.encode("utf-8")))
+    assert eh_ofx("fatura.QFX")
+
+    csv = tmp_path / "fatura.csv"
+    csv.write_text("Data,Lançamento,Valor\n05/01/2025,PADARIA,52.90\n", encoding="utf-8")
+    assert not eh_ofx(str(csv))
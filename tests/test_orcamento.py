@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import orcamento
+from conftest import CadeiaFalsa
+from orcamento import OrcamentoLLM
+
+
+def test_limite_da_execucao_e_do_dia(tmp_path):
+    o = OrcamentoLLM(max_requisicoes_execucao=3, max_tokens_dia=100, path=str(tmp_path / "o.json"))
+    assert o.cabe(3, 100) and not o.cabe(4, 1)
+
+    o.registrar(2, 60)
+    assert o.disponivel() == {"requisicoes": 1, "tokens": 40}
+
+    # outra execução (ou processo) com a mesma chave vê o consumo do dia
+    outra = OrcamentoLLM(max_tokens_dia=100, path=o.path)
+    assert not outra.cabe(1, 41)
+
+
+def test_virada_do_dia_zera_o_consumo(tmp_path, monkeypatch):
+    path = str(tmp_path / "o.json")
+    with open(path, "w") as f:
+        json.dump({"dia": "2000-01-01", "requisicoes": 99, "tokens": 99}, f)
+
+    o = OrcamentoLLM(max_requisicoes_dia=10, path=path)
+    assert o.disponivel()["requisicoes"] == 10
+    o.registrar(1, 5)
+    with open(path) as f:
+        assert json.load(f) == {"dia": orcamento._hoje(), "requisicoes": 1, "tokens": 5}
+
+
+def test_sem_limite_diario_nao_grava_arquivo(tmp_path):
+    path = tmp_path / "o.json"
+    o = OrcamentoLLM(max_requisicoes_execucao=5, path=str(path))
+    o.registrar(1, 10)
+    assert (o.requisicoes, o.tokens) == (1, 10)
+    assert not path.exists()
+
+
+def test_planejar_e_enviar_buscam_exemplos_uma_vez_por_texto(agente_falso, monkeypatch):
+    cadeia = CadeiaFalsa(lambda e: "Mercado")
+    agente = agente_falso(cadeia, max_tokens_execucao=10_000)
+    agente.carregar_historico({"PADARIA DO ZE": "Mercado", "FARMACIA SAO JOAO": "Saúde"})
+
+    buscas = []
+    buscar = agente.indice.buscar
+    monkeypatch.setattr(agente.indice, "buscar", lambda t, **kw: buscas.append(t) or buscar(t, **kw))
+
+    agente.mapear_categorias(["PADARIA DO JOAO", "FARMACIA CENTRAL"])
+
+    assert sorted(buscas) == ["FARMACIA CENTRAL", "PADARIA DO JOAO"]
+    assert len(cadeia.chamadas) == 2
+
+
+def test_config_do_ambiente(monkeypatch):
+    from agente import AgenteCartaoConfig
+
+    monkeypatch.setenv("GROQ_MAX_REQUISICOES_DIA", "500")
+    monkeypatch.setenv("GROQ_MAX_TOKENS_EXECUCAO", "")
+    monkeypatch.delenv("GROQ_MAX_REQUISICOES_EXECUCAO", raising=False)
+    monkeypatch.delenv("GROQ_MAX_TOKENS_DIA", raising=False)
+
+    config = AgenteCartaoConfig.do_ambiente()
+    assert config.max_requisicoes_dia == 500
+    assert config.max_tokens_execucao is None and config.max_requisicoes_execucao is None
+
+    monkeypatch.setenv("GROQ_MAX_TOKENS_DIA", "muito")
+    with pytest.raises(ValueError, match="GROQ_MAX_TOKENS_DIA"):
+        AgenteCartaoConfig.do_ambiente()
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+
+from cache_categorias import carregar_cache
+from conftest import CadeiaFalsa
+from cubo import ARQ_CUBO, COLS_CUBO, carregar_cubo
+from pipeline import executar_pipeline
+
+ACAO = "Ler CSV + parcelas + categorizar (LLM)"
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_so_respostas_do_llm_entram_no_cache(agente_falso, tmp_path):
+    backup = tmp_path / "finances_cartao.csv"
+    pd.DataFrame({
+        "Data": ["2025-01-05"], "Lançamento": ["PADARIA DO ZE CENTRO"], "Valor": [10.0], "MesRef": ["2025-01"],
+        "Lancamento_Limpo": ["PADARIA DO ZE CENTRO"], "Categoria": ["Mercado"],
+    }).to_csv(backup, index=False)
+
+    fatura = tmp_path / "fatura.csv"
+    fatura.write_text(
+        "data,lançamento,valor\n"
+        "2025-02-03,PADARIA DO ZE CENTR0,12.50\n"  # quase idêntica ao histórico: herda por LSH
+        "2025-02-04,LOJA NOVA,99.90\n",
+        encoding="utf-8",
+    )
+
+    agente = agente_falso(CadeiaFalsa(lambda e: "Compras & Casa")).nova_execucao()
+    df = executar_pipeline(agente, str(fatura), ACAO, False, "2025-02", str(backup))
+
+    assert dict(zip(df["Lancamento_Limpo"], df["Categoria"])) == {
+        "PADARIA DO ZE CENTR0": "Mercado",
+        "LOJA NOVA": "Compras & Casa",
+    }
+    assert agente.origens["PADARIA DO ZE CENTR0"] == "lsh"
+    assert carregar_cache() == {"LOJA NOVA": "Compras & Casa"}
+
+
+def test_modo_em_blocos_da_o_mesmo_resultado(agente_falso, tmp_path):
+    from categorias import CATEGORIAS
+    from pipeline import executar_pipeline_chunks
+
+    fatura = os.path.join(RAIZ, "faturas", "fatura-945219970.csv")
+    cadeia = CadeiaFalsa(lambda e: CATEGORIAS[len(e["text"]) % len(CATEGORIAS)])
+
+    (tmp_path / "inteiro").mkdir()
+    (tmp_path / "blocos").mkdir()
+    backup_inteiro = str(tmp_path / "inteiro" / "finances_cartao.csv")
+    backup_blocos = str(tmp_path / "blocos" / "finances_cartao.csv")
+    # cubo já montado (o pipeline só atualiza um que existe), com um mês que não é tocado
+    for pasta in ("inteiro", "blocos"):
+        pd.DataFrame(
+            [("2024-12", "Cartão", "Mercado", 5.0, 1), ("2025-02", "Cartão", "Pets", 99.0, 9)], columns=COLS_CUBO
+        ).to_csv(tmp_path / pasta / ARQ_CUBO, index=False)
+
+    df = executar_pipeline(agente_falso(cadeia).nova_execucao(), fatura, ACAO, True, "2025-02", backup_inteiro)
+    saida = str(tmp_path / "blocos" / "resultado.csv")
+    n = executar_pipeline_chunks(
+        agente_falso(cadeia).nova_execucao(), fatura, ACAO, True, "2025-02", backup_blocos, saida, linhas=7
+    )
+
+    assert n == len(df) > 7
+    inteiro = str(tmp_path / "inteiro" / "resultado.csv")
+    df.to_csv(inteiro, index=False)
+    pd.testing.assert_frame_equal(pd.read_csv(saida), pd.read_csv(inteiro))
+    pd.testing.assert_frame_equal(pd.read_csv(backup_blocos), pd.read_csv(backup_inteiro))
+
+    cubo_inteiro = carregar_cubo(str(tmp_path / "inteiro" / ARQ_CUBO))
+    pd.testing.assert_frame_equal(carregar_cubo(str(tmp_path / "blocos" / ARQ_CUBO)), cubo_inteiro)
+    assert ("2024-12", 5.0) in set(zip(cubo_inteiro["MesRef"], cubo_inteiro["Valor"]))
+    assert 99.0 not in set(cubo_inteiro["Valor"])
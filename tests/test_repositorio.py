@@ -0,0 +1,49 @@
+import pandas as pd
+
+import banco
+import repositorio
+
+
+def _receita(id_, mes, valor):
+    return {"ID": id_, "Tipo": "Reembolso", "Pessoa": "Ana", "Vezes": 1, "Data": f"{mes}-10", "Valor": valor}
+
+
+def _contar_cargas(monkeypatch):
+    cargas = []
+    carregar = banco.carregar_receitas
+    monkeypatch.setattr(banco, "carregar_receitas", lambda db: cargas.append(db) or carregar(db))
+    return cargas
+
+
+def test_leituras_repetidas_usam_o_frame_guardado(tmp_path, monkeypatch):
+    db = str(tmp_path / "financas.db")
+    repositorio.inserir_receitas([_receita("r1", "2025-01", 10.0), _receita("r2", "2025-02", 5.0)], db)
+    cargas = _contar_cargas(monkeypatch)
+
+    assert repositorio.total_receitas_mes("2025-01", db) == 10.0
+    assert repositorio.total_receitas_mes("2025-02", db) == 5.0
+    df = repositorio.carregar_receitas(db)
+    assert len(cargas) == 1
+
+    # quem recebe o frame pode mexer à vontade: o guardado não muda
+    df.loc[:, "Valor"] = 0.0
+    assert repositorio.total_receitas_mes("2025-01", db) == 10.0
+
+
+def test_gravacao_pelo_repositorio_invalida(tmp_path, monkeypatch):
+    db = str(tmp_path / "financas.db")
+    repositorio.inserir_receitas([_receita("r1", "2025-01", 10.0)], db)
+    assert repositorio.total_receitas_mes("2025-01", db) == 10.0
+
+    repositorio.atualizar_receitas(pd.DataFrame({"ID": ["r1"], "Recebido": [True]}), db)
+    assert bool(repositorio.carregar_receitas(db).loc[0, "Recebido"])
+
+
+def test_gravacao_de_fora_e_detectada_pela_versao(tmp_path):
+    db = str(tmp_path / "financas.db")
+    repositorio.inserir_despesas_fixas([{"ID": "f1", "Tipo": "Aluguel", "Valor": 1000.0}], db)
+    assert repositorio.total_despesas_fixas(db) == 1000.0
+
+    # outro processo grava direto no banco, sem chamar invalidar
+    banco.inserir_despesas_fixas([{"ID": "f2", "Tipo": "Internet", "Valor": 100.0}], db)
+    assert repositorio.total_despesas_fixas(db) == 1100.0
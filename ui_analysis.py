@@ -1,11 +1,15 @@
-import os
 import streamlit as st
 import pandas as pd
 from streamlit_extras.metric_cards import style_metric_cards
+from exportacao import render_download
+import repositorio
+import workspace
+import jobs
+from metricas import METRICAS
+from anomalias import detectar_anomalias_com_historico
+from pipeline import resumo_cobertura
 
-BKP_PATH_DESPESA = "bkp/finances_cartao.csv"
-BKP_PATH_RECEITA = "bkp/receitas.csv"
-BKP_PATH_DESPESA_FIXA = "bkp/despesa_fixa.csv"
+ARQ_DESPESA = "finances_cartao.csv"
 
 def format_brl(value) -> str:
     """
@@ -24,23 +28,27 @@ def format_brl(value) -> str:
     return f"R$ {s}"
 
 
+def caminho_backup(ws: str = None) -> str:
+    return workspace.caminho(ARQ_DESPESA, ws)
+
+
 def carregar_backup():
-    if not os.path.exists(BKP_PATH_DESPESA):
-        st.warning("Ainda não existe backup em bkp/finances_cartao.csv. Faça um upload e processe primeiro.")
+    # só relê o CSV quando ele muda; navegar/filtrar usa o que já está em memória
+    path = caminho_backup()
+    df = repositorio.carregar_backup(path)
+    if df is None:
+        st.warning(f"Ainda não existe backup em {path}. Faça um upload e processe primeiro.")
         st.stop()
-    return pd.read_csv(BKP_PATH_DESPESA)
+    return df
 
 
 def render_total(df: pd.DataFrame, mes_sel: str):
     # garanta numérico
     df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce")
 
-    df_receita = pd.read_csv(BKP_PATH_RECEITA)
-    df_receita = df_receita[df_receita["MesRef"] == mes_sel]
-    receita = df_receita["Valor"].sum().round(2)
-
-    df_despesa_fixa = pd.read_csv(BKP_PATH_DESPESA_FIXA)
-    despesas_fixas = df_despesa_fixa["Valor"].sum().round(2)
+    db_path = workspace.caminho_db()
+    receita = round(repositorio.total_receitas_mes(mes_sel, db_path), 2)
+    despesas_fixas = round(repositorio.total_despesas_fixas(db_path), 2)
 
     valor_total = df["Valor"].sum().round(2)
 
@@ -112,67 +120,150 @@ def render_metrics_grupado(df: pd.DataFrame):
     col5.metric("Redução de valor próximo mes", format_brl(value_ending), help="Com base nas parcelas encerrando, estimativa de redução de gastos no próximo mês")
     style_metric_cards()
 
-def filtrar_pagamento_efetuado(df: pd.DataFrame) -> pd.DataFrame:
-    # remove "PAGAMENTO EFETUADO" (robusto)
-    if "Lancamento_Limpo" in df.columns:
-        mask = df["Lancamento_Limpo"].astype(str).str.strip().str.upper() != "PAGAMENTO EFETUADO"
-        return df[mask].copy()
-    return df
+def processar_upload(uploaded, acao: str, salvar_csv: bool, mes_ref) -> str:
+    """Manda o upload para a fila de jobs e passa a acompanhar o job nesta sessão."""
+    job_id = jobs.submeter(
+        uploaded,
+        uploaded.name,
+        acao,
+        salvar_csv,
+        mes_ref,
+        ws_dir=workspace.diretorio(),
+        backup_path=caminho_backup(),
+    )
+    acompanhar_job(job_id)
+    return job_id
 
-def processar_upload(agente, uploaded, acao: str, salvar_csv: bool, mes_ref):
-    progress = st.sidebar.progress(0)
-    status = st.sidebar.empty()
 
-    with st.spinner("Processando..."):
-        status.write("📥 Lendo CSV do cartão...")
-        progress.progress(15)
-        df = agente.ler_csv_cartao(uploaded)
+def acompanhar_job(job_id: str):
+    # query param: sobrevive a refresh do navegador
+    st.session_state["job_id"] = job_id
+    st.query_params["job"] = job_id
 
-        df["MesRef"] = mes_ref 
 
-        if acao == "Só ler CSV":
-            progress.progress(100)
-            status.success("✅ Concluído.")
-            return df
+def job_ativo():
+    return st.session_state.get("job_id") or st.query_params.get("job")
 
-        status.write("🧾 Adicionando parcelas...")
-        progress.progress(40)
-        df = agente.adicionar_parcelas(df)
 
-        # remove pagamento efetuado antes do LLM
-        df = filtrar_pagamento_efetuado(df)
+def esquecer_job():
+    st.session_state.pop("job_id", None)
+    st.query_params.pop("job", None)
 
-        if acao == "Ler CSV + parcelas":
-            progress.progress(100)
-            status.success("✅ Concluído.")
-            return df
 
-        status.write("🤖 Categorizando lançamentos via Groq...")
-        progress.progress(70)
+@st.fragment(run_every=2)
+def _progresso_job(job_id: str, ws_dir: str):
+    info = jobs.status(job_id, ws_dir)
+    if info is None or info["status"] in jobs.FINALIZADOS:
+        st.rerun()
 
-        def on_llm_progress(done: int, total: int):
-            base = 70
-            span = 20
-            pct = base + int(span * (done / max(total, 1)))
-            progress.progress(pct)
-            status.write(f"🤖 Categorizando lançamentos via Groq... {done}/{total}")
+    st.progress(int(info["pct"]), text=info["etapa"])
+    if info["status"] == jobs.NA_FILA:
+        st.caption("Aguardando outro processamento terminar. Pode navegar à vontade, o job continua.")
 
-        df = agente.categorizar_batch(df, on_progress=on_llm_progress)
 
-        # regra final: valor negativo = reembolso/crédito
-        df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce")
-        df.loc[df["Valor"] < 0, "Categoria"] = "Reembolsos & Créditos"
+def render_job(job_id: str):
+    """
+    Mostra o andamento do job (atualiza sozinho) e devolve o resultado quando terminar.
+    """
+    ws_dir = workspace.diretorio()
+    info = jobs.status(job_id, ws_dir)
 
-        if salvar_csv:
-            status.write("💾 Salvando arquivo...")
-            progress.progress(95)
-            os.makedirs("bkp", exist_ok=True)
-            df.to_csv(BKP_PATH_DESPESA, index=False)
+    if info is None:
+        esquecer_job()
+        return None
+
+    if info["status"] == jobs.CONCLUIDO:
+        st.sidebar.success(f"✅ {info['arquivo']} ({info['mes_ref']}) processado.")
+        if info.get("cobertura"):
+            st.sidebar.caption(resumo_cobertura(info["cobertura"]))
+        if info.get("linhas", 0) > jobs.LIMITE_LINHAS_UI:
+            render_resultado_grande(info, job_id, ws_dir)
+            return None
+        return jobs.resultado(job_id, ws_dir)
+
+    if info["status"] == jobs.ERRO:
+        st.error(f"Falha ao processar {info['arquivo']}: {info.get('erro')}")
+        return None
+
+    if info["status"] == jobs.INTERROMPIDO:
+        st.warning(f"O processamento de {info['arquivo']} foi interrompido (servidor reiniciado). Envie de novo.")
+        return None
+
+    _progresso_job(job_id, ws_dir)
+    return None
+
+
+def _milhar(n: int) -> str:
+    return f"{n:,}".replace(",", ".")
+
+
+def render_resultado_grande(info: dict, job_id: str, ws_dir: str):
+    """Resultado grande demais para a análise interativa: resumo por categoria + prévia."""
+    st.info(
+        f"{_milhar(info['linhas'])} lançamentos: grande demais para carregar inteiro aqui. "
+        f"Abaixo, o total por categoria e as primeiras {_milhar(jobs.PREVIA_LINHAS)} linhas."
+    )
+
+    resumo = pd.DataFrame(info.get("resumo", []))
+    if not resumo.empty:
+        resumo["Valor"] = resumo["Valor"].apply(format_brl)
+        st.dataframe(resumo, use_container_width=True, hide_index=True)
+
+    st.dataframe(jobs.resultado(job_id, ws_dir, max_linhas=jobs.PREVIA_LINHAS), use_container_width=True, hide_index=True)
+    if info.get("salvar_csv"):
+        st.caption("O mês completo foi salvo no backup.")
+
+
+def render_fila():
+    """Lista os jobs recentes do workspace na barra lateral, para reabrir um deles."""
+    ws_dir = workspace.diretorio()
+    recentes = jobs.listar(ws_dir)
+    if not recentes:
+        return
+
+    icones = {jobs.NA_FILA: "⏳", jobs.RODANDO: "🤖", jobs.CONCLUIDO: "✅", jobs.ERRO: "❌", jobs.INTERROMPIDO: "⚠️"}
+
+    with st.sidebar.expander("📋 Processamentos", expanded=False):
+        for j in recentes:
+            col1, col2 = st.columns([3, 1])
+            col1.caption(f"{icones.get(j['status'], '')} {j['arquivo']} · {j['mes_ref']} · {j['pct']}%")
+            if col2.button("Abrir", key=f"abrir_job_{j['id']}"):
+                acompanhar_job(j["id"])
+                st.rerun()
+
+def render_metricas():
+    """Contadores e tempos do processo (chamadas ao LLM, jobs coalescidos, índice etc.)."""
+    contadores = METRICAS.contadores()
+    tempos = METRICAS.resumo_tempos()
+    if not contadores and not tempos:
+        return
+
+    with st.sidebar.expander("📈 Métricas", expanded=False):
+        for nome, valor in sorted(contadores.items()):
+            st.caption(f"{nome}: {valor}")
+
+        for nome, t in sorted(tempos.items()):
+            st.caption(
+                f"{nome}: {t['n']}x, média {t['media_s'] * 1000:.1f} ms, "
+                f"p50 {t['p50_s'] * 1000:.1f} ms, p95 {t['p95_s'] * 1000:.1f} ms, máx {t['max_s'] * 1000:.1f} ms"
+            )
+
+        coalescidos = contadores.get("jobs.coalescidos", 0)
+        if coalescidos:
+            st.caption(f"Uploads repetidos que aproveitaram um job em andamento: {coalescidos}")
+
+        # llm.<modelo>.respostas / .invalidas (o nome do modelo tem pontos)
+        for nome, respostas in sorted(contadores.items()):
+            if not (nome.startswith("llm.") and nome.endswith(".respostas")) or not respostas:
+                continue
+            modelo = nome[len("llm."):-len(".respostas")]
+            invalidas = contadores.get(f"llm.{modelo}.invalidas", 0)
+            st.caption(f"Respostas inválidas ({modelo}): {invalidas} de {respostas} ({invalidas / respostas:.1%})")
+            hedges = contadores.get(f"llm.{modelo}.hedges", 0)
+            if hedges:
+                vencedores = contadores.get(f"llm.{modelo}.hedges_vencedores", 0)
+                st.caption(f"Cópias por latência ({modelo}): {hedges}, {vencedores} responderam antes")
 
-        progress.progress(100)
-        status.success("✅ Processamento concluído.")
-        return df
-    
 def filtro_data(df: pd.DataFrame) -> pd.DataFrame:
         # Período
     meses = sorted(df["MesRef"].dropna().unique().tolist())
@@ -204,6 +295,13 @@ def aplicar_filtros(df: pd.DataFrame) -> pd.DataFrame:
         so_parcelado = st.sidebar.checkbox("Somente parcelados", value=False)
     else:
         so_parcelado = False
+
+    # Alertas (duplicadas, aumento de preço, parcela faltando)
+    if "Alerta" in df.columns:
+        n_alertas = int(df["Alerta"].ne("").sum())
+        so_alertas = st.sidebar.checkbox(f"Somente com alerta ({n_alertas})", value=False)
+    else:
+        so_alertas = False
     
 
     # Busca por texto
@@ -222,12 +320,34 @@ def aplicar_filtros(df: pd.DataFrame) -> pd.DataFrame:
     if so_parcelado and "ParcelaTotal" in df.columns:
         df = df[df["ParcelaTotal"].fillna(0).astype(int) > 1]
 
+    # aplica alertas
+    if so_alertas:
+        df = df[df["Alerta"].ne("")]
+
     return df
 
 
-def render_result(df: pd.DataFrame):
+@st.cache_data(max_entries=8, show_spinner=False)
+def _alertas(_df: pd.DataFrame, versao: str, backup_path: str, versao_backup) -> pd.DataFrame:
+    # `_df` não entra no hash: a chave é a versão dos dados e a do backup usado na comparação
+    return detectar_anomalias_com_historico(_df, repositorio.carregar_backup(backup_path))
+
+
+def com_alertas(df: pd.DataFrame, versao: str = None) -> pd.DataFrame:
+    """Coluna Alerta comparando com o backup; com `versao`, só recalcula quando algo muda."""
+    path = caminho_backup()
+    if versao is None:
+        return detectar_anomalias_com_historico(df, repositorio.carregar_backup(path))
+    return _alertas(df, versao, path, repositorio.versao(path))
+
+
+def render_result(df: pd.DataFrame, versao: str = None):
     st.subheader("Original")
 
+    # detecção compara com o histórico inteiro (precisa dos outros meses)
+    df = com_alertas(df, versao)
+
+    df_completo = df
     df, mes_sel = filtro_data(df)
     
     render_total(df, mes_sel)
@@ -252,11 +372,10 @@ def render_result(df: pd.DataFrame):
     df_show = df_show.rename(columns={"Lancamento_Limpo": "Descrição"})
 
     # Selecionar e ordenar colunas (ajuste como quiser)
-    cols = [c for c in ["Data", "Descrição", "Valor", "Parcela", "Categoria"] if c in df_show.columns]
+    cols = [c for c in ["Data", "Descrição", "Valor", "Parcela", "Categoria", "Alerta"] if c in df_show.columns]
     df_show = df_show[cols]
 
     st.dataframe(df_show.reset_index(drop=True), use_container_width=True, hide_index=True)
 
-    # download do resultado
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
-    st.download_button("Baixar CSV", data=csv_bytes, file_name="finances_cartao.csv", mime="text/csv")
+    # download do resultado (gerado só no clique)
+    render_download(df_completo, "finances_cartao", key="export_cartao", df_filtrado=df_view, versao=versao)
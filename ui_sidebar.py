@@ -1,6 +1,7 @@
 import streamlit as st
 from streamlit_extras.badges import badge
 from datetime import date
+from workspace import definir_workspace, workspace_atual
 
 def render_sidebar():
     # estados padrão
@@ -10,6 +11,15 @@ def render_sidebar():
 
     st.sidebar.header("Configurações")
 
+    # cada workspace tem seus próprios arquivos em bkp/
+    ws = st.sidebar.text_input(
+        "Workspace",
+        value=workspace_atual(),
+        key="workspace_input",
+        help="Dados isolados por pessoa/equipe. Também pode ser passado na URL: ?ws=nome",
+    )
+    ws = definir_workspace(ws)
+
     # =========================
     # Expander: Processamento
     # =========================
@@ -41,7 +51,7 @@ def render_sidebar():
 
         uploaded = None
         if fonte == "Upload (CSV do cartão)":
-            uploaded = st.file_uploader("Envie o CSV do cartão", type=["csv"], key="uploaded")
+            uploaded = st.file_uploader("Envie o CSV ou OFX do cartão", type=["csv", "ofx", "qfx"], key="uploaded")
 
         acao = st.selectbox(
             "O que executar?",
@@ -87,6 +97,7 @@ def render_sidebar():
         "salvar_csv": st.session_state["salvar_csv"],
         "rodar": rodar,
         "mes_ref": mes_ref,
+        "workspace": ws,
     }
 
 
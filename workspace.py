@@ -0,0 +1,53 @@
+import os
+import re
+from typing import Optional
+
+import streamlit as st
+
+BKP_DIR = "bkp"
+WORKSPACES_DIR = os.path.join(BKP_DIR, "workspaces")
+COMPARTILHADO_DIR = os.path.join(BKP_DIR, "_compartilhado")
+
+WORKSPACE_PADRAO = "default"
+
+
+def normalizar_nome(nome: Optional[str]) -> str:
+    nome = re.sub(r"[^a-zA-Z0-9_-]+", "_", (nome or "").strip()).strip("_").lower()
+    return nome or WORKSPACE_PADRAO
+
+
+def workspace_atual() -> str:
+    """
+    Workspace da sessão: o escolhido na barra lateral ou o `?ws=` da URL.
+    """
+    ws = st.session_state.get("workspace") or st.query_params.get("ws")
+    return normalizar_nome(ws)
+
+
+def definir_workspace(nome: str) -> str:
+    ws = normalizar_nome(nome)
+    st.session_state["workspace"] = ws
+    if ws == WORKSPACE_PADRAO:
+        st.query_params.pop("ws", None)
+    else:
+        st.query_params["ws"] = ws
+    return ws
+
+
+def diretorio(ws: Optional[str] = None) -> str:
+    """
+    Diretório de dados do workspace. O padrão continua sendo `bkp/`
+    (compatível com os backups antigos); os demais ficam em `bkp/workspaces/<nome>/`.
+    """
+    ws = normalizar_nome(ws) if ws is not None else workspace_atual()
+    pasta = BKP_DIR if ws == WORKSPACE_PADRAO else os.path.join(WORKSPACES_DIR, ws)
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def caminho(arquivo: str, ws: Optional[str] = None) -> str:
+    return os.path.join(diretorio(ws), arquivo)
+
+
+def caminho_db(ws: Optional[str] = None) -> str:
+    return caminho("financas.db", ws)